@@ -1,23 +1,43 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory, jsonify, g
 from backend.progress_tracker import ProgressTracker
 from functools import wraps
 from werkzeug.exceptions import BadRequest
-from werkzeug.security import generate_password_hash, check_password_hash
 from backend.extensions import db
-from backend.models import User, Post, Comment, Like, ResetCode, CodeExample
+from backend.models import User, Post, Comment, Like, ResetCode, CodeExample, PageVisit, ActivityEvent, UserActivityTotals, LeaderboardEntry
+from backend.counters import adjust_post_comment_count, release_user_content, reconcile_counters
+from backend.likes import toggle_like
+from backend.query_plans import check_query_plans, seeded_sqlite_engine
+from backend import search as search_index
+from backend.suggest import suggestions, KINDS as SUGGESTION_KINDS
+from backend.file_index import FilenameIndex
+from backend.thumbnails import ThumbnailManifest, build_thumbnails
+from backend.activity_buffer import activity_buffer
+from backend.identity import current_user, login_required
+from backend.id_tokens import id_token_verifier, InvalidIdTokenError, ExpiredIdTokenError
+from backend.firebase_tasks import firebase_tasks, create_firebase_user, update_firebase_password, delete_firebase_user
+from backend.mail_queue import mail_queue
+from backend.sessions import server_sessions, describe_device
+from backend.shared_cache import shared_cache, invalidate_on_commit, post_tag
+from backend.fragments import post_cards
+from backend.reset_codes import sweep_expired as sweep_expired_reset_codes
+from backend.passwords import PasswordHasher, password_hasher, needs_rehash, PasswordHashBusy, benchmark as benchmark_password_hashing
+from backend.leaderboard import rebuild_leaderboard
+from backend import analytics
+from backend.avatars import AvatarError, check_upload, avatar_variant, process_avatar_async, remove_profile_pic_files, sweep_unreferenced_avatars
+from backend.catalog import Catalog, SORT_FIELDS as CATALOG_SORT_FIELDS, MAX_PER_PAGE as CATALOG_MAX_PER_PAGE
 from datetime import datetime
 import pytz
 import os
+import time
 import gunicorn
 import firebase_admin
-from firebase_admin import auth, credentials
+from firebase_admin import credentials
 from flask_migrate import Migrate
 from backend.reset_password import reset_bp
 import logging
-from flask_caching import Cache
 from flask_mail import Mail
-from werkzeug.utils import secure_filename
-import unicodedata
+import base64
+import click
 from backend.config import ActiveConfig
 
 # Configurar logging
@@ -27,9 +47,6 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config.from_object(ActiveConfig)
 
-# Inicializar Cache
-cache = Cache(app, config={'CACHE_TYPE': 'simple'})
-
 # Configurar diretórios para PDFs, Slides e JSON
 PDFS_FOLDER = os.path.join(app.root_path, 'pdfs')
 SLIDES_FOLDER = os.path.join(app.root_path, 'static', 'pdfs_slides')
@@ -38,24 +55,72 @@ app.config['PDFS_FOLDER'] = PDFS_FOLDER
 app.config['SLIDES_FOLDER'] = SLIDES_FOLDER
 app.config['DATA_FOLDER'] = DATA_FOLDER
 
+# Catálogos usados nas sugestões de busca (recarregados quando o arquivo muda)
+suggestions.register_catalog(os.path.join(DATA_FOLDER, 'pdfs.json'), 'pdf')
+suggestions.register_catalog(os.path.join(DATA_FOLDER, 'pdfs_slides.json'), 'slide')
+
+# Índices de nomes de arquivo usados por serve_pdf/serve_slide (busca sem acentos/maiúsculas)
+pdf_files = FilenameIndex(PDFS_FOLDER)
+slide_files = FilenameIndex(SLIDES_FOLDER)
+
+def validate_catalog_file(item):
+    """Confere se o file_path de um item do catálogo aponta para um arquivo existente."""
+    file_path = item.get('file_path') or ''
+    for prefix, files in (('/pdfs/', pdf_files), ('/slides/', slide_files)):
+        if file_path.startswith(prefix):
+            if files.find(file_path[len(prefix):]) is None:
+                return f"arquivo inexistente: {file_path}"
+            return None
+    return f"file_path inválido: {file_path!r}"
+
+# Miniaturas redimensionadas (flask build-thumbnails), servidas com nomes por hash do conteúdo
+THUMBNAILS_FOLDER = os.path.join(app.root_path, 'static', 'thumbnails')
+THUMBNAIL_CACHE_FOLDER = os.path.join(app.root_path, 'static', 'cache', 'thumbnails')
+thumbnail_manifest = ThumbnailManifest(THUMBNAIL_CACHE_FOLDER, '/thumbs')
+
+# Catálogos consultados por /api/catalog, indexados em memória
+catalogs = {
+    'pdfs': Catalog(os.path.join(DATA_FOLDER, 'pdfs.json'), validate=validate_catalog_file),
+    'slides': Catalog(os.path.join(DATA_FOLDER, 'pdfs_slides.json'), validate=validate_catalog_file),
+}
+
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB limit for profile pictures
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Configuração do Flask-Mail para Brevo SMTP
-app.config['MAIL_SERVER'] = 'smtp-relay.brevo.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = '901acc001@smtp-brevo.com'
-app.config['MAIL_PASSWORD'] = 'VPt45nhgXkBxjEy6'
+UPLOAD_FOLDER = os.path.join(app.root_path, 'static', 'Uploads')
+
+@app.template_global()
+def avatar_url(profile_pic, size=128):
+    """URL da foto de perfil no tamanho pedido (32, 64 ou 128px).
+
+    Fotos antigas, gravadas antes do processamento, continuam servidas como enviadas.
+    """
+    variant = avatar_variant(profile_pic, size)
+    if variant:
+        return url_for('serve_avatar', filename=variant.split('/', 1)[1])
+    return url_for('static', filename='Uploads/' + profile_pic)
+
+# Configuração do Flask-Mail para Brevo SMTP (variáveis de ambiente permitem um SMTP local em testes)
+app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp-relay.brevo.com')
+app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'true').lower() == 'true'
+app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', '901acc001@smtp-brevo.com')
+app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', 'VPt45nhgXkBxjEy6')
 app.config['MAIL_DEFAULT_SENDER'] = 'technobugproject@gmail.com'
 
 mail = Mail(app)
 
 db.init_app(app)
 migrate = Migrate(app, db)
+activity_buffer.init_app(app)
+password_hasher.init_app(app)
+mail_queue.init_app(app, mail)
+server_sessions.init_app(app)
+# Cache compartilhado entre os workers (LRU local + Redis ou arquivos)
+shared_cache.init_app(app)
 
 # Registrar o blueprint de recuperação de senha
 app.register_blueprint(reset_bp)
@@ -102,39 +167,84 @@ except Exception as e:
     logger.error(f"Erro ao inicializar Firebase: {str(e)}")
     raise
 
+# ID tokens verificados localmente com as chaves públicas em cache
+id_token_verifier.init_app(app, firebase_admin.get_app().project_id)
+
 # Filtro Jinja para converter UTC para BRT e formatar com strftime
+# Fuso de Brasília, resolvido uma vez (e não a cada data formatada)
+BRT = pytz.timezone('America/Sao_Paulo')
+
 @app.template_filter('format_brt')
 def format_brt(datetime_obj, format_str='%d/%m/%Y %H:%M'):
     if datetime_obj:
-        brt = pytz.timezone('America/Sao_Paulo')
-        brt_datetime = datetime_obj.replace(tzinfo=pytz.UTC).astimezone(brt)
+        brt_datetime = datetime_obj.replace(tzinfo=pytz.UTC).astimezone(BRT)
         return brt_datetime.strftime(format_str)
     return ''
 
 # Função helper para converter datetime para BRT em respostas JSON
 def to_brt_str(dt, format_str='%d/%m/%Y %H:%M'):
     if dt:
-        brt = pytz.timezone('America/Sao_Paulo')
-        brt_dt = dt.replace(tzinfo=pytz.UTC).astimezone(brt)
+        brt_dt = dt.replace(tzinfo=pytz.UTC).astimezone(BRT)
         return brt_dt.strftime(format_str)
     return ''
 
-def normalize_filename(filename):
-    """Normaliza o nome do arquivo, removendo acentos e convertendo para minúsculas."""
-    normalized = unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode('ASCII')
-    return normalized.lower()
+# Quantidade de postagens por página do feed da comunidade
+FEED_PAGE_SIZE = 10
+
+def encode_feed_cursor(post):
+    """Gera o cursor opaco (created_at, id) a partir da última postagem da página."""
+    raw = f"{post.created_at.isoformat()}|{post.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
 
-def find_file_case_insensitive(directory, target_filename):
-    """Busca um arquivo no diretório de forma case-insensitive."""
-    target_normalized = normalize_filename(target_filename)
+def decode_feed_cursor(cursor):
+    """Decodifica o cursor do feed. Lança ValueError se o cursor for inválido."""
     try:
-        for filename in os.listdir(directory):
-            if normalize_filename(filename) == target_normalized:
-                return filename
-        return None
-    except Exception as e:
-        logger.error(f"Erro ao listar arquivos em {directory}: {str(e)}")
-        return None
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at_str, post_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at_str), int(post_id)
+    except Exception:
+        raise ValueError(f"Cursor inválido: {cursor}")
+
+def get_feed_page(cursor=None, limit=FEED_PAGE_SIZE):
+    """Retorna uma página do feed ordenada por (created_at, id) e o cursor da próxima página.
+
+    A paginação por cursor (keyset) mantém o custo de cada página constante,
+    independentemente da quantidade de postagens na tabela.
+    """
+    query = Post.query.options(
+        db.joinedload(Post.author)
+    ).filter(Post.created_at.isnot(None))
+    if cursor:
+        created_at, post_id = decode_feed_cursor(cursor)
+        # O filtro redundante created_at <= cursor permite busca por intervalo no índice
+        query = query.filter(Post.created_at <= created_at, db.or_(
+            Post.created_at < created_at,
+            db.and_(Post.created_at == created_at, Post.id < post_id)
+        ))
+    posts = query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_feed_cursor(posts[-1])
+    return posts, next_cursor
+
+def serialize_feed_post(post, user_id, liked_post_ids):
+    """Converte uma postagem do feed para JSON (usado pelo scroll infinito)."""
+    profile_pic = post.author.profile_pic
+    return {
+        'id': post.id,
+        'content': post.content,
+        'category': post.category,
+        'username': post.author.username,
+        'profile_pic_url': avatar_url(profile_pic, 128)
+            if profile_pic and profile_pic != 'default.png' else None,
+        'created_at': to_brt_str(post.created_at),
+        'like_count': post.like_count,
+        'comment_count': post.comment_count,
+        'user_liked': post.id in liked_post_ids,
+        'is_owner': post.user_id == user_id,
+        'url': url_for('post_comments', post_id=post.id)
+    }
 
 def track_page_visit(page_name):
     """Decorator para rastrear visitas às páginas"""
@@ -148,71 +258,60 @@ def track_page_visit(page_name):
         return decorated_function
     return decorator
 
-def track_user_activity(activity_type):
-    """Registra atividade do usuário para cálculo de progresso"""
-    if 'user_id' not in session:
-        return
-    user = db.session.get(User, session['user_id'])
-    if user:
-        user.last_activity = datetime.now(pytz.UTC)  # Atualizado para usar pytz.UTC
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Erro ao rastrear atividade: {str(e)}")
+def track_user_activity(activity_type, user_id=None):
+    """Registra atividade do usuário para cálculo de progresso.
+
+    Sem user_id, vale para o usuário logado (e atualiza o last_activity dele).
+    """
+    now = datetime.now(pytz.UTC)
+    if user_id is None:
+        if 'user_id' not in session:
+            return
+        user_id = session['user_id']
+        activity_buffer.record_activity(user_id, now)
+    # Gravado em lote pelo activity_buffer, sem commit na requisição
+    activity_buffer.record_event(user_id, activity_type, now)
 
 @app.errorhandler(404)
 def page_not_found(e):
     logger.error(f"Erro 404: {request.url}")
     return render_template('404.html'), 404
 
+@app.errorhandler(PasswordHashBusy)
+def password_hash_busy(e):
+    message = 'O servidor está ocupado. Tente novamente em instantes.'
+    flash(message, 'error')
+    if request.blueprint == reset_bp.name:
+        return jsonify({'status': 'error', 'message': message}), 503
+    return redirect(request.referrer or url_for('registroelogin'))
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/telainicial')
 @track_page_visit('telainicial')
+@login_required
 def telainicial():
-    user_id = session.get('user_id')
-    if not user_id:
-        flash('Por favor, faça login para acessar esta página.', 'error')
-        return redirect(url_for('registroelogin'))
-    user = db.session.get(User, user_id)
-    if not user:
-        session.clear()
-        flash('Sua sessão expirou ou o usuário não existe mais.', 'error')
-        return redirect(url_for('registroelogin'))
-    posts = Post.query.options(
-        db.joinedload(Post.author),
-        db.joinedload(Post.likes),
-        db.joinedload(Post.comments).joinedload(Comment.author),
-        db.joinedload(Post.comments).joinedload(Comment.replies).joinedload(Comment.author)
-    ).order_by(Post.created_at.desc()).limit(10).all()
-    return render_template('telainicial.html', user=user, posts=posts)
+    # Só os ids vêm do banco; os cards saem dos fragmentos em cache (backend/fragments.py)
+    post_ids = [post_id for (post_id,) in db.session.query(Post.id).order_by(Post.created_at.desc()).limit(10)]
+    return render_template('telainicial.html', user=g.user,
+                           post_cards=post_cards(post_ids, g.user.id, with_comments=True))
 
 @app.route('/post/<int:post_id>', methods=['GET'])
+@login_required
 def post_comments(post_id):
-    user_id = session.get('user_id')
-    if not user_id:
-        flash('Por favor, faça login para acessar esta página.', 'error')
-        return redirect(url_for('registroelogin'))
-    user = db.session.get(User, user_id)
-    if not user:
-        session.clear()
-        flash('Sua sessão expirou ou o usuário não existe mais.', 'error')
-        return redirect(url_for('registroelogin'))
     post = Post.query.options(
+        db.joinedload(Post.author),
         db.joinedload(Post.comments).joinedload(Comment.author),
         db.joinedload(Post.comments).joinedload(Comment.replies).joinedload(Comment.author)
     ).get_or_404(post_id)
-    return render_template('post_comments.html', user=user, post=post)
+    return render_template('post_comments.html', user=g.user, post=post)
 
 @app.route('/registroelogin', methods=['GET', 'POST'])
 def registroelogin():
-    user_id = session.get('user_id')
-    if user_id:
-        user = db.session.get(User, user_id)
-        if user:
+    if session.get('user_id'):
+        if current_user():
             return redirect(url_for('telainicial'))
         session.clear()
     if request.method == 'POST':
@@ -223,7 +322,16 @@ def registroelogin():
                 flash('Por favor, preencha todos os campos.', 'error')
                 return redirect(url_for('registroelogin'))
             user = User.query.filter_by(email=email).first()
-            if user and user.password and check_password_hash(user.password, password):
+            if user and password_hasher.check(user.password, password):
+                if needs_rehash(user.password):
+                    # Atualiza hashes antigos para os parâmetros atuais; falhar aqui não impede o login
+                    try:
+                        user.password = password_hasher.hash(password)
+                        db.session.commit()
+                        logger.info(f"Hash de senha atualizado para usuário ID {user.id}")
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.warning(f"Erro ao atualizar hash de senha: {str(e)}")
                 session['user_id'] = user.id
                 session['username'] = user.username
                 flash(f'Bem-vindo de volta, {user.username}!', 'success')
@@ -252,16 +360,12 @@ def registroelogin():
             new_user = User(
                 username=username,
                 email=email,
-                password=generate_password_hash(password)
+                password=password_hasher.hash(password)
             )
             try:
                 db.session.add(new_user)
                 db.session.commit()
-                try:
-                    auth.create_user(email=email, password=password)
-                    logger.info(f"Usuário {email} criado no Firebase Authentication")
-                except Exception as e:
-                    logger.warning(f"Erro ao criar usuário no Firebase: {str(e)}")
+                firebase_tasks.submit(create_firebase_user, email, password)
                 flash('Conta criada com sucesso! Faça login para continuar.', 'success')
             except Exception as e:
                 db.session.rollback()
@@ -274,15 +378,14 @@ def registroelogin():
 def user_progress():
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'Por favor, faça login para visualizar o progresso.'}), 401
-    user = db.session.get(User, session['user_id'])
+    # Grava antes de carregar o usuário as visitas dele que ainda estão no buffer
+    if activity_buffer.has_pending(session['user_id']):
+        activity_buffer.flush()
+    user = current_user()
     if not user:
         return jsonify({'status': 'error', 'message': 'Usuário não encontrado.'}), 404
     try:
         progress_data = ProgressTracker.calculate_progress(user.id)
-        print(f"DEBUG - Progress data: {progress_data}")
-        print(f"DEBUG - Progress percentage: {progress_data.get('progress_percentage')}")
-        print(f"DEBUG - Activity points: {progress_data.get('activity_points')}")
-        print(f"DEBUG - Resources count: {progress_data.get('resources_count')}")
         suggestions = ProgressTracker.get_next_actions(user.id)
         details = progress_data.get('details', {})
         structured_details = {
@@ -332,11 +435,120 @@ def user_progress():
             'suggestions': []
         }), 500
 
+LEADERBOARD_PER_PAGE = 20
+LEADERBOARD_MAX_PER_PAGE = 100
+
+def leaderboard_entry_to_json(entry, username, profile_pic):
+    return {
+        'rank': entry.rank,
+        'position': entry.position,
+        'user_id': entry.user_id,
+        'username': username,
+        'profile_pic': avatar_url(profile_pic, 64),
+        'activity_points': entry.activity_points,
+        'progress_percentage': entry.progress_percentage,
+        'resources_count': entry.resources_count
+    }
+
+@app.route('/leaderboard', methods=['GET'])
+def leaderboard():
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Por favor, faça login para ver o ranking.'}), 401
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', LEADERBOARD_PER_PAGE, type=int), 1), LEADERBOARD_MAX_PER_PAGE)
+    try:
+        # position é a chave primária: cada página é uma faixa contígua do índice
+        first = (page - 1) * per_page + 1
+        rows = db.session.execute(
+            db.select(LeaderboardEntry, User.username, User.profile_pic)
+            .join(User, User.id == LeaderboardEntry.user_id)
+            .where(LeaderboardEntry.position.between(first, first + per_page))
+            .order_by(LeaderboardEntry.position)
+        ).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        me = db.session.execute(
+            db.select(LeaderboardEntry, User.username, User.profile_pic)
+            .join(User, User.id == LeaderboardEntry.user_id)
+            .where(LeaderboardEntry.user_id == session['user_id'])
+        ).first()
+        total = db.session.query(db.func.max(LeaderboardEntry.position)).scalar() or 0
+        return jsonify({
+            'status': 'success',
+            'results': [leaderboard_entry_to_json(*row) for row in rows],
+            'me': leaderboard_entry_to_json(*me) if me else None,
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'has_more': has_more,
+            'computed_at': rows[0][0].computed_at.isoformat() if rows else None
+        }), 200
+    except Exception as e:
+        logger.error(f"Erro ao obter ranking: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Erro ao obter ranking.'}), 500
+
+def get_staff_user():
+    """Usuário logado se for administrador ou moderador; senão None."""
+    user = current_user()
+    if user and (user.is_admin or user.is_moderator):
+        return user
+    return None
+
+@app.route('/admin/analytics')
+def admin_analytics():
+    if 'user_id' not in session:
+        flash('Por favor, faça login para acessar esta página.', 'error')
+        return redirect(url_for('registroelogin'))
+    if not get_staff_user():
+        return render_template('404.html'), 404
+    return render_template('admin_analytics.html', metrics=analytics.METRICS, max_buckets=analytics.MAX_BUCKETS)
+
+@app.route('/admin/api/analytics', methods=['GET'])
+def admin_analytics_api():
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Por favor, faça login.'}), 401
+    if not get_staff_user():
+        return jsonify({'status': 'error', 'message': 'Acesso restrito a administradores.'}), 403
+    metric = request.args.get('metric', 'active_users')
+    granularity = request.args.get('granularity', 'day')
+    if metric not in analytics.METRICS:
+        return jsonify({'status': 'error', 'message': 'Métrica inválida.'}), 400
+    if granularity not in analytics.GRANULARITIES:
+        return jsonify({'status': 'error', 'message': 'Granularidade inválida.'}), 400
+    default_buckets = 48 if granularity == 'hour' else 30
+    buckets = min(max(request.args.get('buckets', default_buckets, type=int), 1), analytics.MAX_BUCKETS[granularity])
+    try:
+        result = analytics.series(metric, granularity, buckets)
+        return jsonify({'status': 'success', 'metric': metric, 'granularity': granularity, **result}), 200
+    except Exception as e:
+        logger.error(f"Erro ao consultar métricas: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Erro ao consultar métricas.'}), 500
+
+@app.route('/admin/api/mail_queue', methods=['GET'])
+def admin_mail_queue_api():
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Por favor, faça login.'}), 401
+    if not get_staff_user():
+        return jsonify({'status': 'error', 'message': 'Acesso restrito a administradores.'}), 403
+    try:
+        return jsonify({'status': 'success', 'depth': mail_queue.depth()}), 200
+    except Exception as e:
+        logger.error(f"Erro ao consultar a fila de e-mails: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Erro ao consultar a fila de e-mails.'}), 500
+
+@app.route('/admin/api/cache_stats', methods=['GET'])
+def admin_cache_stats_api():
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Por favor, faça login.'}), 401
+    if not get_staff_user():
+        return jsonify({'status': 'error', 'message': 'Acesso restrito a administradores.'}), 403
+    return jsonify({'status': 'success', 'cache': shared_cache.stats()}), 200
+
 @app.route('/verify-token', methods=['POST'])
 def verify_token():
     id_token = request.json.get('idToken')
     try:
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = id_token_verifier.verify(id_token)
         email = decoded_token.get('email')
         username = decoded_token.get('name', email.split('@')[0])
         uid = decoded_token['uid']
@@ -358,26 +570,21 @@ def verify_token():
         session['user_id'] = user.id
         session['username'] = user.username
         return jsonify({'status': 'success', 'user': {'id': user.id, 'username': user.username, 'email': user.email}})
-    except auth.ExpiredIdTokenError:
+    except ExpiredIdTokenError:
         logger.warning("Token expirado recebido")
         return jsonify({'status': 'error', 'message': 'Token expirado. Faça login novamente.'}), 401
+    except InvalidIdTokenError as e:
+        logger.warning(f"Token inválido recebido: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Erro ao verificar token'}), 401
     except Exception as e:
         logger.error(f"Erro ao verificar token: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Erro ao verificar token'}), 401
 
 @app.route('/videos-e-tutoriais')
 @track_page_visit('videos')
+@login_required
 def videos():
-    user_id = session.get('user_id')
-    if not user_id:
-        flash('Por favor, faça login para acessar esta página.', 'error')
-        return redirect(url_for('registroelogin'))
-    user = db.session.get(User, user_id)
-    if not user:
-        session.clear()
-        flash('Sua sessão expirou ou o usuário não existe mais.', 'error')
-        return redirect(url_for('registroelogin'))
-    return render_template('videosetutoriais.html', user=user)
+    return render_template('videosetutoriais.html', user=g.user)
 
 @app.route('/politica-de-privacidade')
 def politica_privacidade():
@@ -385,31 +592,15 @@ def politica_privacidade():
 
 @app.route('/materiais-de-estudo')
 @track_page_visit('materiais')
+@login_required
 def materiais():
-    user_id = session.get('user_id')
-    if not user_id:
-        flash('Por favor, faça login para acessar esta página.', 'error')
-        return redirect(url_for('registroelogin'))
-    user = db.session.get(User, user_id)
-    if not user:
-        session.clear()
-        flash('Sua sessão expirou ou o usuário não existe mais.', 'error')
-        return redirect(url_for('registroelogin'))
-    return render_template('materiaisestudo.html', user=user)
+    return render_template('materiaisestudo.html', user=g.user)
 
 @app.route('/pdfs-e-apostilas')
 @track_page_visit('pdfs')
+@login_required
 def pdfs():
-    user_id = session.get('user_id')
-    if not user_id:
-        flash('Por favor, faça login para acessar esta página.', 'error')
-        return redirect(url_for('registroelogin'))
-    user = db.session.get(User, user_id)
-    if not user:
-        session.clear()
-        flash('Sua sessão expirou ou o usuário não existe mais.', 'error')
-        return redirect(url_for('registroelogin'))
-    return render_template('pdfeapostilas.html', user=user)
+    return render_template('pdfeapostilas.html', user=g.user)
 
 @app.route('/data/pdfs.json')
 def serve_pdfs_json():
@@ -419,18 +610,54 @@ def serve_pdfs_json():
         logger.error(f"Erro ao servir pdfs.json: {str(e)}")
         return render_template('404.html'), 404
 
+@app.route('/api/catalog', methods=['GET'])
+def api_catalog():
+    catalog = catalogs.get(request.args.get('source', 'pdfs'))
+    if catalog is None:
+        return jsonify({'status': 'error', 'message': 'Catálogo inválido.'}), 400
+    sort = request.args.get('sort', 'relevance')
+    if sort not in CATALOG_SORT_FIELDS:
+        return jsonify({'status': 'error', 'message': 'Ordenação inválida.'}), 400
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 24, type=int), 1), CATALOG_MAX_PER_PAGE)
+    try:
+        result = catalog.query(
+            q=request.args.get('q', ''),
+            category=request.args.get('category') or None,
+            tag=request.args.get('tag') or None,
+            author=request.args.get('author') or None,
+            sort=sort,
+            page=page,
+            per_page=per_page
+        )
+        # Copia os itens (compartilhados pelo índice) acrescentando as variantes da miniatura
+        result['items'] = [
+            dict(item, thumbnail_srcset=thumbnail_manifest.srcset(item.get('thumbnail')))
+            for item in result['items']
+        ]
+        return jsonify({'status': 'success', **result}), 200
+    except Exception as e:
+        logger.error(f"Erro ao consultar catálogo: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Erro ao consultar catálogo.'}), 500
+
+@app.route('/thumbs/<path:filename>')
+def serve_thumbnail(filename):
+    # O nome contém o hash do conteúdo, então o arquivo nunca muda
+    response = send_from_directory(THUMBNAIL_CACHE_FOLDER, filename, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 @app.route('/pdfs/<path:filename>')
 def serve_pdf(filename):
     try:
-        file_path = os.path.join(app.config['PDFS_FOLDER'], filename)
-        if os.path.exists(file_path):
-            logger.info(f"Servindo arquivo: {file_path}")
-            return send_from_directory(app.config['PDFS_FOLDER'], filename)
-        actual_filename = find_file_case_insensitive(app.config['PDFS_FOLDER'], filename)
+        actual_filename = pdf_files.find(filename)
         if actual_filename:
-            logger.info(f"Arquivo encontrado (case-insensitive): {actual_filename}")
+            if actual_filename != filename:
+                logger.info(f"Arquivo encontrado (case-insensitive): {actual_filename}")
             return send_from_directory(app.config['PDFS_FOLDER'], actual_filename)
-        logger.error(f"Arquivo não encontrado: {filename} em {app.config['PDFS_FOLDER']}")
+        # Cache negativo: URLs inválidas repetidas não geram uma linha de log por requisição
+        if pdf_files.record_miss(filename):
+            logger.error(f"Arquivo não encontrado: {filename} em {app.config['PDFS_FOLDER']}")
         return render_template('404.html'), 404
     except Exception as e:
         logger.error(f"Erro ao servir PDF {filename}: {str(e)}")
@@ -439,15 +666,13 @@ def serve_pdf(filename):
 @app.route('/slides/<path:filename>')
 def serve_slide(filename):
     try:
-        file_path = os.path.join(app.config['SLIDES_FOLDER'], filename)
-        if os.path.exists(file_path):
-            logger.info(f"Servindo slide: {file_path}")
-            return send_from_directory(app.config['SLIDES_FOLDER'], filename)
-        actual_filename = find_file_case_insensitive(app.config['SLIDES_FOLDER'], filename)
+        actual_filename = slide_files.find(filename)
         if actual_filename:
-            logger.info(f"Slide encontrado (case-insensitive): {actual_filename}")
+            if actual_filename != filename:
+                logger.info(f"Slide encontrado (case-insensitive): {actual_filename}")
             return send_from_directory(app.config['SLIDES_FOLDER'], actual_filename)
-        logger.error(f"Slide não encontrado: {filename} em {app.config['SLIDES_FOLDER']}")
+        if slide_files.record_miss(filename):
+            logger.error(f"Slide não encontrado: {filename} em {app.config['SLIDES_FOLDER']}")
         return render_template('404.html'), 404
     except Exception as e:
         logger.error(f"Erro ao servir slide {filename}: {str(e)}")
@@ -455,70 +680,55 @@ def serve_slide(filename):
 
 @app.route('/codigo')
 @track_page_visit('codigo')
+@login_required
 def codigo():
-    user_id = session.get('user_id')
-    if not user_id:
-        flash('Por favor, faça login para acessar esta página.', 'error')
-        return redirect(url_for('registroelogin'))
-    user = db.session.get(User, user_id)
-    if not user:
-        session.clear()
-        flash('Sua sessão expirou ou o usuário não existe mais.', 'error')
-        return redirect(url_for('registroelogin'))
-    return render_template('exemplosdecodigo.html', user=user)
+    return render_template('exemplosdecodigo.html', user=g.user)
 
 @app.route('/comunidade', methods=['GET'])
 @track_page_visit('comunidade')
+@login_required
 def comunidade():
-    user_id = session.get('user_id')
-    if not user_id:
-        flash('Por favor, faça login para acessar esta página.', 'error')
-        return redirect(url_for('registroelogin'))
-    user = db.session.get(User, user_id)
-    if not user:
-        session.clear()
-        flash('Sua sessão expirou ou o usuário não existe mais.', 'error')
-        return redirect(url_for('registroelogin'))
-    posts = Post.query.options(
-        db.joinedload(Post.comments).joinedload(Comment.author),
-        db.joinedload(Post.comments).joinedload(Comment.replies).joinedload(Comment.author),
-        db.joinedload(Post.author),
-        db.joinedload(Post.likes)
-    ).order_by(Post.created_at.desc()).all()
-    return render_template('comunidade.html', user=user, posts=posts)
+    posts, next_cursor = get_feed_page()
+    return render_template('comunidade.html', user=g.user, next_cursor=next_cursor,
+                           post_cards=post_cards([post.id for post in posts], g.user.id))
+
+@app.route('/comunidade/posts', methods=['GET'])
+def comunidade_posts():
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Por favor, faça login para visualizar as postagens.'}), 401
+    cursor = request.args.get('cursor', '').strip() or None
+    try:
+        posts, next_cursor = get_feed_page(cursor)
+    except ValueError as e:
+        logger.warning(str(e))
+        return jsonify({'status': 'error', 'message': 'Cursor de paginação inválido.'}), 400
+    except Exception as e:
+        logger.error(f"Erro ao carregar postagens do feed: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Erro ao carregar postagens.'}), 500
+    liked_post_ids = {
+        post_id for (post_id,) in db.session.query(Like.post_id).filter(
+            Like.user_id == session['user_id'],
+            Like.post_id.in_([post.id for post in posts])
+        )
+    }
+    return jsonify({
+        'status': 'success',
+        'posts': [serialize_feed_post(post, session['user_id'], liked_post_ids) for post in posts],
+        'next_cursor': next_cursor
+    })
 
 @app.route('/create_post_form', methods=['GET'])
+@login_required
 def create_post_form():
-    user_id = session.get('user_id')
-    if not user_id:
-        flash('Por favor, faça login para acessar esta página.', 'error')
-        return redirect(url_for('registroelogin'))
-    user = db.session.get(User, user_id)
-    if not user:
-        session.clear()
-        flash('Sua sessão expirou ou o usuário não existe mais.', 'error')
-        return redirect(url_for('registroelogin'))
-    posts = Post.query.options(
-        db.joinedload(Post.comments).joinedload(Comment.author),
-        db.joinedload(Post.comments).joinedload(Comment.replies).joinedload(Comment.author),
-        db.joinedload(Post.author),
-        db.joinedload(Post.likes)
-    ).order_by(Post.created_at.desc()).all()
-    return render_template('comunidade.html', user=user, posts=posts)
+    posts, next_cursor = get_feed_page()
+    return render_template('comunidade.html', user=g.user, next_cursor=next_cursor,
+                           post_cards=post_cards([post.id for post in posts], g.user.id))
 
 @app.route('/configuracoes')
 @track_page_visit('configuracoes')
+@login_required
 def configuracoes():
-    user_id = session.get('user_id')
-    if not user_id:
-        flash('Por favor, faça login para acessar esta página.', 'error')
-        return redirect(url_for('registroelogin'))
-    user = db.session.get(User, user_id)
-    if not user:
-        session.clear()
-        flash('Sua sessão expirou ou o usuário não existe mais.', 'error')
-        return redirect(url_for('registroelogin'))
-    return render_template('configuracoes.html', user=user)
+    return render_template('configuracoes.html', user=g.user)
 
 @app.route('/update_username', methods=['POST'])
 def update_username():
@@ -577,34 +787,27 @@ def update_profile_pic():
         flash('O arquivo excede o tamanho máximo de 5MB.', 'error')
         return redirect(url_for('configuracoes'))
     file.seek(0)
-    filename = f"user_{session['user_id']}_{secure_filename(file.filename)}"
-    upload_folder = os.path.join(app.root_path, 'static', 'Uploads')
-    os.makedirs(upload_folder, exist_ok=True)
-    file_path = os.path.join(upload_folder, filename)
-    user = db.session.get(User, session['user_id'])
+    data = file.read()
+    try:
+        check_upload(data)
+    except AvatarError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('configuracoes'))
+    user = current_user()
     if not user:
         flash('Usuário não encontrado.', 'error')
         return redirect(url_for('registroelogin'))
-    if user.profile_pic and user.profile_pic != 'default.png':
-        old_file_path = os.path.join(upload_folder, user.profile_pic)
-        if os.path.exists(old_file_path):
-            try:
-                os.remove(old_file_path)
-                logger.info(f"Arquivo de perfil antigo removido: {old_file_path}")
-            except Exception as e:
-                logger.warning(f"Erro ao remover arquivo de perfil antigo: {str(e)}")
-    try:
-        file.save(file_path)
-        user.profile_pic = filename
-        db.session.commit()
-        logger.info(f"Foto de perfil atualizada para usuário ID {user.id}: {filename}")
-        flash('Foto de perfil atualizada!', 'success')
-        return redirect(url_for('configuracoes'))
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"Erro ao atualizar foto de perfil: {str(e)}")
-        flash('Erro ao atualizar foto de perfil.', 'error')
-        return redirect(url_for('configuracoes'))
+    # Redimensionamento e troca da foto acontecem em segundo plano
+    process_avatar_async(app, user.id, data, UPLOAD_FOLDER)
+    flash('Foto de perfil recebida! Ela será atualizada em instantes.', 'success')
+    return redirect(url_for('configuracoes'))
+
+@app.route('/avatars/<path:filename>')
+def serve_avatar(filename):
+    # Nomes derivados do hash do conteúdo: o arquivo nunca muda
+    response = send_from_directory(os.path.join(UPLOAD_FOLDER, 'avatars'), filename, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @app.route('/update_password', methods=['POST'])
 def update_password():
@@ -624,7 +827,7 @@ def update_password():
     if not user.password:
         flash('Usuários autenticados via Google devem usar a recuperação de senha.', 'error')
         return redirect(url_for('configuracoes'))
-    if not check_password_hash(user.password, current_password):
+    if not password_hasher.check(user.password, current_password):
         flash('Senha atual incorreta.', 'error')
         return redirect(url_for('configuracoes'))
     if new_password != confirm_password:
@@ -634,16 +837,11 @@ def update_password():
         flash('A nova senha deve ter no mínimo 8 caracteres.', 'error')
         return redirect(url_for('configuracoes'))
     try:
-        user.password = generate_password_hash(new_password)
-        try:
-            firebase_user = auth.get_user_by_email(user.email)
-            auth.update_user(firebase_user.uid, password=new_password)
-            logger.info(f"Senha atualizada no Firebase para o usuário {user.email}")
-        except auth.UserNotFoundError:
-            logger.warning(f"Usuário não encontrado no Firebase: {user.email}")
-        except Exception as e:
-            logger.warning(f"Erro ao atualizar senha no Firebase: {str(e)}")
+        user.password = password_hasher.hash(new_password)
         db.session.commit()
+        firebase_tasks.submit(update_firebase_password, user.email, new_password)
+        # As demais sessões do usuário deixam de valer; a atual continua
+        server_sessions.revoke_user(user.id, keep=session.key)
         logger.info(f"Senha atualizada para usuário ID {user.id}")
         flash('Senha atualizada com sucesso!', 'success')
         return redirect(url_for('configuracoes'))
@@ -656,46 +854,38 @@ def update_password():
 @app.route('/active_sessions', methods=['GET'])
 def active_sessions():
     if 'user_id' not in session:
-        flash('Faça login para visualizar sessões.', 'error')
-        return redirect(url_for('registroelogin'))
-    user = db.session.get(User, session['user_id'])
-    if not user:
-        flash('Usuário não encontrado.', 'error')
-        return redirect(url_for('registroelogin'))
+        return jsonify({'status': 'error', 'message': 'Faça login para visualizar sessões.'}), 401
     try:
         sessions = [
             {
-                'id': 'session1',
-                'device': 'Unknown Device',
-                'last_active': '2025-07-05',
-                'ip_address': '192.168.1.1',
-                'is_current': True
+                'id': record['id'],
+                'device': describe_device(record['user_agent']),
+                'last_active': to_brt_str(record['last_active']),
+                'ip_address': record['ip_address'],
+                'is_current': record['id'] == session.key
             }
+            for record in server_sessions.list_sessions(session['user_id'])
         ]
-        logger.info(f"Sessões listadas para usuário ID {user.id}")
-        return render_template('active_sessions.html', user=user, sessions=sessions)
+        return jsonify({'status': 'success', 'sessions': sessions})
     except Exception as e:
-        logger.error(f"Erro ao listar sessões para usuário ID {user.id}: {str(e)}")
-        flash('Erro ao listar sessões.', 'error')
-        return redirect(url_for('configuracoes'))
+        logger.error(f"Erro ao listar sessões para usuário ID {session['user_id']}: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Erro ao listar sessões.'}), 500
 
 @app.route('/end_session/<session_id>', methods=['POST'])
 def end_session(session_id):
     if 'user_id' not in session:
-        flash('Faça login para encerrar sessões.', 'error')
-        return redirect(url_for('registroelogin'))
-    user = db.session.get(User, session['user_id'])
-    if not user:
-        flash('Usuário não encontrado.', 'error')
-        return redirect(url_for('registroelogin'))
+        return jsonify({'status': 'error', 'message': 'Faça login para encerrar sessões.'}), 401
+    user_id = session['user_id']
     try:
-        logger.info(f"Tentativa de encerrar sessão {session_id} para usuário ID {user.id}")
-        flash('Sessão encerrada com sucesso!', 'success')
-        return redirect(url_for('configuracoes'))
+        if not server_sessions.revoke(session_id, user_id=user_id):
+            return jsonify({'status': 'error', 'message': 'Sessão não encontrada.'}), 404
+        if session_id == session.key:
+            session.clear()
+        logger.info(f"Sessão {session_id[:12]} encerrada para usuário ID {user_id}")
+        return jsonify({'status': 'success', 'message': 'Sessão encerrada com sucesso!'})
     except Exception as e:
-        logger.error(f"Erro ao encerrar sessão {session_id} para usuário ID {user.id}: {str(e)}")
-        flash('Erro ao encerrar sessão.', 'error')
-        return redirect(url_for('configuracoes'))
+        logger.error(f"Erro ao encerrar sessão {session_id[:12]} para usuário ID {user_id}: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Erro ao encerrar sessão.'}), 500
 
 @app.route('/delete_account', methods=['POST'])
 def delete_account():
@@ -707,32 +897,28 @@ def delete_account():
         flash('Usuário não encontrado.', 'error')
         return redirect(url_for('registroelogin'))
     password = request.form.get('password')
-    if user.password and not check_password_hash(user.password, password):
+    if user.password and not password_hasher.check(user.password, password):
         flash('Senha incorreta.', 'error')
         return redirect(url_for('configuracoes'))
     try:
+        server_sessions.revoke_user(user.id)
+        release_user_content(user.id)
         Post.query.filter_by(user_id=user.id).delete()
         Comment.query.filter_by(user_id=user.id).delete()
         Like.query.filter_by(user_id=user.id).delete()
+        PageVisit.query.filter_by(user_id=user.id).delete()
+        ActivityEvent.query.filter_by(user_id=user.id).delete()
+        UserActivityTotals.query.filter_by(user_id=user.id).delete()
+        LeaderboardEntry.query.filter_by(user_id=user.id).delete()
+        activity_buffer.discard(user.id)
         ResetCode.query.filter_by(email=user.email).delete()
-        if user.profile_pic and user.profile_pic != 'default.png':
-            file_path = os.path.join(app.root_path, 'static', 'Uploads', user.profile_pic)
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    logger.info(f"Foto de perfil removida: {file_path}")
-                except Exception as e:
-                    logger.warning(f"Erro ao remover foto de perfil: {str(e)}")
-        try:
-            firebase_user = auth.get_user_by_email(user.email)
-            auth.delete_user(firebase_user.uid)
-            logger.info(f"Usuário {user.email} deletado do Firebase Authentication")
-        except auth.UserNotFoundError:
-            logger.warning(f"Usuário não encontrado no Firebase: {user.email}")
-        except Exception as e:
-            logger.warning(f"Erro ao deletar usuário do Firebase: {str(e)}")
+        profile_pic = user.profile_pic
+        email = user.email
         db.session.delete(user)
         db.session.commit()
+        firebase_tasks.submit(delete_firebase_user, email)
+        # Depois do commit; avatares processados (compartilhados por hash) ficam para a varredura periódica
+        remove_profile_pic_files(UPLOAD_FOLDER, profile_pic)
         session.clear()
         logger.info(f"Conta deletada com sucesso para usuário ID {user.id}")
         flash('Conta excluída com sucesso!', 'success')
@@ -743,32 +929,74 @@ def delete_account():
         flash('Erro ao excluir conta.', 'error')
         return redirect(url_for('configuracoes'))
 
+# Rótulos e limites da busca
+SEARCH_TYPE_LABELS = {'post': 'Postagem', 'comment': 'Comentário', 'code': 'Exemplo de Código'}
+SEARCH_PER_PAGE = 10
+SEARCH_MAX_PAGE = 50
+
+def search_hit_to_json(hit):
+    obj = hit['object']
+    if hit['kind'] == 'post':
+        title, category = obj.content, obj.category
+        url = url_for('post_comments', post_id=obj.id, _external=True)
+    elif hit['kind'] == 'comment':
+        title, category = obj.content, None
+        url = url_for('post_comments', post_id=obj.post_id, _external=True)
+    else:
+        title, category = obj.title, obj.category
+        url = url_for('codigo', _external=True)
+    return {
+        'title': title[:100] + '...' if len(title) > 100 else title,
+        'type': SEARCH_TYPE_LABELS[hit['kind']],
+        'category': category,
+        'snippet': hit['snippet'],
+        'score': hit['score'],
+        'url': url
+    }
+
+# Resultados da busca em cache; invalidados por qualquer escrita em posts ou comentários
+SEARCH_CACHE_TIMEOUT = 60
+
 @app.route('/search', methods=['GET'])
-@cache.cached(timeout=60, query_string=True)
 def search():
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({'status': 'error', 'message': 'Por favor, faça login para realizar buscas.'}), 401
     query = request.args.get('q', '').strip()
+    page = min(max(request.args.get('page', 1, type=int), 1), SEARCH_MAX_PAGE)
     if len(query) < 2:
-        return jsonify([]), 200
+        return jsonify({'status': 'success', 'results': [], 'page': page, 'has_more': False}), 200
+    def run_search():
+        hits, has_more = search_index.search(query, page=page, per_page=SEARCH_PER_PAGE)
+        return {'results': [search_hit_to_json(hit) for hit in hits], 'has_more': has_more}
     try:
-        posts = Post.query.filter(
-            Post.content.ilike(f'%{query}%') | Post.category.ilike(f'%{query}%')
-        ).order_by(Post.created_at.desc()).limit(10).all()
-        results = [
-            {
-                'title': post.content[:100] + '...' if len(post.content) > 100 else post.content,
-                'type': 'Postagem',
-                'category': post.category,
-                'url': url_for('post_comments', post_id=post.id, _external=True)
-            } for post in posts
-        ]
-        return jsonify(results), 200
+        found = shared_cache.remember(f"search:{page}:{query.lower()}", run_search,
+                                      timeout=SEARCH_CACHE_TIMEOUT, tags=('posts', 'comments', 'code_examples'))
+        return jsonify({'status': 'success', 'page': page, **found}), 200
     except Exception as e:
         logger.error(f"Erro na busca: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Erro ao realizar busca.'}), 500
 
+@app.route('/suggest', methods=['GET'])
+def suggest():
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Por favor, faça login para realizar buscas.'}), 401
+    query = request.args.get('q', '').strip()
+    kinds = [kind for kind in request.args.get('types', '').split(',') if kind in SUGGESTION_KINDS]
+    limit = request.args.get('limit', 8, type=int)
+    if not query:
+        return jsonify({'status': 'success', 'suggestions': []}), 200
+    try:
+        response = jsonify({
+            'status': 'success',
+            'suggestions': suggestions.suggest(query, kinds=kinds or None, limit=max(limit, 1))
+        })
+        response.headers['Cache-Control'] = 'private, max-age=60'
+        return response, 200
+    except Exception as e:
+        logger.error(f"Erro ao gerar sugestões: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Erro ao gerar sugestões.'}), 500
+
 @app.route('/code_examples', methods=['GET'])
 def code_examples():
     try:
@@ -791,8 +1019,7 @@ def code_examples():
 def create_post():
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'Por favor, faça login para realizar esta ação.'}), 401
-    user_id = session['user_id']
-    user = db.session.get(User, user_id)
+    user = current_user()
     if not user:
         session.clear()
         return jsonify({'status': 'error', 'message': 'Sua sessão expirou ou o usuário não existe mais.'}), 401
@@ -943,9 +1170,14 @@ def delete_comment(comment_id):
     if comment.user_id != session['user_id']:
         return jsonify({'status': 'error', 'message': 'Você não tem permissão para deletar este comentário.'}), 403
     try:
-        Comment.query.filter_by(parent_id=comment_id).delete()
+        reply_authors = [user_id for (user_id,) in db.session.query(Comment.user_id).filter_by(parent_id=comment_id)]
+        deleted_replies = Comment.query.filter_by(parent_id=comment_id).delete()
+        adjust_post_comment_count(comment.post_id, -deleted_replies)
         db.session.delete(comment)
         db.session.commit()
+        track_user_activity('comment_deleted')
+        for author_id in reply_authors:
+            track_user_activity('comment_deleted', user_id=author_id)
         return jsonify({'status': 'success', 'message': 'Comentário deletado com sucesso!'})
     except Exception as e:
         db.session.rollback()
@@ -962,6 +1194,7 @@ def delete_reply(reply_id):
     try:
         db.session.delete(reply)
         db.session.commit()
+        track_user_activity('comment_deleted')
         return jsonify({'status': 'success', 'message': 'Resposta deletada com sucesso!'})
     except Exception as e:
         db.session.rollback()
@@ -972,46 +1205,24 @@ def delete_reply(reply_id):
 def like_post(post_id):
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'Por favor, faça login para curtir.'}), 401
-    post = Post.query.get_or_404(post_id)
-    user_id = session['user_id']
-    existing_like = Like.query.filter_by(user_id=user_id, post_id=post_id).first()
-    if existing_like:
-        try:
-            db.session.delete(existing_like)
-            db.session.commit()
-            like_count = Like.query.filter_by(post_id=post_id).count()
-            return jsonify({
-                'status': 'success',
-                'message': 'Curtida removida com sucesso!',
-                'liked': False,
-                'likes': like_count
-            })
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Erro ao remover curtida: {str(e)}")
-            return jsonify({'status': 'error', 'message': 'Erro ao remover curtida.'}), 500
-    else:
-        new_like = Like(user_id=user_id, post_id=post_id)
-        try:
-            db.session.add(new_like)
-            db.session.commit()
-            track_user_activity('like_given')
-            like_count = Like.query.filter_by(post_id=post_id).count()
-            return jsonify({
-                'status': 'success',
-                'message': 'Postagem curtida com sucesso!',
-                'liked': True,
-                'likes': like_count
-            })
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Erro ao adicionar curtida: {str(e)}")
-            return jsonify({'status': 'error', 'message': 'Erro ao curtir postagem.'}), 500
+    Post.query.get_or_404(post_id)
+    try:
+        liked, like_count = toggle_like(session['user_id'], post_id=post_id)
+    except Exception as e:
+        logger.error(f"Erro ao alternar curtida da postagem: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Erro ao curtir postagem.'}), 500
+    track_user_activity('like_given' if liked else 'like_removed')
+    return jsonify({
+        'status': 'success',
+        'message': 'Postagem curtida com sucesso!' if liked else 'Curtida removida com sucesso!',
+        'liked': liked,
+        'likes': like_count
+    })
 
 @app.route('/get_post_likes/<int:post_id>', methods=['GET'])
 def get_post_likes(post_id):
     post = Post.query.get_or_404(post_id)
-    like_count = Like.query.filter_by(post_id=post_id).count()
+    like_count = post.like_count
     user_liked = False
     if 'user_id' in session:
         user_liked = Like.query.filter_by(user_id=session['user_id'], post_id=post_id).first() is not None
@@ -1026,45 +1237,25 @@ def like_comment(comment_id):
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'Por favor, faça login para curtir.'}), 401
     comment = Comment.query.get_or_404(comment_id)
-    user_id = session['user_id']
-    existing_like = Like.query.filter_by(user_id=user_id, comment_id=comment_id).first()
-    if existing_like:
-        try:
-            db.session.delete(existing_like)
-            db.session.commit()
-            like_count = Like.query.filter_by(comment_id=comment_id).count()
-            return jsonify({
-                'status': 'success',
-                'message': 'Curtida removida com sucesso!',
-                'liked': False,
-                'like_count': like_count
-            })
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Erro ao remover curtida: {str(e)}")
-            return jsonify({'status': 'error', 'message': 'Erro ao remover curtida.'}), 500
-    else:
-        new_like = Like(user_id=user_id, comment_id=comment_id)
-        try:
-            db.session.add(new_like)
-            db.session.commit()
-            track_user_activity('like_given')
-            like_count = Like.query.filter_by(comment_id=comment_id).count()
-            return jsonify({
-                'status': 'success',
-                'message': 'Comentário curtido com sucesso!',
-                'liked': True,
-                'like_count': like_count
-            })
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Erro ao adicionar curtida: {str(e)}")
-            return jsonify({'status': 'error', 'message': 'Erro ao curtir comentário.'}), 500
+    # O contador do comentário aparece no fragmento do post
+    invalidate_on_commit(post_tag(comment.post_id))
+    try:
+        liked, like_count = toggle_like(session['user_id'], comment_id=comment_id)
+    except Exception as e:
+        logger.error(f"Erro ao alternar curtida do comentário: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Erro ao curtir comentário.'}), 500
+    track_user_activity('like_given' if liked else 'like_removed')
+    return jsonify({
+        'status': 'success',
+        'message': 'Comentário curtido com sucesso!' if liked else 'Curtida removida com sucesso!',
+        'liked': liked,
+        'like_count': like_count
+    })
 
 @app.route('/get_comment_likes/<int:comment_id>', methods=['GET'])
 def get_comment_likes(comment_id):
     comment = Comment.query.get_or_404(comment_id)
-    like_count = Like.query.filter_by(comment_id=comment_id).count()
+    like_count = comment.like_count
     user_liked = False
     if 'user_id' in session:
         user_liked = Like.query.filter_by(user_id=session['user_id'], comment_id=comment_id).first() is not None
@@ -1074,6 +1265,52 @@ def get_comment_likes(comment_id):
         'user_liked': user_liked
     })
 
+# Limite de ids aceitos por chamada ao endpoint de curtidas em lote
+MAX_LIKE_STATE_IDS = 500
+
+def parse_id_list(raw):
+    """Converte uma lista separada por vírgulas ("1,2,3") em um conjunto de inteiros."""
+    if not raw:
+        return set()
+    try:
+        return {int(value) for value in raw.split(',') if value.strip()}
+    except ValueError:
+        raise BadRequest('Lista de ids inválida.')
+
+@app.route('/get_likes', methods=['GET'])
+def get_likes():
+    """Retorna contagem de curtidas e o estado do usuário para vários posts e comentários de uma vez."""
+    try:
+        post_ids = parse_id_list(request.args.get('post_ids'))
+        comment_ids = parse_id_list(request.args.get('comment_ids'))
+    except BadRequest as e:
+        return jsonify({'status': 'error', 'message': e.description}), 400
+    if len(post_ids) + len(comment_ids) > MAX_LIKE_STATE_IDS:
+        return jsonify({'status': 'error', 'message': f'Máximo de {MAX_LIKE_STATE_IDS} ids por requisição.'}), 400
+    posts = {str(post_id): {'like_count': 0, 'user_liked': False} for post_id in post_ids}
+    comments = {str(comment_id): {'like_count': 0, 'user_liked': False} for comment_id in comment_ids}
+    if not post_ids and not comment_ids:
+        return jsonify({'status': 'success', 'posts': posts, 'comments': comments})
+    # Contagens vêm dos contadores desnormalizados; só o estado do usuário consulta likes
+    if post_ids:
+        for post_id, like_count in db.session.query(Post.id, Post.like_count).filter(Post.id.in_(list(post_ids))):
+            posts[str(post_id)]['like_count'] = like_count
+    if comment_ids:
+        for comment_id, like_count in db.session.query(Comment.id, Comment.like_count).filter(Comment.id.in_(list(comment_ids))):
+            comments[str(comment_id)]['like_count'] = like_count
+    user_id = session.get('user_id')
+    if user_id:
+        liked = db.session.query(Like.post_id, Like.comment_id).filter(
+            Like.user_id == user_id,
+            db.or_(Like.post_id.in_(list(post_ids)), Like.comment_id.in_(list(comment_ids)))
+        )
+        for post_id, comment_id in liked:
+            if comment_id in comment_ids:
+                comments[str(comment_id)]['user_liked'] = True
+            elif post_id in post_ids:
+                posts[str(post_id)]['user_liked'] = True
+    return jsonify({'status': 'success', 'posts': posts, 'comments': comments})
+
 @app.route('/delete_post/<int:post_id>', methods=['DELETE'])
 def delete_post(post_id):
     if 'user_id' not in session:
@@ -1084,6 +1321,7 @@ def delete_post(post_id):
     try:
         db.session.delete(post)
         db.session.commit()
+        track_user_activity('post_deleted')
         return jsonify({'status': 'success', 'message': 'Postagem deletada com sucesso!'})
     except Exception as e:
         db.session.rollback()
@@ -1104,6 +1342,120 @@ def serve_pdfs_slides_json():
         logger.error(f"Erro ao servir pdfs_slides.json: {str(e)}")
         return render_template('404.html'), 404
 
+@app.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Corrige divergências nos contadores de curtidas, comentários e respostas."""
+    fixed = reconcile_counters()
+    for name, rows in fixed.items():
+        logger.info(f"{name}: {rows} linha(s) corrigida(s)")
+    print(f"Contadores reconciliados: {fixed}")
+
+@app.cli.command('rebuild-activity-totals')
+def rebuild_activity_totals_command():
+    """Recalcula user_activity_totals a partir de activity_events com os pesos atuais."""
+    users = ProgressTracker.rebuild_activity_totals()
+    print(f"Totais de atividade recalculados para {users} usuário(s).")
+
+@app.cli.command('rebuild-leaderboard')
+def rebuild_leaderboard_command():
+    """Recalcula e materializa o ranking de todos os usuários (rodar periodicamente)."""
+    started = time.perf_counter()
+    users = rebuild_leaderboard()
+    print(f"Ranking recalculado para {users} usuário(s) em {time.perf_counter() - started:.2f}s.")
+
+@app.cli.command('backfill-analytics')
+@click.option('--chunk-size', default=analytics.BACKFILL_CHUNK, type=int, help='Linhas lidas por consulta.')
+def backfill_analytics_command(chunk_size):
+    """Recalcula as séries de analytics a partir do histórico (idempotente)."""
+    rows = analytics.backfill_rollups(
+        chunk_size=chunk_size,
+        progress=lambda table, last_id: logger.info(f"{table}: processado até o id {last_id}")
+    )
+    print(f"Séries de analytics recalculadas: {rows} linha(s).")
+
+@app.cli.command('send-queued-emails')
+def send_queued_emails_command():
+    """Envia agora os e-mails vencidos da fila e mostra quantos restam por status."""
+    try:
+        while mail_queue.process_due():
+            pass
+    finally:
+        mail_queue.close()
+    print(f"Fila de e-mails: {mail_queue.depth()}")
+
+@app.cli.command('sweep-reset-codes')
+def sweep_reset_codes_command():
+    """Apaga os códigos de redefinição de senha expirados."""
+    removed = sweep_expired_reset_codes()
+    db.session.commit()
+    print(f"{removed} código(s) expirado(s) removido(s).")
+
+@app.cli.command('cleanup-sessions')
+def cleanup_sessions_command():
+    """Apaga as sessões logadas expiradas."""
+    print(f"{server_sessions.cleanup()} sessão(ões) expirada(s) removida(s).")
+
+@app.cli.command('sweep-avatars')
+def sweep_avatars_command():
+    """Apaga variantes de avatar que nenhum usuário usa há mais de uma hora."""
+    removed = sweep_unreferenced_avatars(UPLOAD_FOLDER)
+    print(f"{removed} variante(s) de avatar sem uso removida(s).")
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Reconstrói o índice de busca textual a partir de posts, comentários e exemplos."""
+    search_index.rebuild_search_index()
+    print("Índice de busca reconstruído.")
+
+@app.cli.command('build-thumbnails')
+@click.option('--workers', default=None, type=int, help='Processos usados para gerar as imagens (padrão: nº de CPUs).')
+def build_thumbnails_command(workers):
+    """Gera as variantes WebP/JPEG das miniaturas novas ou alteradas."""
+    generated, reused, removed = build_thumbnails(THUMBNAILS_FOLDER, THUMBNAIL_CACHE_FOLDER, workers=workers)
+    print(f"Miniaturas: {generated} gerada(s), {reused} reaproveitada(s), {removed} variante(s) órfã(s) removida(s).")
+
+@app.cli.command('check-query-plans')
+@click.option('--seed', default=0, type=int,
+              help='Verifica em um SQLite em memória com N postagens sintéticas em vez do banco configurado.')
+def check_query_plans_command(seed):
+    """Falha (código 1) se alguma consulta crítica fizer varredura completa de tabela."""
+    engine = seeded_sqlite_engine(seed) if seed else db.engine
+    with engine.connect() as connection:
+        plans, regressions = check_query_plans(connection)
+    for name, plan in plans.items():
+        status = 'FULL SCAN' if name in regressions else 'ok'
+        print(f"[{status}] {name}")
+        for row in plan:
+            print(f"    {row}")
+    if regressions:
+        print(f"{len(regressions)} consulta(s) sem índice: {', '.join(regressions)}")
+        raise SystemExit(1)
+    print("Todas as consultas críticas usam índices.")
+
+@app.cli.command('bench-password-hashing')
+@click.option('--concurrency', default=16, type=int, help='Logins simultâneos.')
+@click.option('--logins', default=128, type=int, help='Total de logins em cada rodada.')
+def bench_password_hashing_command(concurrency, logins):
+    """Compara a latência de login com o hashing inline e no pool de processos.
+
+    Para reproduzir um worker gevent, rode com monkey patching:
+    python -m gevent.monkey $(which flask) bench-password-hashing
+    """
+    configured = app.config['PASSWORD_HASH_WORKERS'] or 1
+    runs = [
+        ('inline', PasswordHasher(workers=0)),
+        (f'pool ({configured} processo(s))', PasswordHasher(workers=configured,
+                                                           max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+                                                           queue_timeout=60)),
+    ]
+    for name, hasher in runs:
+        try:
+            result = benchmark_password_hashing(hasher, concurrency, logins)
+        finally:
+            hasher.shutdown()
+        print(f"{name}: login p50 {result['login_p50_ms']:.0f} ms, p99 {result['login_p99_ms']:.0f} ms, "
+              f"atraso p99 das demais tarefas {result['stall_p99_ms']:.1f} ms, {result['logins_per_s']:.1f} logins/s")
+
 with app.app_context():
     try:
         instance_dir = app.config['INSTANCE_DIR']
@@ -1118,6 +1470,10 @@ with app.app_context():
                 pass
         
         db.create_all()
+        search_index.ensure_search_index()
+        # Carrega os catálogos já na inicialização para reportar file_path quebrados
+        for catalog in catalogs.values():
+            catalog.refresh()
         if not CodeExample.query.first():
             examples = [
                 CodeExample(
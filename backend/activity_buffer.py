@@ -0,0 +1,206 @@
+import atexit
+import logging
+import threading
+from datetime import datetime
+import pytz
+from sqlalchemy import bindparam
+from backend.extensions import db
+from backend.models import User, PageVisit, ActivityEvent, UserActivityTotals
+from backend.upsert import upsert, insert_new
+from backend.analytics import record_active_users
+
+logger = logging.getLogger(__name__)
+
+# Intervalo máximo entre gravações e quantos usuários pendentes antecipam a gravação
+FLUSH_INTERVAL = 5
+FLUSH_THRESHOLD = 200
+
+users_table = User.__table__
+page_visits_table = PageVisit.__table__
+activity_events_table = ActivityEvent.__table__
+totals_table = UserActivityTotals.__table__
+
+
+class ActivityBuffer:
+    """Buffer write-behind para visitas de página, eventos de atividade e last_activity.
+
+    As requisições só registram o evento em memória; uma thread grava tudo a
+    cada FLUSH_INTERVAL segundos (ou antes, ao atingir FLUSH_THRESHOLD
+    usuários) em lote: em page_visits, um INSERT sem duplicatas (que revela
+    as primeiras visitas) e o upsert das já existentes; um INSERT
+    executemany em activity_events, o upsert dos totais agregados em
+    user_activity_totals, um UPDATE executemany de last_activity e a contagem
+    de usuários ativos por hora/dia, tudo na mesma transação. Visitas do
+    mesmo usuário são agrupadas: por página guarda a primeira e a última
+    visita e quantas foram.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._visits = {}
+        self._events = {}
+        self._last_activity = {}
+        self._listeners = []
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        atexit.register(self.flush)
+
+    def _ensure_thread(self):
+        # Iniciada no primeiro evento, não na importação (comandos flask não precisam dela)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='activity-buffer', daemon=True)
+            self._thread.start()
+
+    def on_flush(self, listener):
+        """Registra listener(user_ids), chamado após cada gravação bem-sucedida."""
+        self._listeners.append(listener)
+        return listener
+
+    def _pending_users(self):
+        return len(self._visits.keys() | self._events.keys() | self._last_activity.keys())
+
+    def record_visit(self, user_id, page_name, visited_at):
+        with self._lock:
+            pages = self._visits.setdefault(user_id, {})
+            if page_name in pages:
+                first_seen, _, count = pages[page_name]
+                pages[page_name] = (first_seen, visited_at, count + 1)
+            else:
+                pages[page_name] = (visited_at, visited_at, 1)
+            self._bump_activity(user_id, visited_at)
+            self._after_record()
+
+    def record_activity(self, user_id, activity_at):
+        with self._lock:
+            self._bump_activity(user_id, activity_at)
+            self._after_record()
+
+    def record_event(self, user_id, activity_type, created_at):
+        """Enfileira um evento para activity_events (não altera last_activity)."""
+        with self._lock:
+            self._events.setdefault(user_id, []).append((activity_type, created_at))
+            self._after_record()
+
+    def discard(self, user_id):
+        """Descarta o que está pendente de um usuário (ex.: conta excluída)."""
+        with self._lock:
+            self._visits.pop(user_id, None)
+            self._events.pop(user_id, None)
+            self._last_activity.pop(user_id, None)
+
+    def _bump_activity(self, user_id, activity_at):
+        current = self._last_activity.get(user_id)
+        if current is None or activity_at > current:
+            self._last_activity[user_id] = activity_at
+
+    def _after_record(self):
+        self._ensure_thread()
+        if self._pending_users() >= FLUSH_THRESHOLD:
+            self._wakeup.set()
+
+    def has_pending(self, user_id):
+        with self._lock:
+            return user_id in self._visits or user_id in self._events or user_id in self._last_activity
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Grava os eventos pendentes. Seguro para chamar de qualquer thread."""
+        with self._lock:
+            visits, self._visits = self._visits, {}
+            events, self._events = self._events, {}
+            last_activity, self._last_activity = self._last_activity, {}
+        if not visits and not events and not last_activity or self.app is None:
+            return
+        with self.app.app_context():
+            try:
+                self._write(visits, events, last_activity)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erro ao gravar atividades em lote: {str(e)}")
+                self._requeue(visits, events, last_activity)
+                return
+            finally:
+                db.session.remove()
+        user_ids = visits.keys() | events.keys() | last_activity.keys()
+        for listener in self._listeners:
+            try:
+                listener(user_ids)
+            except Exception as e:
+                logger.error(f"Erro no listener de gravação de atividades: {str(e)}")
+
+    def _requeue(self, visits, events, last_activity):
+        # Devolve ao buffer para a próxima tentativa, sem sobrescrever eventos mais novos
+        with self._lock:
+            for user_id, pending_events in events.items():
+                self._events[user_id] = pending_events + self._events.get(user_id, [])
+            for user_id, pages in visits.items():
+                pending = self._visits.setdefault(user_id, {})
+                for page_name, (first_seen, last_seen, count) in pages.items():
+                    if page_name in pending:
+                        _, newer_last_seen, newer_count = pending[page_name]
+                        pending[page_name] = (first_seen, newer_last_seen, count + newer_count)
+                    else:
+                        pending[page_name] = (first_seen, last_seen, count)
+            for user_id, activity_at in last_activity.items():
+                self._bump_activity(user_id, activity_at)
+
+    def _write(self, visits, events, last_activity):
+        # Importado aqui: progress_tracker importa este módulo
+        from backend.progress_tracker import ProgressTracker
+
+        connection = db.session.connection()
+        dialect = connection.dialect.name
+        events = {user_id: list(user_events) for user_id, user_events in events.items()}
+        if visits:
+            rows = [{'user_id': user_id, 'page': page_name, 'first_seen': first_seen,
+                     'last_seen': last_seen, 'count': count}
+                    for user_id, pages in visits.items()
+                    for page_name, (first_seen, last_seen, count) in pages.items()]
+            # A primeira visita a uma página vira um evento page_visit (é ela que pontua).
+            # Quem a detecta é o INSERT sem duplicatas: com dois processos gravando o mesmo
+            # par ao mesmo tempo, só um deles o insere
+            inserted = insert_new(connection, page_visits_table, ['user_id', 'page'], rows)
+            existing = [row for row in rows if (row['user_id'], row['page']) not in inserted]
+            if existing:
+                connection.execute(
+                    upsert(dialect, page_visits_table, ['user_id', 'page'], added=['count'], replaced=['last_seen']),
+                    existing
+                )
+            for row in rows:
+                if (row['user_id'], row['page']) in inserted:
+                    events.setdefault(row['user_id'], []).append(('page_visit', row['first_seen']))
+        if events:
+            connection.execute(activity_events_table.insert(), [
+                {'user_id': user_id, 'type': activity_type, 'created_at': created_at}
+                for user_id, user_events in events.items()
+                for activity_type, created_at in user_events
+            ])
+            now = datetime.now(pytz.UTC)
+            deltas = ProgressTracker.fold_events(events)
+            if deltas:
+                columns = list(ProgressTracker.TOTALS_COLUMNS)
+                connection.execute(
+                    upsert(dialect, totals_table, ['user_id'], added=columns, replaced=['updated_at']),
+                    [dict(row, user_id=user_id, updated_at=now) for user_id, row in deltas.items()]
+                )
+        if last_activity:
+            connection.execute(
+                users_table.update()
+                .where(users_table.c.id == bindparam('uid'))
+                .values(last_activity=bindparam('ts')),
+                [{'uid': user_id, 'ts': ts} for user_id, ts in last_activity.items()]
+            )
+            record_active_users(connection, last_activity)
+
+
+activity_buffer = ActivityBuffer()
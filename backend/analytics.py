@@ -0,0 +1,254 @@
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+import pytz
+from sqlalchemy import event
+from backend.extensions import db
+from backend.models import Post, Comment, Like, ActivityEvent, AnalyticsRollup, ActiveUserBucket
+from backend.upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('hour', 'day')
+METRICS = ('active_users', 'posts', 'comments', 'likes')
+# Quantos buckets a API aceita devolver por granularidade
+MAX_BUCKETS = {'hour': 24 * 14, 'day': 366}
+ACTIVE_USERS_RETENTION = timedelta(days=2)
+BACKFILL_CHUNK = 5000
+
+rollups_table = AnalyticsRollup.__table__
+active_users_table = ActiveUserBucket.__table__
+posts_table = Post.__table__
+comments_table = Comment.__table__
+likes_table = Like.__table__
+events_table = ActivityEvent.__table__
+ROLLUP_KEY = ['granularity', 'metric', 'bucket_start', 'dimension']
+
+_pruned_at = None
+
+
+def to_utc_naive(moment):
+    if moment is None:
+        moment = datetime.now(pytz.UTC)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(pytz.UTC).replace(tzinfo=None)
+    return moment
+
+
+def bucket_start(moment, granularity):
+    """Início da hora ou do dia (UTC) que contém moment."""
+    moment = to_utc_naive(moment)
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_step(granularity):
+    return timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+
+
+def _increment(connection, rows):
+    """Soma value nas linhas de rollup (granularity, metric, bucket_start, dimension)."""
+    if rows:
+        connection.execute(upsert(connection.dialect.name, rollups_table, ROLLUP_KEY, added=['value'], replaced=[]), rows)
+
+
+def _count(connection, metric, moment, dimension):
+    _increment(connection, [
+        {'granularity': granularity, 'metric': metric, 'bucket_start': bucket_start(moment, granularity),
+         'dimension': dimension or '', 'value': 1}
+        for granularity in GRANULARITIES
+    ])
+
+
+# Como em backend/counters.py, os listeners rodam dentro do flush, na mesma
+# transação do INSERT. Só contam criações: as séries medem volume escrito.
+
+@event.listens_for(Post, 'after_insert')
+def _post_inserted(mapper, connection, target):
+    _count(connection, 'posts', target.created_at, target.category)
+
+
+@event.listens_for(Comment, 'after_insert')
+def _comment_inserted(mapper, connection, target):
+    category = connection.execute(
+        db.select(posts_table.c.category).where(posts_table.c.id == target.post_id)
+    ).scalar()
+    _count(connection, 'comments', target.created_at, category)
+
+
+@event.listens_for(Like, 'after_insert')
+def _like_inserted(mapper, connection, target):
+    count_like(connection, target.post_id is not None, target.created_at)
+
+
+def count_like(connection, on_post, created_at=None):
+    """Conta uma curtida nova; usada também pelo INSERT direto de backend/likes.py."""
+    _count(connection, 'likes', created_at, 'post' if on_post else 'comment')
+
+
+def record_active_users(connection, last_activity):
+    """Conta cada usuário uma vez por hora e por dia em active_users.
+
+    Chamado pelo activity_buffer na gravação em lote, com {user_id: horário}.
+    """
+    pairs = {
+        (granularity, bucket_start(activity_at, granularity), user_id)
+        for user_id, activity_at in last_activity.items()
+        for granularity in GRANULARITIES
+    }
+    buckets = {(granularity, start) for granularity, start, _ in pairs}
+    user_ids = list(last_activity)
+    counted = set()
+    for granularity, start in buckets:
+        counted.update(
+            (granularity, start, user_id)
+            for (user_id,) in connection.execute(
+                db.select(active_users_table.c.user_id).where(
+                    active_users_table.c.granularity == granularity,
+                    active_users_table.c.bucket_start == start,
+                    active_users_table.c.user_id.in_(user_ids)
+                )
+            )
+        )
+    new_pairs = pairs - counted
+    if new_pairs:
+        connection.execute(active_users_table.insert(), [
+            {'granularity': granularity, 'bucket_start': start, 'user_id': user_id}
+            for granularity, start, user_id in new_pairs
+        ])
+        per_bucket = Counter((granularity, start) for granularity, start, _ in new_pairs)
+        _increment(connection, [
+            {'granularity': granularity, 'metric': 'active_users', 'bucket_start': start,
+             'dimension': '', 'value': total}
+            for (granularity, start), total in per_bucket.items()
+        ])
+    _prune_active_users(connection)
+
+
+def _prune_active_users(connection):
+    # No máximo uma vez por hora por processo
+    global _pruned_at
+    now = to_utc_naive(None)
+    if _pruned_at is not None and now - _pruned_at < timedelta(hours=1):
+        return
+    for granularity in GRANULARITIES:
+        connection.execute(active_users_table.delete().where(
+            active_users_table.c.granularity == granularity,
+            active_users_table.c.bucket_start < now - ACTIVE_USERS_RETENTION
+        ))
+    _pruned_at = now
+
+
+def _chunks(connection, table, columns, chunk_size, from_clause=None):
+    """Percorre a tabela em blocos ordenados pelo id (paginação por chave)."""
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            db.select(table.c.id, *columns)
+            .select_from(from_clause if from_clause is not None else table)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def backfill_rollups(chunk_size=BACKFILL_CHUNK, progress=None):
+    """Recalcula todas as séries a partir do histórico, lendo as tabelas em blocos.
+
+    Substitui o conteúdo de analytics_rollups e active_user_buckets numa única
+    transação; rodar de novo dá o mesmo resultado. Usuários ativos no histórico
+    vêm de activity_events. Retorna o número de linhas de rollup gravadas.
+    """
+    connection = db.session.connection()
+    totals = Counter()
+
+    def add(metric, moment, dimension, value=1):
+        for granularity in GRANULARITIES:
+            totals[(granularity, metric, bucket_start(moment, granularity), dimension or '')] += value
+
+    for rows in _chunks(connection, posts_table, [posts_table.c.created_at, posts_table.c.category], chunk_size):
+        for _, created_at, category in rows:
+            add('posts', created_at, category)
+        if progress:
+            progress('posts', rows[-1][0])
+    comments_with_category = comments_table.outerjoin(posts_table, posts_table.c.id == comments_table.c.post_id)
+    for rows in _chunks(connection, comments_table, [comments_table.c.created_at, posts_table.c.category],
+                        chunk_size, from_clause=comments_with_category):
+        for _, created_at, category in rows:
+            add('comments', created_at, category)
+        if progress:
+            progress('comments', rows[-1][0])
+    for rows in _chunks(connection, likes_table, [likes_table.c.created_at, likes_table.c.post_id], chunk_size):
+        for _, created_at, post_id in rows:
+            add('likes', created_at, 'post' if post_id else 'comment')
+        if progress:
+            progress('likes', rows[-1][0])
+
+    # Usuários distintos por bucket; os buckets recentes também vão para active_user_buckets
+    cutoff = to_utc_naive(None) - ACTIVE_USERS_RETENTION
+    active = {}
+    for rows in _chunks(connection, events_table, [events_table.c.created_at, events_table.c.user_id], chunk_size):
+        for _, created_at, user_id in rows:
+            for granularity in GRANULARITIES:
+                active.setdefault((granularity, bucket_start(created_at, granularity)), set()).add(user_id)
+        if progress:
+            progress('activity_events', rows[-1][0])
+    recent = []
+    for (granularity, start), user_ids in active.items():
+        totals[(granularity, 'active_users', start, '')] = len(user_ids)
+        if start >= cutoff:
+            recent.extend({'granularity': granularity, 'bucket_start': start, 'user_id': user_id} for user_id in user_ids)
+    active.clear()
+
+    rows = [
+        {'granularity': granularity, 'metric': metric, 'bucket_start': start, 'dimension': dimension, 'value': value}
+        for (granularity, metric, start, dimension), value in totals.items()
+    ]
+    try:
+        connection.execute(rollups_table.delete())
+        connection.execute(active_users_table.delete())
+        for start in range(0, len(rows), chunk_size):
+            connection.execute(rollups_table.insert(), rows[start:start + chunk_size])
+        for start in range(0, len(recent), chunk_size):
+            connection.execute(active_users_table.insert(), recent[start:start + chunk_size])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao preencher as séries de analytics: {str(e)}")
+        raise
+    return len(rows)
+
+
+def series(metric, granularity, buckets, end=None):
+    """Série temporal de uma métrica: os últimos `buckets` intervalos até end.
+
+    Lê só as linhas de rollup do intervalo (faixa da chave primária), então o
+    custo não depende do tamanho das tabelas de conteúdo. Intervalos sem
+    linha valem 0. Retorna {'buckets': [iso, ...], 'series': {dimensão: [valores]}}.
+    """
+    step = bucket_step(granularity)
+    last = bucket_start(end, granularity)
+    first = last - step * (buckets - 1)
+    starts = [first + step * i for i in range(buckets)]
+    positions = {start: i for i, start in enumerate(starts)}
+    rows = db.session.execute(
+        db.select(rollups_table.c.bucket_start, rollups_table.c.dimension, rollups_table.c.value)
+        .where(
+            rollups_table.c.granularity == granularity,
+            rollups_table.c.metric == metric,
+            rollups_table.c.bucket_start >= first,
+            rollups_table.c.bucket_start <= last
+        )
+    ).all()
+    result = {}
+    for start, dimension, value in rows:
+        values = result.setdefault(dimension or 'total', [0] * buckets)
+        index = positions.get(start)
+        if index is not None:
+            values[index] += value
+    return {'buckets': [start.isoformat() for start in starts], 'series': result}
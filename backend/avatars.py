@@ -0,0 +1,200 @@
+import io
+import os
+import re
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps, UnidentifiedImageError
+from backend.extensions import db
+from backend.models import User
+
+logger = logging.getLogger(__name__)
+
+# Tamanhos quadrados gerados; o de 128px é o gravado em User.profile_pic
+AVATAR_SIZES = (32, 64, 128)
+AVATAR_DIR = 'avatars'
+# Imagens com mais pixels que isso são recusadas antes de decodificar
+MAX_AVATAR_PIXELS = 4096 * 4096
+ALLOWED_FORMATS = {'PNG', 'JPEG', 'GIF', 'WEBP'}
+
+AVATAR_NAME_RE = re.compile(rf'^{AVATAR_DIR}/([0-9a-f]+)-(\d+)\.webp$')
+
+# Arquivos de avatar sem nenhum usuário só são apagados depois desse tempo sem uso,
+# pela varredura periódica (no máximo uma a cada AVATAR_SWEEP_INTERVAL por processo)
+AVATAR_GRACE_PERIOD = 3600
+AVATAR_SWEEP_INTERVAL = 3600
+
+_sweep_lock = threading.Lock()
+_last_sweep = 0
+
+# Processamento fora da thread da requisição
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='avatar')
+
+
+class AvatarError(ValueError):
+    """Upload de foto de perfil inválido (mensagem pronta para o usuário)."""
+
+
+def check_upload(data):
+    """Valida o upload lendo só o cabeçalho da imagem, sem decodificar os pixels."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, OSError):
+        raise AvatarError('O arquivo enviado não é uma imagem válida.')
+    if image_format not in ALLOWED_FORMATS:
+        raise AvatarError('Tipo de arquivo não suportado.')
+    if width * height > MAX_AVATAR_PIXELS:
+        raise AvatarError('A imagem é grande demais (máximo de 4096x4096 pixels).')
+
+
+def avatar_filename(digest, size):
+    return f"{AVATAR_DIR}/{digest}-{size}.webp"
+
+
+def is_processed_avatar(profile_pic):
+    return AVATAR_NAME_RE.match(profile_pic or '') is not None
+
+
+def avatar_variant(profile_pic, size):
+    """Nome da variante de um avatar processado, ou None para fotos antigas (arquivo bruto)."""
+    match = AVATAR_NAME_RE.match(profile_pic or '')
+    if not match:
+        return None
+    return avatar_filename(match.group(1), size)
+
+
+def render_avatar(data, upload_folder):
+    """Decodifica uma vez e grava as variantes WebP quadradas, sem EXIF.
+
+    O nome é o hash do conteúdo, então uploads iguais reaproveitam os arquivos.
+    Retorna o nome da variante de 128px (relativo a upload_folder).
+    """
+    digest = hashlib.sha256(data).hexdigest()[:24]
+    os.makedirs(os.path.join(upload_folder, AVATAR_DIR), exist_ok=True)
+    with Image.open(io.BytesIO(data)) as image:
+        largest = max(AVATAR_SIZES)
+        image.draft('RGB', (largest, largest))
+        # Aplica a rotação do EXIF antes de descartá-lo
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        for size in sorted(AVATAR_SIZES, reverse=True):
+            target = os.path.join(upload_folder, avatar_filename(digest, size))
+            try:
+                # Reaproveitado: o mtime novo impede a varredura de apagá-lo antes do commit
+                os.utime(target)
+                continue
+            except FileNotFoundError:
+                pass
+            variant = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            tmp = target + '.tmp'
+            # Sem o parâmetro exif, o WebP é gravado sem metadados
+            variant.save(tmp, 'WEBP', quality=85, method=6)
+            os.replace(tmp, target)
+    return avatar_filename(digest, largest)
+
+
+def remove_profile_pic_files(upload_folder, profile_pic):
+    """Remove uma foto antiga (arquivo bruto) que nenhum usuário usa mais.
+
+    Avatares processados são compartilhados entre usuários (nome pelo hash
+    do conteúdo) e ficam para sweep_unreferenced_avatars, que tolera uploads
+    concorrentes do mesmo arquivo.
+    """
+    if not profile_pic or profile_pic == 'default.png' or is_processed_avatar(profile_pic):
+        return
+    if User.query.filter_by(profile_pic=profile_pic).first():
+        return
+    file_path = os.path.join(upload_folder, profile_pic)
+    if os.path.exists(file_path):
+        try:
+            os.remove(file_path)
+            logger.info(f"Arquivo de perfil antigo removido: {file_path}")
+        except Exception as e:
+            logger.warning(f"Erro ao remover arquivo de perfil antigo: {str(e)}")
+
+
+def sweep_unreferenced_avatars(upload_folder, grace=AVATAR_GRACE_PERIOD):
+    """Apaga variantes de avatar sem usuário e sem uso há mais de grace segundos. Retorna quantas.
+
+    Um upload que reaproveita o arquivo o toca (render_avatar) antes de
+    gravar profile_pic. Por isso cada arquivo é renomeado antes de sair e o
+    mtime é conferido de novo: se foi tocado nesse meio tempo, ele volta.
+    Se o upload chegar depois da renomeação, não encontra o arquivo e o
+    gera de novo.
+    """
+    avatar_dir = os.path.join(upload_folder, AVATAR_DIR)
+    if not os.path.isdir(avatar_dir):
+        return 0
+    referenced = set()
+    for profile_pic, in db.session.query(User.profile_pic).filter(User.profile_pic.like(f'{AVATAR_DIR}/%')):
+        match = AVATAR_NAME_RE.match(profile_pic)
+        if match:
+            referenced.add(match.group(1))
+    cutoff = time.time() - grace
+    removed = 0
+    for filename in os.listdir(avatar_dir):
+        match = AVATAR_NAME_RE.match(f'{AVATAR_DIR}/{filename}')
+        if not match or match.group(1) in referenced:
+            continue
+        path = os.path.join(avatar_dir, filename)
+        try:
+            if os.stat(path).st_mtime > cutoff:
+                continue
+            trash = path + '.trash'
+            os.replace(path, trash)
+            if os.stat(trash).st_mtime > cutoff:
+                os.replace(trash, path)
+                continue
+            os.remove(trash)
+            removed += 1
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning(f"Erro ao remover avatar sem uso {filename}: {str(e)}")
+    if removed:
+        logger.info(f"{removed} variante(s) de avatar sem uso removida(s)")
+    return removed
+
+
+def _maybe_sweep(upload_folder):
+    global _last_sweep
+    now = time.monotonic()
+    with _sweep_lock:
+        if now - _last_sweep < AVATAR_SWEEP_INTERVAL:
+            return
+        _last_sweep = now
+    try:
+        sweep_unreferenced_avatars(upload_folder)
+    except Exception as e:
+        logger.error(f"Erro na varredura de avatares sem uso: {str(e)}")
+
+
+def _process_avatar(app, user_id, data, upload_folder):
+    try:
+        filename = render_avatar(data, upload_folder)
+    except Exception as e:
+        logger.error(f"Erro ao processar foto de perfil do usuário ID {user_id}: {str(e)}")
+        return
+    with app.app_context():
+        try:
+            user = db.session.get(User, user_id)
+            if not user:
+                return
+            old_profile_pic = user.profile_pic
+            user.profile_pic = filename
+            db.session.commit()
+            logger.info(f"Foto de perfil atualizada para usuário ID {user_id}: {filename}")
+            if old_profile_pic != filename:
+                remove_profile_pic_files(upload_folder, old_profile_pic)
+            _maybe_sweep(upload_folder)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erro ao atualizar foto de perfil: {str(e)}")
+
+
+def process_avatar_async(app, user_id, data, upload_folder):
+    """Agenda o processamento do avatar e a troca de User.profile_pic em segundo plano."""
+    return _executor.submit(_process_avatar, app, user_id, data, upload_folder)
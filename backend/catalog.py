@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import logging
+import threading
+from bisect import bisect_left
+from collections import Counter
+from backend.search import fold_text
+
+logger = logging.getLogger(__name__)
+
+SORT_FIELDS = ('relevance', 'title', 'views', 'downloads')
+MAX_PER_PAGE = 60
+
+# Buscas que equivalem a uma categoria inteira (antes resolvidas no pdfeapostilas.js)
+CATEGORY_ALIASES = {
+    'sql': 'banco de dados',
+    'python': 'linguagens de programacao',
+    'java': 'linguagens de programacao',
+    'linguagens': 'linguagens de programacao',
+    'processadores': 'estudo',
+    'compiladores': 'estudo',
+    'redes de computadores': 'redes',
+    'ia': 'redes neurais',
+}
+
+
+def parse_count(value):
+    """Converte contagens como '15K' ou '1.2K' em número para ordenação."""
+    match = re.fullmatch(r'\s*([\d.,]+)\s*([KkMm]?)\s*', str(value or ''))
+    if not match:
+        return 0
+    number = float(match.group(1).replace(',', '.'))
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(match.group(2).lower(), 1)
+    return int(number * multiplier)
+
+
+def _words(text):
+    return re.findall(r'\w+', fold_text(text or ''))
+
+
+class Catalog:
+    """Catálogo de materiais (pdfs.json / pdfs_slides.json) com índices invertidos.
+
+    O arquivo é lido uma vez e recarregado apenas quando o mtime muda. Os índices
+    por categoria, tag e autor e o vocabulário de busca são montados na carga,
+    então cada consulta só faz interseções de conjuntos.
+
+    validate, se informado, recebe cada item na carga e devolve uma mensagem de
+    erro (ou None); os problemas são registrados no log uma vez por carga.
+    """
+
+    def __init__(self, path, validate=None):
+        self.path = path
+        self.validate = validate
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.items = []
+        self.by_category = {}
+        self.by_tag = {}
+        self.by_author = {}
+        self._terms = {}
+        self._vocabulary = []
+        self._title_words = []
+        self._sort_keys = {}
+
+    def _build(self, items):
+        by_category, by_tag, by_author, terms = {}, {}, {}, {}
+        title_words = []
+        for item_id, item in enumerate(items):
+            by_category.setdefault(fold_text(item.get('category', '')), set()).add(item_id)
+            by_author.setdefault(fold_text(item.get('author', '')), set()).add(item_id)
+            for tag in item.get('tags') or []:
+                by_tag.setdefault(fold_text(tag), set()).add(item_id)
+            words = _words(' '.join([
+                item.get('title', ''), item.get('description', ''), item.get('author', ''),
+                item.get('category', ''), ' '.join(item.get('tags') or [])
+            ]))
+            for word in words:
+                terms.setdefault(word, set()).add(item_id)
+            title_words.append(set(_words(item.get('title', ''))))
+
+        self.items = items
+        self.by_category, self.by_tag, self.by_author = by_category, by_tag, by_author
+        self._terms = terms
+        self._vocabulary = sorted(terms)
+        self._title_words = title_words
+        self._sort_keys = {
+            'title': sorted(range(len(items)), key=lambda i: fold_text(items[i].get('title', ''))),
+            'views': sorted(range(len(items)), key=lambda i: -parse_count(items[i].get('views'))),
+            'downloads': sorted(range(len(items)), key=lambda i: -parse_count(items[i].get('downloads'))),
+        }
+
+    def refresh(self):
+        """Recarrega o arquivo se o mtime mudou desde a última carga."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            items = []
+            if mtime is not None:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        items = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Erro ao carregar catálogo {self.path}: {str(e)}")
+                    return
+            if self.validate:
+                self._report_invalid(items)
+            self._build(items)
+            self._mtime = mtime
+            logger.info(f"Catálogo {os.path.basename(self.path)} carregado com {len(items)} itens")
+
+    def _report_invalid(self, items):
+        problems = []
+        for item in items:
+            error = self.validate(item)
+            if error:
+                problems.append(f"{item.get('title', '?')}: {error}")
+        if problems:
+            logger.warning(
+                f"Catálogo {os.path.basename(self.path)} tem {len(problems)} item(ns) com problema: "
+                + '; '.join(problems)
+            )
+
+    def _prefix_matches(self, token):
+        """Itens que têm alguma palavra começando com token."""
+        matches = set()
+        index = bisect_left(self._vocabulary, token)
+        while index < len(self._vocabulary) and self._vocabulary[index].startswith(token):
+            matches |= self._terms[self._vocabulary[index]]
+            index += 1
+        return matches
+
+    def _text_matches(self, query):
+        tokens = _words(query)
+        result = None
+        for token in tokens:
+            matches = self._prefix_matches(token)
+            result = matches if result is None else result & matches
+        alias = CATEGORY_ALIASES.get(fold_text(query.strip()))
+        if alias:
+            result = (result or set()) | self.by_category.get(alias, set())
+        return result if result is not None else set(range(len(self.items))), tokens
+
+    def query(self, q='', category=None, tag=None, author=None, sort='relevance', page=1, per_page=24):
+        """Filtra, ordena e pagina o catálogo.
+
+        As contagens de facetas de categoria ignoram o próprio filtro de categoria
+        (e as de tag o de tag), para a interface mostrar quantos itens cada
+        opção traria.
+        """
+        self.refresh()
+        everything = set(range(len(self.items)))
+        if q.strip():
+            text_ids, tokens = self._text_matches(q)
+        else:
+            text_ids, tokens = everything, []
+        category_ids = self.by_category.get(fold_text(category), set()) if category else everything
+        tag_ids = self.by_tag.get(fold_text(tag), set()) if tag else everything
+        author_ids = self.by_author.get(fold_text(author), set()) if author else everything
+
+        without_category = text_ids & tag_ids & author_ids
+        without_tag = text_ids & category_ids & author_ids
+        matched = without_category & category_ids
+
+        if sort == 'relevance' and tokens:
+            ordered = sorted(matched, key=lambda i: (
+                -sum(1 for token in tokens if any(word.startswith(token) for word in self._title_words[i])),
+                -parse_count(self.items[i].get('views'))
+            ))
+        else:
+            ordered = [i for i in self._sort_keys.get(sort, self._sort_keys['title']) if i in matched]
+
+        start = (page - 1) * per_page
+        return {
+            'items': [self.items[i] for i in ordered[start:start + per_page]],
+            'total': len(ordered),
+            'page': page,
+            'per_page': per_page,
+            'has_more': start + per_page < len(ordered),
+            'facets': {
+                'categories': dict(Counter(self.items[i].get('category') for i in without_category)),
+                'tags': dict(Counter(tag for i in without_tag for tag in self.items[i].get('tags') or [])),
+            },
+        }
@@ -6,6 +6,25 @@ class Config:
     """Configurações comuns a todos os ambientes"""
     SECRET_KEY = os.environ.get('SECRET_KEY', 'sua_chave_secreta_padrao')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Hashing de senhas fora do worker (0 = inline); vagas e espera máxima por uma vaga
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5))
+    # Verificação local de ID tokens; sem FIREBASE_PROJECT_ID usa o projeto das credenciais.
+    # FIREBASE_CERTS_URL permite apontar para um servidor de chaves local em testes
+    FIREBASE_PROJECT_ID = os.environ.get('FIREBASE_PROJECT_ID')
+    FIREBASE_CERTS_URL = os.environ.get('FIREBASE_CERTS_URL')
+    # Onde ficam as sessões logadas: 'sql' (tabela sessions) ou 'memory' (substituto local, por processo)
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sql')
+    # Cache em dois níveis: LRU local por processo na frente do Redis (CACHE_REDIS_URL) ou,
+    # sem ele, de arquivos em CACHE_DIR (padrão: instance/cache)
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+    CACHE_DIR = os.environ.get('CACHE_DIR')
+    CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'technobug:')
+    CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 300))
+    CACHE_LOCAL_TTL = int(os.environ.get('CACHE_LOCAL_TTL', 60))
+    CACHE_LOCAL_MAX_BYTES = int(os.environ.get('CACHE_LOCAL_MAX_BYTES', 32 * 1024 * 1024))
+    CACHE_SHARED_THRESHOLD = int(os.environ.get('CACHE_SHARED_THRESHOLD', 5000))
 
 class DevelopmentConfig(Config):
     """Configurações para desenvolvimento local"""
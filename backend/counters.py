@@ -0,0 +1,119 @@
+from sqlalchemy import event
+from backend.extensions import db
+from backend.models import Post, Comment, Like
+from backend.shared_cache import invalidate_on_commit, post_tag
+
+posts_table = Post.__table__
+comments_table = Comment.__table__
+likes_table = Like.__table__
+
+
+def _adjust(connection, table, column, row_id, delta):
+    """Soma delta a um contador com um UPDATE atômico (col = col + delta)."""
+    if row_id is None or not delta:
+        return
+    connection.execute(
+        table.update()
+        .where(table.c.id == row_id)
+        .values({column: table.c[column] + delta})
+    )
+
+
+# Os listeners abaixo rodam dentro do flush, usando a mesma conexão e
+# transação do INSERT/DELETE que os disparou.
+
+@event.listens_for(Like, 'after_insert')
+def _like_inserted(mapper, connection, target):
+    _adjust(connection, posts_table, 'like_count', target.post_id, 1)
+    _adjust(connection, comments_table, 'like_count', target.comment_id, 1)
+
+
+@event.listens_for(Like, 'after_delete')
+def _like_deleted(mapper, connection, target):
+    _adjust(connection, posts_table, 'like_count', target.post_id, -1)
+    _adjust(connection, comments_table, 'like_count', target.comment_id, -1)
+
+
+@event.listens_for(Comment, 'after_insert')
+def _comment_inserted(mapper, connection, target):
+    _adjust(connection, posts_table, 'comment_count', target.post_id, 1)
+    _adjust(connection, comments_table, 'reply_count', target.parent_id, 1)
+
+
+@event.listens_for(Comment, 'after_delete')
+def _comment_deleted(mapper, connection, target):
+    _adjust(connection, posts_table, 'comment_count', target.post_id, -1)
+    _adjust(connection, comments_table, 'reply_count', target.parent_id, -1)
+
+
+def adjust_post_comment_count(post_id, delta):
+    """Ajusta comment_count após um DELETE em massa (Query.delete não dispara os listeners)."""
+    _adjust(db.session.connection(), posts_table, 'comment_count', post_id, delta)
+
+
+def release_user_content(user_id):
+    """Desconta dos contadores as curtidas e comentários de um usuário antes de apagá-los em massa.
+
+    Deve ser chamada na mesma transação dos Query.delete() de exclusão de conta.
+    """
+    # Os Query.delete() não passam pelo flush, então o cache é avisado aqui
+    invalidate_on_commit('posts', 'comments', 'likes')
+    connection = db.session.connection()
+    grouped = [
+        (likes_table.c.post_id, likes_table.c.user_id, posts_table, 'like_count'),
+        (likes_table.c.comment_id, likes_table.c.user_id, comments_table, 'like_count'),
+        (comments_table.c.post_id, comments_table.c.user_id, posts_table, 'comment_count'),
+        (comments_table.c.parent_id, comments_table.c.user_id, comments_table, 'reply_count'),
+    ]
+    touched = {posts_table: set(), comments_table: set()}
+    for group_column, user_column, target_table, counter in grouped:
+        rows = connection.execute(
+            db.select(group_column, db.func.count())
+            .where(user_column == user_id, group_column.isnot(None))
+            .group_by(group_column)
+        ).all()
+        for row_id, total in rows:
+            _adjust(connection, target_table, counter, row_id, -total)
+            touched[target_table].add(row_id)
+    # Posts de outros usuários cujos contadores mudaram também têm o fragmento em cache vencido
+    post_ids = touched[posts_table]
+    if touched[comments_table]:
+        post_ids |= set(connection.execute(
+            db.select(comments_table.c.post_id).where(comments_table.c.id.in_(touched[comments_table]))
+        ).scalars())
+    invalidate_on_commit(*[post_tag(post_id) for post_id in post_ids])
+
+
+def reconcile_counters():
+    """Recalcula os contadores a partir das tabelas de origem e corrige os que divergirem.
+
+    Retorna um dicionário com a quantidade de linhas corrigidas por contador.
+    """
+    targets = {
+        'posts.like_count': (posts_table, 'like_count', likes_table.c.post_id),
+        'posts.comment_count': (posts_table, 'comment_count', comments_table.c.post_id),
+        'comments.like_count': (comments_table, 'like_count', likes_table.c.comment_id),
+        'comments.reply_count': (comments_table, 'reply_count', comments_table.c.parent_id),
+    }
+    fixed = {}
+    for name, (table, counter, ref_column) in targets.items():
+        # Tabela derivada agrupada: o MySQL não permite ler a própria tabela
+        # do UPDATE em uma subconsulta correlacionada direta.
+        grouped = (
+            db.select(ref_column.label('ref_id'), db.func.count().label('total'))
+            .where(ref_column.isnot(None))
+            .group_by(ref_column)
+            .subquery()
+        )
+        actual = db.func.coalesce(
+            db.select(grouped.c.total).where(grouped.c.ref_id == table.c.id).scalar_subquery(),
+            0
+        )
+        result = db.session.execute(
+            table.update()
+            .where(table.c[counter] != actual)
+            .values({counter: actual})
+        )
+        fixed[name] = result.rowcount
+    db.session.commit()
+    return fixed
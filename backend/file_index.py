@@ -0,0 +1,87 @@
+import os
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Quantos nomes inexistentes ficam lembrados por diretório
+NEGATIVE_CACHE_SIZE = 1024
+
+
+def normalize_filename(filename):
+    """Normaliza o nome do arquivo, removendo acentos e convertendo para minúsculas."""
+    normalized = unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode('ASCII')
+    return normalized.lower()
+
+
+class FilenameIndex:
+    """Mapa nome normalizado -> nome real dos arquivos de um diretório.
+
+    O mapa é montado uma vez e refeito só quando o mtime do diretório muda
+    (arquivo criado, removido ou renomeado). Nomes que não existem ficam num
+    cache negativo limitado, então URLs inválidas repetidas não custam nada.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._files = frozenset()
+        self._names = {}
+        self._missing = OrderedDict()
+
+    def refresh(self):
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except OSError as e:
+            logger.error(f"Erro ao listar arquivos em {self.directory}: {str(e)}")
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            try:
+                files = frozenset(os.listdir(self.directory))
+                names = {}
+                for filename in sorted(files):
+                    names.setdefault(normalize_filename(filename), filename)
+            except OSError as e:
+                logger.error(f"Erro ao listar arquivos em {self.directory}: {str(e)}")
+                return
+            self._files = files
+            self._names = names
+            self._missing.clear()
+            self._mtime = mtime
+
+    def find(self, target_filename):
+        """Retorna o nome real do arquivo equivalente a target_filename, ou None.
+
+        O nome exato tem prioridade; depois vale a comparação sem acentos e
+        sem diferenciar maiúsculas.
+        """
+        self.refresh()
+        if target_filename in self._files:
+            return target_filename
+        target = normalize_filename(target_filename)
+        if target in self._missing:
+            return None
+        return self._names.get(target)
+
+    def record_miss(self, target_filename):
+        """Guarda um nome inexistente no cache negativo.
+
+        Retorna True na primeira vez (desde o último refresh), para que o
+        chamador registre o erro no log uma única vez.
+        """
+        target = normalize_filename(target_filename)
+        with self._lock:
+            if target in self._missing:
+                self._missing.move_to_end(target)
+                return False
+            self._missing[target] = True
+            if len(self._missing) > NEGATIVE_CACHE_SIZE:
+                self._missing.popitem(last=False)
+            return True
@@ -0,0 +1,101 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from firebase_admin import auth
+
+logger = logging.getLogger(__name__)
+
+# Tentativas por tarefa e espera inicial (dobra a cada falha)
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = 2
+# Tempo máximo esperando a fila esvaziar ao encerrar o processo
+DRAIN_TIMEOUT = 10
+
+
+def create_firebase_user(email, password):
+    auth.create_user(email=email, password=password)
+    logger.info(f"Usuário {email} criado no Firebase Authentication")
+
+
+def update_firebase_password(email, password):
+    firebase_user = auth.get_user_by_email(email)
+    auth.update_user(firebase_user.uid, password=password)
+    logger.info(f"Senha atualizada no Firebase para o usuário {email}")
+
+
+def delete_firebase_user(email):
+    firebase_user = auth.get_user_by_email(email)
+    auth.delete_user(firebase_user.uid)
+    logger.info(f"Usuário {email} deletado do Firebase Authentication")
+
+
+# Erros em que repetir não adianta
+PERMANENT_ERRORS = (auth.UserNotFoundError, auth.EmailAlreadyExistsError, ValueError)
+
+
+class FirebaseTaskQueue:
+    """Fila em segundo plano para alterações de conta no Firebase que não precisam bloquear a requisição.
+
+    Uma única thread executa as tarefas em ordem (uma exclusão nunca passa
+    na frente da criação da mesma conta). Falhas transitórias são repetidas
+    até MAX_ATTEMPTS vezes com espera exponencial; erros permanentes (conta
+    inexistente, e-mail já cadastrado) só são registrados no log.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        atexit.register(self.drain, DRAIN_TIMEOUT)
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='firebase-tasks', daemon=True)
+                self._thread.start()
+
+    def submit(self, task, *args):
+        self._queue.put((task, args))
+        self._ensure_thread()
+
+    def _run(self):
+        while True:
+            task, args = self._queue.get()
+            try:
+                self._execute(task, args)
+            finally:
+                self._queue.task_done()
+
+    def _execute(self, task, args):
+        # O primeiro argumento é sempre o e-mail; a senha nunca vai para o log
+        email = args[0] if args else ''
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                task(*args)
+                return
+            except PERMANENT_ERRORS as e:
+                logger.warning(f"Firebase: {task.__name__} para {email} não aplicado: {str(e)}")
+                return
+            except Exception as e:
+                if attempt == MAX_ATTEMPTS:
+                    logger.error(f"Firebase: {task.__name__} para {email} falhou após {attempt} tentativas: {str(e)}")
+                    return
+                delay = RETRY_BACKOFF ** attempt
+                logger.warning(f"Firebase: {task.__name__} para {email} falhou (tentativa {attempt}); "
+                               f"nova tentativa em {delay}s: {str(e)}")
+                time.sleep(delay)
+
+    def drain(self, timeout=None):
+        """Espera as tarefas pendentes terminarem (ou o timeout)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.warning(f"{self._queue.unfinished_tasks} tarefa(s) do Firebase não concluída(s) ao encerrar")
+                return False
+            time.sleep(0.05)
+        return True
+
+
+firebase_tasks = FirebaseTaskQueue()
@@ -0,0 +1,134 @@
+import re
+from collections import namedtuple
+from flask import render_template
+from markupsafe import Markup
+from backend.extensions import db
+from backend.models import Post, Comment
+from backend.shared_cache import shared_cache, post_tag, user_tag
+
+# Os fragmentos só mudam quando a versão das tags muda; o timeout limita o espaço ocupado
+FRAGMENT_TIMEOUT = 3600
+
+# Marcadores emitidos por post_card.html e comment_thread.html. O conteúdo dos
+# usuários passa pelo autoescape, então não consegue forjar um marcador.
+SLOT_PATTERN = re.compile(r'<!--owner:(\d+)-->(.*?)<!--/owner-->|<!--comments-->', re.S)
+
+# Trecho exibido só para o autor (botões de editar/excluir)
+OwnerSlot = namedtuple('OwnerSlot', ['user_id', 'html'])
+# Na sequência de pedaços de um card, None marca onde entram os comentários
+COMMENTS_SLOT = None
+
+
+def split_fragment(html):
+    """Quebra o HTML renderizado em pedaços: texto fixo, OwnerSlot e COMMENTS_SLOT."""
+    pieces, last = [], 0
+    for match in SLOT_PATTERN.finditer(html):
+        pieces.append(html[last:match.start()])
+        if match.group(1) is None:
+            pieces.append(COMMENTS_SLOT)
+        else:
+            pieces.append(OwnerSlot(int(match.group(1)), match.group(2)))
+        last = match.end()
+    pieces.append(html[last:])
+    return tuple(piece for piece in pieces if piece != '')
+
+
+def assemble(pieces, viewer_id, comments=''):
+    """Monta o HTML de um fragmento para quem está vendo."""
+    parts = []
+    for piece in pieces:
+        if piece is COMMENTS_SLOT:
+            parts.append(comments)
+        elif isinstance(piece, OwnerSlot):
+            if piece.user_id == viewer_id:
+                parts.append(piece.html)
+        else:
+            parts.append(piece)
+    return ''.join(parts)
+
+
+def _thread_authors(post):
+    authors = set()
+    for comment in post.comments:
+        authors.add(comment.user_id)
+        authors.update(reply.user_id for reply in comment.replies)
+    return authors
+
+
+def _author_ids(post_ids, with_comments):
+    """Autores que os fragmentos desses posts vão exibir, numa consulta leve antes da carga completa."""
+    query = db.select(Post.user_id).where(Post.id.in_(post_ids))
+    if with_comments:
+        query = query.union(db.select(Comment.user_id).where(Comment.post_id.in_(post_ids)))
+    return set(db.session.execute(query).scalars())
+
+
+def _store(key, html, versions):
+    pieces = split_fragment(html)
+    shared_cache.set(key, pieces, timeout=FRAGMENT_TIMEOUT, versions=versions)
+    return pieces
+
+
+def _render_posts(post_ids, with_comments):
+    # Versões dos posts e dos autores lidas antes de carregar: uma edição, curtida ou troca de
+    # nome/foto no meio do caminho deixa o fragmento gravado já vencido. Um autor que não estava
+    # na leitura prévia só aparece com um comentário novo, que já mudou a versão do post.
+    tags = [post_tag(post_id) for post_id in post_ids]
+    tags += [user_tag(user_id) for user_id in _author_ids(post_ids, with_comments)]
+    versions = shared_cache.tag_versions(tags)
+    options = [db.joinedload(Post.author)]
+    if with_comments:
+        options += [
+            db.joinedload(Post.comments).joinedload(Comment.author),
+            db.joinedload(Post.comments).joinedload(Comment.replies).joinedload(Comment.author),
+        ]
+
+    def versions_for(post, user_ids):
+        user_tags = [user_tag(user_id) for user_id in user_ids]
+        late = [tag for tag in user_tags if tag not in versions]
+        if late:
+            versions.update(shared_cache.tag_versions(late))
+        return {tag: versions[tag] for tag in [post_tag(post.id)] + user_tags}
+
+    rendered = {}
+    for post in Post.query.options(*options).filter(Post.id.in_(post_ids)):
+        card = _store(f'post_card:{post.id}', render_template('post_card.html', post=post),
+                      versions_for(post, [post.user_id]))
+        thread = ()
+        if with_comments:
+            thread = _store(f'comment_thread:{post.id}', render_template('comment_thread.html', post=post),
+                            versions_for(post, _thread_authors(post)))
+        rendered[post.id] = (card, thread)
+    return rendered
+
+
+def post_cards(post_ids, viewer_id, with_comments=False):
+    """HTML dos cards dos posts, na ordem de post_ids, montado a partir dos fragmentos em cache.
+
+    O card (post_card:<id>) e a árvore de comentários (comment_thread:<id>)
+    ficam no shared_cache com a versão do post (muda a cada edição, curtida,
+    comentário ou resposta) e a de cada autor exibido (muda com nome ou
+    foto). Só os fragmentos ausentes ou vencidos são carregados do banco e
+    renderizados. O que depende de quem vê é preenchido na montagem: os
+    botões de editar/excluir entram só para o autor, e o estado de curtida
+    continua vindo de /get_likes no navegador.
+    """
+    fragments, missing = {}, []
+    for post_id in post_ids:
+        card = shared_cache.get(f'post_card:{post_id}')
+        thread = shared_cache.get(f'comment_thread:{post_id}') if with_comments else ()
+        if card is None or thread is None:
+            missing.append(post_id)
+        else:
+            fragments[post_id] = (card, thread)
+    if missing:
+        fragments.update(_render_posts(missing, with_comments))
+    cards = []
+    for post_id in post_ids:
+        if post_id not in fragments:
+            # Apagado depois da consulta da página
+            continue
+        card, thread = fragments[post_id]
+        comments = assemble(thread, viewer_id) if with_comments else ''
+        cards.append(Markup(assemble(card, viewer_id, comments)))
+    return cards
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import jwt
+import requests
+from cryptography import x509
+
+logger = logging.getLogger(__name__)
+
+# Certificados públicos com que o Firebase assina os ID tokens
+FIREBASE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+# Usado quando a resposta não traz Cache-Control: max-age
+DEFAULT_KEYS_MAX_AGE = 3600
+# Intervalo mínimo entre recargas forçadas por um kid desconhecido
+MIN_REFRESH_INTERVAL = 60
+# Tokens já verificados ficam em memória por no máximo esse tempo (e nunca além do exp)
+VERIFIED_TOKEN_TTL = 300
+VERIFIED_TOKEN_CACHE_SIZE = 4096
+# Tolerância para relógios levemente dessincronizados
+CLOCK_SKEW = 30
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class InvalidIdTokenError(ValueError):
+    """ID token malformado, com assinatura inválida ou de outro projeto."""
+
+
+class ExpiredIdTokenError(InvalidIdTokenError):
+    """ID token válido, mas expirado."""
+
+
+class IdTokenVerifier:
+    """Verifica ID tokens do Firebase localmente, sem ida ao servidor por login.
+
+    As chaves públicas são baixadas de FIREBASE_CERTS_URL e reaproveitadas
+    pelo tempo indicado no Cache-Control da resposta; se a recarga falhar, as
+    chaves anteriores continuam em uso. Tokens já verificados ficam num cache
+    LRU (indexado pelo hash do token) por até VERIFIED_TOKEN_TTL segundos.
+    Com FIREBASE_AUTH_EMULATOR_HOST definido, aceita os tokens sem assinatura
+    do emulador, como o firebase_admin faz.
+    """
+
+    def __init__(self, project_id=None, certs_url=FIREBASE_CERTS_URL):
+        self.project_id = project_id
+        self.certs_url = certs_url
+        self._keys = {}
+        self._keys_expire_at = 0
+        self._last_refresh = 0
+        self._keys_lock = threading.Lock()
+        self._verified = OrderedDict()
+        self._verified_lock = threading.Lock()
+
+    def init_app(self, app, project_id):
+        self.project_id = app.config.get('FIREBASE_PROJECT_ID') or project_id
+        self.certs_url = app.config.get('FIREBASE_CERTS_URL') or FIREBASE_CERTS_URL
+
+    @property
+    def emulated(self):
+        return bool(os.environ.get('FIREBASE_AUTH_EMULATOR_HOST'))
+
+    def _refresh_keys(self):
+        response = requests.get(self.certs_url, timeout=5)
+        response.raise_for_status()
+        keys = {
+            kid: x509.load_pem_x509_certificate(pem.encode()).public_key()
+            for kid, pem in response.json().items()
+        }
+        match = MAX_AGE_RE.search(response.headers.get('Cache-Control', ''))
+        max_age = int(match.group(1)) if match else DEFAULT_KEYS_MAX_AGE
+        self._keys = keys
+        self._keys_expire_at = time.monotonic() + max_age
+        logger.info(f"Chaves públicas do Firebase recarregadas ({len(keys)} chave(s), válidas por {max_age}s)")
+
+    def _get_key(self, kid):
+        now = time.monotonic()
+        with self._keys_lock:
+            stale = now >= self._keys_expire_at
+            unknown = kid not in self._keys and now - self._last_refresh >= MIN_REFRESH_INTERVAL
+            if stale or unknown:
+                self._last_refresh = now
+                try:
+                    self._refresh_keys()
+                except Exception as e:
+                    if not self._keys:
+                        raise InvalidIdTokenError(f"Não foi possível obter as chaves públicas: {str(e)}")
+                    logger.warning(f"Erro ao recarregar chaves públicas do Firebase; usando as anteriores: {str(e)}")
+            key = self._keys.get(kid)
+        if key is None:
+            raise InvalidIdTokenError('ID token assinado com chave desconhecida.')
+        return key
+
+    def _decode(self, id_token):
+        if not self.project_id:
+            raise InvalidIdTokenError('Projeto do Firebase não configurado.')
+        options = {'require': ['exp', 'iat', 'sub', 'aud', 'iss']}
+        try:
+            header = jwt.get_unverified_header(id_token)
+            if self.emulated:
+                claims = jwt.decode(id_token, options={'verify_signature': False, **options})
+            else:
+                if header.get('alg') != 'RS256':
+                    raise InvalidIdTokenError('Algoritmo de assinatura inválido.')
+                claims = jwt.decode(id_token, self._get_key(header.get('kid')), algorithms=['RS256'],
+                                    audience=self.project_id, leeway=CLOCK_SKEW, options=options)
+        except jwt.ExpiredSignatureError:
+            raise ExpiredIdTokenError('ID token expirado.')
+        except jwt.PyJWTError as e:
+            raise InvalidIdTokenError(f"ID token inválido: {str(e)}")
+        if claims.get('aud') != self.project_id:
+            raise InvalidIdTokenError('ID token emitido para outro projeto.')
+        if claims.get('iss') != f"https://securetoken.google.com/{self.project_id}":
+            raise InvalidIdTokenError('Emissor do ID token inválido.')
+        if claims.get('exp', 0) + CLOCK_SKEW < time.time():
+            raise ExpiredIdTokenError('ID token expirado.')
+        if claims.get('auth_time', 0) > time.time() + CLOCK_SKEW:
+            raise InvalidIdTokenError('auth_time do ID token está no futuro.')
+        sub = claims.get('sub')
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise InvalidIdTokenError('sub do ID token inválido.')
+        claims['uid'] = sub
+        return claims
+
+    def verify(self, id_token):
+        """Retorna as claims do token (com 'uid'), como auth.verify_id_token."""
+        if not isinstance(id_token, str) or not id_token:
+            raise InvalidIdTokenError('ID token ausente.')
+        digest = hashlib.sha256(id_token.encode()).digest()
+        now = time.time()
+        with self._verified_lock:
+            entry = self._verified.get(digest)
+            if entry and entry[0] > now:
+                self._verified.move_to_end(digest)
+                return dict(entry[1])
+        claims = self._decode(id_token)
+        expires_at = min(claims['exp'], now + VERIFIED_TOKEN_TTL)
+        with self._verified_lock:
+            self._verified[digest] = (expires_at, claims)
+            while len(self._verified) > VERIFIED_TOKEN_CACHE_SIZE:
+                self._verified.popitem(last=False)
+        return dict(claims)
+
+
+id_token_verifier = IdTokenVerifier()
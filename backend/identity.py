@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from flask import g, session, flash, redirect, url_for, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from backend.extensions import db
+from backend.models import User
+
+# Identidades mantidas entre requisições; o TTL limita a defasagem entre processos
+IDENTITY_CACHE_SIZE = 4096
+IDENTITY_CACHE_TTL = 60
+
+# Só o que as rotas e templates leem do usuário logado
+UserIdentity = namedtuple('UserIdentity', ['id', 'username', 'email', 'profile_pic', 'is_admin', 'is_moderator'])
+
+
+def load_identity(user_id):
+    row = db.session.execute(
+        db.select(*[getattr(User, field) for field in UserIdentity._fields]).where(User.id == user_id)
+    ).first()
+    return UserIdentity(*row) if row else None
+
+
+class IdentityCache:
+    """Cache LRU com TTL de UserIdentity (tuplas imutáveis, fora da sessão do SQLAlchemy)."""
+
+    def __init__(self, maxsize=IDENTITY_CACHE_SIZE, ttl=IDENTITY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        identity = load_identity(user_id)
+        if identity is not None:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, identity)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache()
+
+
+def current_user():
+    """Identidade do usuário logado, resolvida uma vez por requisição em g.user (None se não houver)."""
+    if 'user' not in g:
+        user_id = session.get('user_id')
+        g.user = identity_cache.get(user_id) if user_id else None
+    return g.user
+
+
+def login_required(f):
+    """Exige login nas páginas: redireciona para o login e deixa g.user preenchido."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get('user_id'):
+            flash('Por favor, faça login para acessar esta página.', 'error')
+            return redirect(url_for('registroelogin'))
+        if current_user() is None:
+            session.clear()
+            flash('Sua sessão expirou ou o usuário não existe mais.', 'error')
+            return redirect(url_for('registroelogin'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# Invalidação: nome, foto, permissões ou exclusão do usuário, depois do commit
+
+@event.listens_for(Session, 'before_flush')
+def _collect_identity_changes(session, flush_context, instances):
+    changed = session.info.setdefault('identity_changes', set())
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in UserIdentity._fields[1:]):
+                changed.add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_identities(session):
+    changed = session.info.pop('identity_changes', set())
+    for user_id in changed:
+        identity_cache.invalidate(user_id)
+    if changed and has_app_context() and g.get('user') is not None and g.user.id in changed:
+        g.pop('user')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_identity_changes(session):
+    session.info.pop('identity_changes', None)
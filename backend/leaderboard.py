@@ -0,0 +1,99 @@
+import logging
+from datetime import datetime
+import numpy as np
+import pytz
+from backend.extensions import db
+from backend.models import User, PageVisit, UserActivityTotals, LeaderboardEntry
+from backend.progress_tracker import ProgressTracker
+
+logger = logging.getLogger(__name__)
+
+# Linhas por INSERT executemany ao materializar o ranking
+INSERT_CHUNK = 5000
+
+leaderboard_table = LeaderboardEntry.__table__
+
+
+def load_user_totals():
+    """Totais de todos os usuários numa única consulta agrupada.
+
+    Retorna arrays NumPy alinhados: user_id, pontos, páginas visitadas e recursos acessados.
+    """
+    resources = (
+        db.select(PageVisit.user_id, db.func.count().label('resources_count'))
+        .where(PageVisit.page.in_(list(ProgressTracker.RESOURCE_PAGES)))
+        .group_by(PageVisit.user_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        db.select(
+            User.id,
+            db.func.coalesce(UserActivityTotals.activity_points, 0),
+            db.func.coalesce(UserActivityTotals.pages_visited, 0),
+            db.func.coalesce(resources.c.resources_count, 0)
+        )
+        .select_from(User)
+        .outerjoin(UserActivityTotals, UserActivityTotals.user_id == User.id)
+        .outerjoin(resources, resources.c.user_id == User.id)
+    ).all()
+    # Converter para tuplas antes: o NumPy percorre objetos Row bem mais devagar
+    data = np.array([tuple(row) for row in rows], dtype=np.int64).reshape(-1, 4)
+    return data[:, 0], data[:, 1], data[:, 2], data[:, 3]
+
+
+def score(points, pages_visited):
+    """Mesma regra de ProgressTracker.compute_progress, aplicada a arrays inteiros."""
+    points = np.clip(points, 0, None)
+    percentage = np.minimum(points / ProgressTracker.MAX_POINTS * 100, 100)
+    total_pages = len(ProgressTracker.PAGES)
+    if total_pages:
+        bonus = pages_visited >= total_pages
+        percentage = np.where(bonus, np.minimum(percentage * ProgressTracker.ALL_PAGES_BONUS, 100), percentage)
+    return points, np.round(percentage, 2)
+
+
+def rank(points, user_ids):
+    """Ordena por pontos (desempate pelo id) e calcula o rank com empates (1, 2, 2, 4...).
+
+    Retorna (ordem, ranks) onde ordem são os índices na posição do ranking.
+    """
+    order = np.lexsort((user_ids, -points))
+    sorted_points = points[order]
+    # Rank = 1 + quantos usuários têm mais pontos
+    ranks = np.searchsorted(-sorted_points, -sorted_points, side='left') + 1
+    return order, ranks
+
+
+def rebuild_leaderboard():
+    """Recalcula e materializa o ranking de todos os usuários.
+
+    Feito para rodar periodicamente (cron): uma consulta agrupada, pontuação
+    vetorizada e a tabela leaderboard substituída numa única transação.
+    Retorna o número de usuários no ranking.
+    """
+    user_ids, points, pages_visited, resources_count = load_user_totals()
+    points, percentage = score(points, pages_visited)
+    order, ranks = rank(points, user_ids)
+    computed_at = datetime.now(pytz.UTC)
+    columns = {
+        'user_id': user_ids[order].tolist(),
+        'rank': ranks.tolist(),
+        'activity_points': points[order].tolist(),
+        'progress_percentage': percentage[order].tolist(),
+        'pages_visited': pages_visited[order].tolist(),
+        'resources_count': resources_count[order].tolist(),
+    }
+    rows = [
+        dict(zip(columns, values), position=position, computed_at=computed_at)
+        for position, values in enumerate(zip(*columns.values()), start=1)
+    ]
+    try:
+        db.session.execute(leaderboard_table.delete())
+        for start in range(0, len(rows), INSERT_CHUNK):
+            db.session.execute(leaderboard_table.insert(), rows[start:start + INSERT_CHUNK])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao materializar o ranking: {str(e)}")
+        raise
+    return len(rows)
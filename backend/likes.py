@@ -0,0 +1,83 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from backend.extensions import db
+from backend.counters import posts_table, comments_table, likes_table
+from backend.analytics import count_like
+from backend.shared_cache import invalidate_on_commit, post_tag
+
+
+def _insert_ignoring_duplicates(connection, values):
+    """INSERT que ignora violação dos índices únicos de likes, conforme o banco."""
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(likes_table).values(**values).on_conflict_do_nothing()
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(likes_table).values(**values).on_conflict_do_nothing()
+    elif dialect in ('mysql', 'mariadb'):
+        stmt = likes_table.insert().values(**values).prefix_with('IGNORE')
+    else:
+        stmt = likes_table.insert().values(**values)
+    return connection.execute(stmt).rowcount
+
+
+def _bump_counter(connection, table, row_id, delta):
+    """Atualiza like_count e devolve o novo valor (RETURNING quando o banco suporta)."""
+    stmt = (
+        table.update()
+        .where(table.c.id == row_id)
+        .values(like_count=table.c.like_count + delta)
+    )
+    if connection.dialect.update_returning:
+        return connection.execute(stmt.returning(table.c.like_count)).scalar() or 0
+    connection.execute(stmt)
+    return connection.execute(
+        db.select(table.c.like_count).where(table.c.id == row_id)
+    ).scalar() or 0
+
+
+def toggle_like(user_id, post_id=None, comment_id=None):
+    """Alterna a curtida do usuário em um post ou comentário.
+
+    Executa DELETE, INSERT-ignorando-duplicata e o ajuste do contador na mesma
+    transação, sem SELECT prévio. Os índices únicos de likes garantem que
+    cliques simultâneos não criem curtidas duplicadas.
+    Retorna (liked, like_count).
+    """
+    if (post_id is None) == (comment_id is None):
+        raise ValueError('Informe exatamente um entre post_id e comment_id.')
+    if post_id is not None:
+        target_table, target_id, target_column = posts_table, post_id, likes_table.c.post_id
+    else:
+        target_table, target_id, target_column = comments_table, comment_id, likes_table.c.comment_id
+
+    connection = db.session.connection()
+    try:
+        deleted = connection.execute(
+            likes_table.delete().where(
+                likes_table.c.user_id == user_id,
+                target_column == target_id
+            )
+        ).rowcount
+        if deleted:
+            liked = False
+            like_count = _bump_counter(connection, target_table, target_id, -deleted)
+        else:
+            liked = True
+            inserted = _insert_ignoring_duplicates(connection, {
+                'user_id': user_id,
+                'post_id': post_id,
+                'comment_id': comment_id,
+            })
+            if inserted:
+                like_count = _bump_counter(connection, target_table, target_id, 1)
+                count_like(connection, post_id is not None)
+            else:
+                # Outra requisição concorrente inseriu a curtida primeiro
+                like_count = connection.execute(
+                    db.select(target_table.c.like_count).where(target_table.c.id == target_id)
+                ).scalar() or 0
+        invalidate_on_commit('likes', *([post_tag(post_id)] if post_id is not None else []))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return liked, like_count
@@ -0,0 +1,215 @@
+import atexit
+import logging
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+import pytz
+from flask_mail import Message
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from backend.extensions import db
+from backend.models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('pending', 'sending', 'sent', 'failed')
+# Intervalo entre verificações da fila quando ninguém avisa de e-mail novo
+POLL_INTERVAL = 10
+BATCH_SIZE = 50
+# Tentativas por mensagem; a espera entre elas começa em RETRY_BACKOFF segundos e dobra
+MAX_ATTEMPTS = 6
+RETRY_BACKOFF = 30
+# Tempo de reserva de uma mensagem em envio; vencido, outro worker pode retomá-la
+SENDING_LEASE = 600
+# A conexão SMTP é fechada após esse tempo sem mensagens
+IDLE_TIMEOUT = 30
+SENT_RETENTION = timedelta(days=7)
+PRUNE_INTERVAL = 3600
+
+outbound_table = OutboundEmail.__table__
+
+
+class MailQueue:
+    """Fila persistente de e-mails (tabela outbound_emails) drenada por uma thread.
+
+    A requisição só grava a mensagem, na mesma transação do que a originou;
+    depois do commit a thread é acordada e envia em lotes reaproveitando uma
+    única conexão SMTP (fechada após IDLE_TIMEOUT segundos ociosa). Cada
+    mensagem é reservada com um UPDATE condicional antes do envio, então
+    vários processos podem drenar a mesma fila sem enviar em dobro; se um
+    processo morrer no meio do envio, a mensagem volta para a fila quando a
+    reserva vence (entrega pelo menos uma vez). Falhas são repetidas com
+    espera exponencial até MAX_ATTEMPTS; depois a mensagem fica 'failed'.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.mail = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._connection = None
+        self._last_sent = 0
+        self._last_prune = 0
+
+    def init_app(self, app, mail):
+        self.app = app
+        self.mail = mail
+        # Mensagens que ficaram na fila de uma execução anterior saem na primeira requisição
+        app.before_request(self._ensure_thread)
+        atexit.register(self.close)
+
+    def _ensure_thread(self):
+        # Iniciada pela primeira requisição, não na importação (comandos flask não precisam dela)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mail-queue', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, recipient, subject, html):
+        """Adiciona o e-mail à sessão atual; vai para a fila no commit de quem chamou."""
+        email = OutboundEmail(recipient=recipient, subject=subject, html=html)
+        db.session.add(email)
+        db.session.info['mail_enqueued'] = True
+        return email
+
+    def notify(self):
+        if self.app is None:
+            return
+        self._ensure_thread()
+        self._wakeup.set()
+
+    def depth(self):
+        """Quantidade de mensagens por status."""
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(db.session.execute(
+            db.select(outbound_table.c.status, db.func.count()).group_by(outbound_table.c.status)
+        ).all())
+        return counts
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    while self.process_due():
+                        pass
+                    self._prune()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Erro ao processar a fila de e-mails: {str(e)}")
+                finally:
+                    db.session.remove()
+            if self._connection is not None and time.monotonic() - self._last_sent > IDLE_TIMEOUT:
+                self.close()
+
+    def process_due(self):
+        """Envia um lote de mensagens vencidas. Retorna True se pode haver mais."""
+        now = datetime.now(pytz.UTC)
+        due = db.session.execute(
+            db.select(outbound_table.c.id, outbound_table.c.next_attempt_at)
+            .where(outbound_table.c.status.in_(('pending', 'sending')),
+                   outbound_table.c.next_attempt_at <= now)
+            .order_by(outbound_table.c.next_attempt_at)
+            .limit(BATCH_SIZE)
+        ).all()
+        db.session.commit()
+        for email_id, next_attempt_at in due:
+            email = self._claim(email_id, next_attempt_at, now)
+            if email is not None:
+                self._deliver(email)
+        return len(due) == BATCH_SIZE
+
+    def _claim(self, email_id, next_attempt_at, now):
+        claimed = db.session.execute(
+            outbound_table.update()
+            .where(outbound_table.c.id == email_id,
+                   outbound_table.c.status.in_(('pending', 'sending')),
+                   outbound_table.c.next_attempt_at == next_attempt_at)
+            .values(status='sending', attempts=outbound_table.c.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=SENDING_LEASE))
+        ).rowcount
+        db.session.commit()
+        if claimed != 1:
+            return None
+        return db.session.execute(
+            db.select(outbound_table.c.id, outbound_table.c.recipient, outbound_table.c.subject,
+                      outbound_table.c.html, outbound_table.c.attempts)
+            .where(outbound_table.c.id == email_id)
+        ).one()
+
+    def _deliver(self, email):
+        message = Message(email.subject, recipients=[email.recipient], html=email.html,
+                          sender=self.app.config.get('MAIL_DEFAULT_SENDER'))
+        try:
+            self._send(message)
+        except Exception as e:
+            failed = email.attempts >= MAX_ATTEMPTS
+            delay = RETRY_BACKOFF * 2 ** (email.attempts - 1)
+            values = {'status': 'failed' if failed else 'pending', 'last_error': str(e)[:500],
+                      'next_attempt_at': datetime.now(pytz.UTC) + timedelta(seconds=delay)}
+            if failed:
+                logger.error(f"E-mail {email.id} para {email.recipient} descartado após {email.attempts} tentativas: {str(e)}")
+            else:
+                logger.warning(f"Erro ao enviar e-mail {email.id} para {email.recipient} "
+                               f"(tentativa {email.attempts}); nova tentativa em {delay}s: {str(e)}")
+        else:
+            values = {'status': 'sent', 'sent_at': datetime.now(pytz.UTC), 'last_error': None}
+            logger.info(f"E-mail {email.id} enviado para {email.recipient}")
+        db.session.execute(outbound_table.update().where(outbound_table.c.id == email.id).values(**values))
+        db.session.commit()
+
+    def _send(self, message):
+        if self._connection is None:
+            self._connection = self.mail.connect().__enter__()
+        try:
+            self._connection.send(message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # A conexão reaproveitada pode ter caído por inatividade: uma nova tentativa na hora
+            self.close()
+            self._connection = self.mail.connect().__enter__()
+            self._connection.send(message)
+        except Exception:
+            self.close()
+            raise
+        self._last_sent = time.monotonic()
+
+    def close(self):
+        """Fecha a conexão SMTP reaproveitada, se houver."""
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"Erro ao fechar a conexão SMTP: {str(e)}")
+
+    def _prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        removed = db.session.execute(
+            outbound_table.delete().where(outbound_table.c.status == 'sent',
+                                          outbound_table.c.sent_at < datetime.now(pytz.UTC) - SENT_RETENTION)
+        ).rowcount
+        db.session.commit()
+        if removed:
+            logger.info(f"{removed} e-mail(s) enviado(s) antigo(s) removido(s) da fila")
+
+
+mail_queue = MailQueue()
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_mail_queue(session):
+    if session.info.pop('mail_enqueued', False):
+        mail_queue.notify()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_mail_enqueued(session):
+    session.info.pop('mail_enqueued', None)
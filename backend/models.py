@@ -12,7 +12,6 @@ class User(db.Model):
     is_admin = db.Column(db.Boolean, default=False)
     is_moderator = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC))
-    visited_pages = db.Column(db.Text, default='')
     last_activity = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC))
     
     posts = db.relationship('Post', backref='author', lazy=True)
@@ -21,43 +20,183 @@ class User(db.Model):
 
 class Post(db.Model):
     __tablename__ = 'posts'
+    __table_args__ = (
+        # Feed paginado por (created_at, id) e filtro por categoria
+        db.Index('ix_posts_created_at_id', 'created_at', 'id'),
+        db.Index('ix_posts_category_created_at', 'category', 'created_at'),
+        db.Index('ix_posts_user_id', 'user_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     category = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC))
+    # Contadores desnormalizados, mantidos por backend/counters.py
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     comments = db.relationship('Comment', backref='post', lazy=True)
     likes = db.relationship('Like', backref='post', lazy=True)
 
 class Comment(db.Model):
     __tablename__ = 'comments'
+    __table_args__ = (
+        db.Index('ix_comments_post_id_created_at', 'post_id', 'created_at'),
+        db.Index('ix_comments_parent_id', 'parent_id'),
+        db.Index('ix_comments_user_id', 'user_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
     parent_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC))
+    # Contadores desnormalizados, mantidos por backend/counters.py
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     replies = db.relationship('Comment', backref=db.backref('parent', remote_side=[id]), lazy=True)
     likes = db.relationship('Like', backref='comment', lazy=True)
 
 class Like(db.Model):
     __tablename__ = 'likes'
+    # Um usuário só pode curtir cada post/comentário uma vez. Índices parciais no
+    # SQLite/Postgres; no MySQL viram índices únicos comuns (NULLs não colidem).
+    __table_args__ = (
+        db.Index('uq_likes_user_post', 'user_id', 'post_id', unique=True,
+                 sqlite_where=db.text('post_id IS NOT NULL'),
+                 postgresql_where=db.text('post_id IS NOT NULL')),
+        db.Index('uq_likes_user_comment', 'user_id', 'comment_id', unique=True,
+                 sqlite_where=db.text('comment_id IS NOT NULL'),
+                 postgresql_where=db.text('comment_id IS NOT NULL')),
+        # Os índices parciais acima não servem para "WHERE user_id = ?" sozinho
+        db.Index('ix_likes_user_id', 'user_id'),
+        db.Index('ix_likes_post_id', 'post_id'),
+        db.Index('ix_likes_comment_id', 'comment_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=True)
     comment_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC))
 
+class PageVisit(db.Model):
+    __tablename__ = 'page_visits'
+    # A chave primária (user_id, page) atende as consultas por usuário; o índice
+    # por página atende "quem (não) visitou a página X".
+    __table_args__ = (
+        db.Index('ix_page_visits_page_user_id', 'page', 'user_id'),
+    )
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    page = db.Column(db.String(50), primary_key=True)
+    first_seen = db.Column(db.DateTime, nullable=False)
+    last_seen = db.Column(db.DateTime, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+class ActivityEvent(db.Model):
+    __tablename__ = 'activity_events'
+    # Log só de inserção, gravado em lote pelo activity_buffer
+    __table_args__ = (
+        db.Index('ix_activity_events_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_activity_events_created_at', 'created_at'),
+    )
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    type = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+class UserActivityTotals(db.Model):
+    __tablename__ = 'user_activity_totals'
+    # Agregado por usuário dos eventos de activity_events (pesos em ProgressTracker)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    posts_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comments_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    pages_visited = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    profile_updates = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    activity_points = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+class LeaderboardEntry(db.Model):
+    __tablename__ = 'leaderboard'
+    # Ranking materializado por backend/leaderboard.py; position é a ordem de exibição
+    __table_args__ = (
+        db.Index('ix_leaderboard_user_id', 'user_id', unique=True),
+    )
+    position = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    activity_points = db.Column(db.Integer, nullable=False)
+    progress_percentage = db.Column(db.Float, nullable=False)
+    pages_visited = db.Column(db.Integer, nullable=False)
+    resources_count = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+class AnalyticsRollup(db.Model):
+    __tablename__ = 'analytics_rollups'
+    # Séries por hora/dia mantidas por backend/analytics.py; a chave primária
+    # atende a leitura de um intervalo de uma métrica
+    granularity = db.Column(db.String(5), primary_key=True)
+    metric = db.Column(db.String(20), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    dimension = db.Column(db.String(50), primary_key=True, default='')
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class ActiveUserBucket(db.Model):
+    __tablename__ = 'active_user_buckets'
+    # Quem já foi contado como ativo em cada hora/dia recente (podado após 2 dias)
+    granularity = db.Column(db.String(5), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
 class ResetCode(db.Model):
     __tablename__ = 'reset_codes'
-    id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), nullable=False)
-    code = db.Column(db.String(6), nullable=False)
+    # Um código por e-mail (emitir outro substitui o anterior); os expirados
+    # são apagados em lote por backend/reset_codes.py
+    email = db.Column(db.String(120), primary_key=True)
+    code = db.Column(db.String(6), primary_key=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.UTC))
     expires_at = db.Column(db.DateTime, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_reset_codes_expires_at', 'expires_at'),
+    )
+
+class UserSession(db.Model):
+    __tablename__ = 'sessions'
+    # Sessões logadas (backend/sessions.py); id é o SHA-256 do token do cookie
+    id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_agent = db.Column(db.String(255))
+    ip_address = db.Column(db.String(45))
+    created_at = db.Column(db.DateTime, nullable=False)
+    last_active = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_sessions_user_id', 'user_id'),
+        db.Index('ix_sessions_expires_at', 'expires_at'),
+    )
+
+class OutboundEmail(db.Model):
+    __tablename__ = 'outbound_emails'
+    # Fila de envio drenada por backend/mail_queue.py; next_attempt_at também
+    # serve de prazo de reserva enquanto a mensagem está em 'sending'
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.UTC))
+    last_error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.UTC))
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_outbound_emails_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
 class CodeExample(db.Model):
     __tablename__ = 'code_examples'
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,137 @@
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros atuais (os padrões do Werkzeug): hashes gravados com outro método,
+# como os pbkdf2 antigos, são refeitos no próximo login
+PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+
+# Os processos do pool não podem nascer de fork: o worker já tem threads (fila de
+# e-mails, buffer de atividades...) e um lock herdado travado trava o filho
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class PasswordHashBusy(RuntimeError):
+    """Fila de hashing cheia: a requisição deve ser recusada em vez de esperar."""
+
+
+def needs_rehash(pwhash):
+    return bool(pwhash) and pwhash.split('$', 1)[0] != PASSWORD_HASH_METHOD
+
+
+def _generate(password):
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+
+class PasswordHasher:
+    """Executa o hashing de senhas (CPU intensivo) num pool de processos limitado.
+
+    Com workers gevent o hashing inline trava o hub e todas as outras
+    requisições do worker; aqui a requisição só espera o resultado. No máximo
+    PASSWORD_HASH_MAX_PENDING operações ficam em andamento por processo; as
+    demais esperam até PASSWORD_HASH_QUEUE_TIMEOUT segundos por uma vaga e
+    então recebem PasswordHashBusy. Com PASSWORD_HASH_WORKERS = 0 o hashing
+    roda inline (útil em testes e no comando de benchmark).
+    """
+
+    def __init__(self, workers=0, max_pending=32, queue_timeout=5.0):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.queue_timeout = app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING'])
+
+    def _get_pool(self):
+        # Criado no primeiro uso, depois do fork dos workers do gunicorn
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(POOL_START_METHOD))
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            logger.warning("Fila de hashing de senhas cheia; requisição recusada")
+            raise PasswordHashBusy('Fila de hashing de senhas cheia.')
+        try:
+            return self._get_pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_generate, password)
+
+    def check(self, pwhash, password):
+        if not pwhash or not password:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+password_hasher = PasswordHasher()
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(pct / 100 * (len(values) - 1)))] if values else 0.0
+
+
+def benchmark(hasher, concurrency, logins, heartbeat_interval=0.01):
+    """Mede logins simultâneos com o hasher dado.
+
+    Enquanto isso, uma tarefa leve acorda a cada heartbeat_interval segundos;
+    o atraso dela mostra quanto o hashing trava as demais requisições.
+    Retorna as latências (em ms) de login p50/p99 e o atraso p99 da tarefa leve.
+    """
+    password = 'benchmark-password'
+    pwhash = _generate(password)
+    # Aquece o pool (criação dos processos) fora da medição
+    for _ in range(max(hasher.workers, 1)):
+        hasher.check(pwhash, password)
+
+    latencies, delays = [], []
+    done = threading.Event()
+
+    def login():
+        started = time.perf_counter()
+        hasher.check(pwhash, password)
+        latencies.append(time.perf_counter() - started)
+
+    def heartbeat():
+        while not done.is_set():
+            started = time.perf_counter()
+            time.sleep(heartbeat_interval)
+            delays.append(time.perf_counter() - started - heartbeat_interval)
+
+    monitor = threading.Thread(target=heartbeat, daemon=True)
+    monitor.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(login) for _ in range(logins)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    done.set()
+    monitor.join()
+    return {
+        'login_p50_ms': _percentile(latencies, 50) * 1000,
+        'login_p99_ms': _percentile(latencies, 99) * 1000,
+        'stall_p99_ms': _percentile(delays, 99) * 1000,
+        'logins_per_s': logins / elapsed,
+    }
@@ -1,9 +1,18 @@
-import json
 import math
+import time
 from datetime import datetime
-from flask import session
+import pytz
+from flask import session, g, has_app_context
 from backend.extensions import db
-from backend.models import User, Post, Comment, Like
+from backend.models import User, PageVisit, ActivityEvent, UserActivityTotals
+from backend.activity_buffer import activity_buffer
+
+# Segundos que o progresso calculado fica em cache por usuário (o dashboard consulta a cada 30s)
+PROGRESS_CACHE_TTL = 20
+PROGRESS_CACHE_SIZE = 1024
+
+# user_id -> (expira_em, progresso)
+_progress_cache = {}
 
 class ProgressTracker:
     # Defina todas as páginas do seu site
@@ -33,50 +42,106 @@ class ProgressTracker:
         'like_given': 3,
         'profile_updated': 8
     }
+
+    # Pontos que valem 100% de progresso e multiplicador por visitar todas as páginas
+    MAX_POINTS = 200
+    ALL_PAGES_BONUS = 1.2
+
+    # Efeito de cada tipo de evento de activity_events nos totais: (coluna, delta, peso)
+    EVENT_COUNTERS = {
+        'post_created': ('posts_count', 1, 'post_created'),
+        'post_deleted': ('posts_count', -1, 'post_created'),
+        'comment_created': ('comments_count', 1, 'comment_created'),
+        'comment_deleted': ('comments_count', -1, 'comment_created'),
+        'like_given': ('likes_count', 1, 'like_given'),
+        'like_removed': ('likes_count', -1, 'like_given'),
+        'page_visit': ('pages_visited', 1, 'page_visit'),
+        'profile_updated': ('profile_updates', 1, 'profile_updated'),
+    }
+    TOTALS_COLUMNS = ('posts_count', 'comments_count', 'likes_count', 'pages_visited',
+                      'profile_updates', 'activity_points')
     
     @staticmethod
     def track_page_visit(user_id, page_name):
-        """Registra a visita a uma página"""
+        """Registra a visita a uma página.
+
+        A gravação é feita em lote pelo activity_buffer, fora da requisição.
+        """
         if not user_id or page_name not in ProgressTracker.PAGES:
             return
-        
-        user = db.session.get(User, user_id)
-        if not user:
-            return
-        
-        # Atualizar páginas visitadas
-        try:
-            visited_pages = json.loads(user.visited_pages) if user.visited_pages else {}
-        except (json.JSONDecodeError, TypeError):
-            visited_pages = {}
-        
-        visited_pages[page_name] = datetime.now().isoformat()
-        user.visited_pages = json.dumps(visited_pages)
-        user.last_activity = datetime.utcnow()
-        
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            print(f"Erro ao rastrear visita da página: {str(e)}")
+        activity_buffer.record_visit(user_id, page_name, datetime.now(pytz.UTC))
+
+    @staticmethod
+    def fold_events(events):
+        """Agrega eventos {user_id: [(tipo, horário), ...]} em deltas por usuário para user_activity_totals."""
+        totals = {}
+        for user_id, user_events in events.items():
+            for activity_type, _ in user_events:
+                counter = ProgressTracker.EVENT_COUNTERS.get(activity_type)
+                if counter is None:
+                    continue
+                column, delta, weight = counter
+                row = totals.setdefault(user_id, dict.fromkeys(ProgressTracker.TOTALS_COLUMNS, 0))
+                row[column] += delta
+                row['activity_points'] += delta * ProgressTracker.ACTIVITY_WEIGHTS[weight]
+        return totals
+
+    @staticmethod
+    def rebuild_activity_totals():
+        """Recalcula user_activity_totals a partir do log de eventos (ex.: após mudar os pesos).
+
+        Retorna quantos usuários têm totais.
+        """
+        events = ActivityEvent.__table__
+        totals = UserActivityTotals.__table__
+
+        def summed(pairs):
+            return db.func.coalesce(db.func.sum(db.case(
+                *[(events.c.type == activity_type, value) for activity_type, value in pairs],
+                else_=0
+            )), 0)
+
+        counters = ProgressTracker.EVENT_COUNTERS.items()
+        columns = [
+            summed([(activity_type, delta) for activity_type, (name, delta, _) in counters if name == column])
+            for column in ProgressTracker.TOTALS_COLUMNS[:-1]
+        ]
+        columns.append(summed([
+            (activity_type, delta * ProgressTracker.ACTIVITY_WEIGHTS[weight])
+            for activity_type, (_, delta, weight) in counters
+        ]))
+        db.session.execute(totals.delete())
+        db.session.execute(totals.insert().from_select(
+            ['user_id', *ProgressTracker.TOTALS_COLUMNS, 'updated_at'],
+            db.select(events.c.user_id, *columns, db.literal(datetime.now(pytz.UTC), db.DateTime))
+            .group_by(events.c.user_id)
+        ))
+        db.session.commit()
+        return db.session.query(db.func.count()).select_from(totals).scalar()
+
+    @staticmethod
+    def get_visited_pages(user_id):
+        """Páginas visitadas pelo usuário: {página: horário ISO da última visita}"""
+        rows = db.session.query(PageVisit.page, PageVisit.last_seen).filter(PageVisit.user_id == user_id)
+        return {page: last_seen.isoformat() for page, last_seen in rows}
+
+    @staticmethod
+    def users_without_visit(page_name):
+        """Consulta dos usuários que nunca visitaram a página (NOT EXISTS indexado)"""
+        visited = db.session.query(PageVisit.user_id).filter(
+            PageVisit.page == page_name,
+            PageVisit.user_id == User.id
+        ).exists()
+        return User.query.filter(~visited)
     
     @staticmethod
     def calculate_resources_count(user_id):
         """Calcula o número de recursos acessados pelo usuário"""
         try:
-            user = db.session.get(User, user_id)
-            if not user:
-                return 0
-            
-            # Obter páginas visitadas
-            try:
-                visited_pages = json.loads(user.visited_pages) if user.visited_pages else {}
-            except (json.JSONDecodeError, TypeError):
-                visited_pages = {}
-            
-            # Contar apenas páginas que são recursos
-            resources_accessed = sum(1 for page_key in visited_pages.keys() 
-                                   if page_key in ProgressTracker.RESOURCE_PAGES)
+            resources_accessed = db.session.query(db.func.count()).select_from(PageVisit).filter(
+                PageVisit.user_id == user_id,
+                PageVisit.page.in_(list(ProgressTracker.RESOURCE_PAGES))
+            ).scalar() or 0
             
             return resources_accessed
             
@@ -84,114 +149,147 @@ class ProgressTracker:
             print(f"Erro ao calcular resources_count: {str(e)}")
             return 0
     
+    @staticmethod
+    def load_activity(user_id):
+        """Carrega os totais de atividade e as páginas visitadas numa única consulta.
+
+        Os totais vêm de user_activity_totals (mantido pelo activity_buffer) e a
+        junção com page_visits traz uma linha por página visitada. Retorna None
+        se o usuário não existe.
+        """
+        rows = db.session.execute(
+            db.select(
+                UserActivityTotals.posts_count,
+                UserActivityTotals.comments_count,
+                UserActivityTotals.likes_count,
+                UserActivityTotals.activity_points,
+                PageVisit.page,
+                PageVisit.last_seen
+            )
+            .select_from(User)
+            .outerjoin(UserActivityTotals, UserActivityTotals.user_id == User.id)
+            .outerjoin(PageVisit, PageVisit.user_id == User.id)
+            .where(User.id == user_id)
+        ).all()
+        if not rows:
+            return None
+        visited_pages = {row.page: row.last_seen.isoformat() for row in rows if row.page is not None}
+        first = rows[0]
+        return (max(first.posts_count or 0, 0), max(first.comments_count or 0, 0),
+                max(first.likes_count or 0, 0), max(first.activity_points or 0, 0), visited_pages)
+
+    @staticmethod
+    def empty_progress():
+        return {
+            'progress_percentage': 0,
+            'activity_points': 0,
+            'resources_count': 0,
+            'details': {
+                'posts_count': 0,
+                'comments_count': 0,
+                'likes_count': 0,
+                'pages_visited': 0,
+                'total_pages': len(ProgressTracker.PAGES),
+                'resources_accessed': 0,
+                'total_resources': len(ProgressTracker.RESOURCE_PAGES),
+                'visited_pages': {},
+                'pages_info': ProgressTracker.PAGES,
+                'resource_pages_info': ProgressTracker.RESOURCE_PAGES
+            }
+        }
+
     @staticmethod
     def calculate_progress(user_id):
-        """Calcula o progresso total do usuário"""
-        try:
-            user = db.session.get(User, user_id)
-            if not user:
-                return {
-                    'progress_percentage': 0,
-                    'activity_points': 0,
-                    'resources_count': 0,
-                    'details': {
-                        'posts_count': 0,
-                        'comments_count': 0,
-                        'likes_count': 0,
-                        'pages_visited': 0,
-                        'total_pages': len(ProgressTracker.PAGES),
-                        'resources_accessed': 0,
-                        'total_resources': len(ProgressTracker.RESOURCE_PAGES),
-                        'visited_pages': {},
-                        'pages_info': ProgressTracker.PAGES
-                    }
-                }
-            
-            # Calcular pontos de atividades com tratamento de erro
+        """Calcula o progresso total do usuário.
+
+        O resultado é memoizado na requisição (get_next_actions e get_user_stats
+        reaproveitam o mesmo cálculo) e fica em cache por PROGRESS_CACHE_TTL
+        segundos; cada gravação do activity_buffer invalida os usuários afetados.
+        """
+        memo = g.setdefault('progress', {}) if has_app_context() else {}
+        if user_id in memo:
+            return memo[user_id]
+        now = time.monotonic()
+        cached = _progress_cache.get(user_id)
+        if cached and cached[0] > now:
+            progress = cached[1]
+        else:
             try:
-                posts_count = Post.query.filter_by(user_id=user.id).count() or 0
-                comments_count = Comment.query.filter_by(user_id=user.id).count() or 0
-                likes_count = Like.query.filter_by(user_id=user.id).count() or 0
+                progress = ProgressTracker.compute_progress(user_id)
             except Exception as e:
-                print(f"Erro ao contar atividades: {str(e)}")
-                posts_count = comments_count = likes_count = 0
-            
-            # Calcular páginas visitadas com tratamento de erro
-            try:
-                visited_pages = json.loads(user.visited_pages) if user.visited_pages else {}
-            except (json.JSONDecodeError, TypeError):
-                visited_pages = {}
-            
-            pages_visited = len(visited_pages)
-            total_pages = len(ProgressTracker.PAGES)
-            
-            # Calcular recursos acessados
-            resources_count = ProgressTracker.calculate_resources_count(user_id)
-            
-            # Calcular pontos
-            activity_points = (
-                posts_count * ProgressTracker.ACTIVITY_WEIGHTS['post_created'] +
-                comments_count * ProgressTracker.ACTIVITY_WEIGHTS['comment_created'] +
-                likes_count * ProgressTracker.ACTIVITY_WEIGHTS['like_given'] +
-                pages_visited * ProgressTracker.ACTIVITY_WEIGHTS['page_visit']
-            )
-            
-            # Garantir que activity_points não seja None ou NaN
-            if activity_points is None or math.isnan(activity_points):
-                activity_points = 0
-            
-            # Calcular porcentagem (base 200 pontos para 100%)
-            max_points = 200
-            if max_points == 0:
-                progress_percentage = 0
+                print(f"Erro geral em calculate_progress: {str(e)}")
+                return ProgressTracker.empty_progress()
+            if len(_progress_cache) >= PROGRESS_CACHE_SIZE:
+                for key, (expires_at, _) in list(_progress_cache.items()):
+                    if expires_at <= now:
+                        _progress_cache.pop(key, None)
+            _progress_cache[user_id] = (now + PROGRESS_CACHE_TTL, progress)
+        memo[user_id] = progress
+        return progress
+
+    @staticmethod
+    def invalidate(user_id=None):
+        """Descarta o progresso em cache de um usuário (ou de todos)."""
+        if user_id is None:
+            _progress_cache.clear()
+        else:
+            _progress_cache.pop(user_id, None)
+        if has_app_context():
+            memo = g.get('progress', {})
+            if user_id is None:
+                memo.clear()
             else:
-                progress_percentage = min((activity_points / max_points) * 100, 100)
-            
-            # Bonus por completar todas as páginas
-            if pages_visited == total_pages and total_pages > 0:
-                progress_percentage = min(progress_percentage * 1.2, 100)
-            
-            # Garantir que progress_percentage não seja None ou NaN
-            if progress_percentage is None or math.isnan(progress_percentage):
-                progress_percentage = 0
-            
-            return {
-                'progress_percentage': round(float(progress_percentage), 2),
-                'activity_points': int(activity_points),
-                'resources_count': resources_count,
-                'details': {
-                    'posts_count': posts_count,
-                    'comments_count': comments_count,
-                    'likes_count': likes_count,
-                    'pages_visited': pages_visited,
-                    'total_pages': total_pages,
-                    'resources_accessed': resources_count,
-                    'total_resources': len(ProgressTracker.RESOURCE_PAGES),
-                    'visited_pages': visited_pages,
-                    'pages_info': ProgressTracker.PAGES,
-                    'resource_pages_info': ProgressTracker.RESOURCE_PAGES
-                }
-            }
-            
-        except Exception as e:
-            print(f"Erro geral em calculate_progress: {str(e)}")
-            return {
-                'progress_percentage': 0,
-                'activity_points': 0,
-                'resources_count': 0,
-                'details': {
-                    'posts_count': 0,
-                    'comments_count': 0,
-                    'likes_count': 0,
-                    'pages_visited': 0,
-                    'total_pages': len(ProgressTracker.PAGES),
-                    'resources_accessed': 0,
-                    'total_resources': len(ProgressTracker.RESOURCE_PAGES),
-                    'visited_pages': {},
-                    'pages_info': ProgressTracker.PAGES,
-                    'resource_pages_info': ProgressTracker.RESOURCE_PAGES
-                }
+                memo.pop(user_id, None)
+
+    @staticmethod
+    def compute_progress(user_id):
+        activity = ProgressTracker.load_activity(user_id)
+        if activity is None:
+            return ProgressTracker.empty_progress()
+        posts_count, comments_count, likes_count, activity_points, visited_pages = activity
+
+        pages_visited = len(visited_pages)
+        total_pages = len(ProgressTracker.PAGES)
+
+        # Calcular recursos acessados
+        resources_count = sum(1 for page in visited_pages if page in ProgressTracker.RESOURCE_PAGES)
+
+        # Garantir que activity_points não seja None ou NaN
+        if activity_points is None or math.isnan(activity_points):
+            activity_points = 0
+
+        # Calcular porcentagem (base 200 pontos para 100%)
+        max_points = ProgressTracker.MAX_POINTS
+        if max_points == 0:
+            progress_percentage = 0
+        else:
+            progress_percentage = min((activity_points / max_points) * 100, 100)
+
+        # Bonus por completar todas as páginas
+        if pages_visited == total_pages and total_pages > 0:
+            progress_percentage = min(progress_percentage * ProgressTracker.ALL_PAGES_BONUS, 100)
+
+        # Garantir que progress_percentage não seja None ou NaN
+        if progress_percentage is None or math.isnan(progress_percentage):
+            progress_percentage = 0
+
+        return {
+            'progress_percentage': round(float(progress_percentage), 2),
+            'activity_points': int(activity_points),
+            'resources_count': resources_count,
+            'details': {
+                'posts_count': posts_count,
+                'comments_count': comments_count,
+                'likes_count': likes_count,
+                'pages_visited': pages_visited,
+                'total_pages': total_pages,
+                'resources_accessed': resources_count,
+                'total_resources': len(ProgressTracker.RESOURCE_PAGES),
+                'visited_pages': visited_pages,
+                'pages_info': ProgressTracker.PAGES,
+                'resource_pages_info': ProgressTracker.RESOURCE_PAGES
             }
+        }
     
     @staticmethod
     def get_next_actions(user_id):
@@ -279,4 +377,10 @@ class ProgressTracker:
                     'pages_visited': 0,
                     'resources_accessed': 0
                 }
-            }
\ No newline at end of file
+            }
+
+
+@activity_buffer.on_flush
+def _invalidate_progress(user_ids):
+    for user_id in user_ids:
+        _progress_cache.pop(user_id, None)
@@ -0,0 +1,210 @@
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from backend.extensions import db
+from backend.models import (User, Post, Comment, Like, PageVisit, LeaderboardEntry, AnalyticsRollup, ResetCode,
+                            UserActivityTotals, UserSession, OutboundEmail)
+
+# Valores de exemplo usados nos parâmetros das consultas (o plano não depende deles)
+SAMPLE_USER_ID = 1
+SAMPLE_POST_ID = 1
+SAMPLE_COMMENT_ID = 1
+SAMPLE_CURSOR = datetime(2025, 1, 1)
+
+
+def hot_queries():
+    """Consultas críticas do app.py, do ProgressTracker, dos fragmentos, das sessões e da fila
+    de e-mails, espelhando os filtros usados lá (ao mudar uma delas, mude aqui também)."""
+    return {
+        'feed_primeira_pagina': db.select(Post)
+            .where(Post.created_at.isnot(None))
+            .order_by(Post.created_at.desc(), Post.id.desc())
+            .limit(11),
+        'feed_pagina_cursor': db.select(Post)
+            .where(
+                Post.created_at.isnot(None),
+                Post.created_at <= SAMPLE_CURSOR,
+                db.or_(
+                    Post.created_at < SAMPLE_CURSOR,
+                    db.and_(Post.created_at == SAMPLE_CURSOR, Post.id < SAMPLE_POST_ID)
+                )
+            )
+            .order_by(Post.created_at.desc(), Post.id.desc())
+            .limit(11),
+        'feed_por_categoria': db.select(Post)
+            .where(Post.category == 'IA')
+            .order_by(Post.created_at.desc())
+            .limit(10),
+        'comentarios_do_post': db.select(Comment)
+            .where(Comment.post_id == SAMPLE_POST_ID)
+            .order_by(Comment.created_at),
+        'respostas_do_comentario': db.select(Comment)
+            .where(Comment.parent_id == SAMPLE_COMMENT_ID),
+        'curtidas_do_usuario_em_posts': db.select(Like.post_id)
+            .where(Like.user_id == SAMPLE_USER_ID, Like.post_id.in_([1, 2, 3])),
+        'curtidas_do_usuario_em_comentarios': db.select(Like.comment_id)
+            .where(Like.user_id == SAMPLE_USER_ID, Like.comment_id.in_([1, 2, 3])),
+        'curtidas_do_usuario_no_lote': db.select(Like.post_id, Like.comment_id)
+            .where(Like.user_id == SAMPLE_USER_ID,
+                   db.or_(Like.post_id.in_([1, 2, 3]), Like.comment_id.in_([1, 2, 3]))),
+        'fragmento_autores': db.select(Post.user_id).where(Post.id.in_([1, 2, 3]))
+            .union(db.select(Comment.user_id).where(Comment.post_id.in_([1, 2, 3]))),
+        'telainicial_ids': db.select(Post.id)
+            .order_by(Post.created_at.desc())
+            .limit(10),
+        'progresso_totais_e_paginas': db.select(
+                UserActivityTotals.posts_count, UserActivityTotals.comments_count,
+                UserActivityTotals.likes_count, UserActivityTotals.activity_points,
+                PageVisit.page, PageVisit.last_seen
+            )
+            .select_from(User)
+            .outerjoin(UserActivityTotals, UserActivityTotals.user_id == User.id)
+            .outerjoin(PageVisit, PageVisit.user_id == User.id)
+            .where(User.id == SAMPLE_USER_ID),
+        'progresso_paginas_visitadas': db.select(PageVisit.page, PageVisit.last_seen)
+            .where(PageVisit.user_id == SAMPLE_USER_ID),
+        'progresso_recursos_acessados': db.select(db.func.count())
+            .select_from(PageVisit)
+            .where(PageVisit.user_id == SAMPLE_USER_ID, PageVisit.page.in_(['videos', 'materiais', 'pdfs', 'codigo'])),
+        'visitantes_da_pagina': db.select(PageVisit.user_id)
+            .where(PageVisit.page == 'pdfs'),
+        'ranking_pagina': db.select(LeaderboardEntry)
+            .where(LeaderboardEntry.position.between(21, 41))
+            .order_by(LeaderboardEntry.position),
+        'ranking_do_usuario': db.select(LeaderboardEntry)
+            .where(LeaderboardEntry.user_id == SAMPLE_USER_ID),
+        'serie_de_metricas': db.select(AnalyticsRollup.bucket_start, AnalyticsRollup.dimension, AnalyticsRollup.value)
+            .where(
+                AnalyticsRollup.granularity == 'day',
+                AnalyticsRollup.metric == 'posts',
+                AnalyticsRollup.bucket_start >= SAMPLE_CURSOR - timedelta(days=30),
+                AnalyticsRollup.bucket_start <= SAMPLE_CURSOR
+            ),
+        'codigo_de_redefinicao': db.select(ResetCode)
+            .where(ResetCode.email == 'usuario@example.com', ResetCode.code == '123456'),
+        'codigos_expirados': db.select(ResetCode.email, ResetCode.code)
+            .where(ResetCode.expires_at < SAMPLE_CURSOR),
+        'sessao_por_token': db.select(UserSession.user_id, UserSession.expires_at)
+            .where(UserSession.id == 'a' * 64),
+        'sessoes_do_usuario': db.select(UserSession.id, UserSession.last_active)
+            .where(UserSession.user_id == SAMPLE_USER_ID, UserSession.expires_at > SAMPLE_CURSOR),
+        'sessoes_expiradas': db.select(UserSession.id)
+            .where(UserSession.expires_at <= SAMPLE_CURSOR),
+        'emails_vencidos': db.select(OutboundEmail.id, OutboundEmail.next_attempt_at)
+            .where(OutboundEmail.status.in_(('pending', 'sending')),
+                   OutboundEmail.next_attempt_at <= SAMPLE_CURSOR)
+            .order_by(OutboundEmail.next_attempt_at)
+            .limit(50),
+        'emails_enviados_antigos': db.select(OutboundEmail.id)
+            .where(OutboundEmail.status == 'sent', OutboundEmail.sent_at < SAMPLE_CURSOR),
+    }
+
+
+def explain(connection, statement):
+    """Retorna as linhas do plano de execução da consulta para o banco conectado."""
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    result = connection.exec_driver_sql(prefix + str(compiled), params)
+    return [dict(row._mapping) for row in result]
+
+
+def full_scans(connection, plan):
+    """Extrai do plano os acessos que leem uma tabela inteira (sem índice)."""
+    dialect = connection.dialect.name
+    scans = []
+    for row in plan:
+        if dialect == 'sqlite':
+            detail = row.get('detail', '')
+            # "SCAN posts" é varredura completa; "SCAN posts USING INDEX" percorre o índice
+            if detail.startswith('SCAN ') and 'USING' not in detail:
+                scans.append(detail)
+        elif dialect == 'postgresql':
+            line = row.get('QUERY PLAN', '')
+            if 'Seq Scan' in line:
+                scans.append(line.strip())
+        elif dialect in ('mysql', 'mariadb'):
+            if row.get('type') == 'ALL':
+                scans.append(f"full scan em {row.get('table')}")
+    return scans
+
+
+def check_query_plans(connection):
+    """Executa EXPLAIN em cada consulta crítica.
+
+    Retorna (planos, regressões), onde regressões mapeia o nome da consulta para
+    os acessos sem índice encontrados.
+    """
+    if connection.dialect.name == 'postgresql':
+        # Em bases pequenas o Postgres prefere Seq Scan mesmo com índice;
+        # desligar o seqscan verifica se existe um índice utilizável.
+        connection.exec_driver_sql('SET enable_seqscan = off')
+    plans = {}
+    regressions = {}
+    for name, statement in hot_queries().items():
+        plan = explain(connection, statement)
+        plans[name] = plan
+        scans = full_scans(connection, plan)
+        if scans:
+            regressions[name] = scans
+    return plans, regressions
+
+
+def seeded_sqlite_engine(rows=2000):
+    """Cria um SQLite em memória com o schema dos modelos (incluindo índices) e dados sintéticos."""
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    rng = random.Random(42)
+    base = datetime(2025, 1, 1)
+    users = max(rows // 20, 1)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password': ''}
+            for i in range(1, users + 1)
+        ])
+        connection.execute(Post.__table__.insert(), [
+            {'id': i, 'content': f'post {i}', 'user_id': rng.randint(1, users),
+             'category': rng.choice(['IA', 'Redes', 'Back-end', 'Front-end']),
+             'created_at': base + timedelta(minutes=i)}
+            for i in range(1, rows + 1)
+        ])
+        connection.execute(Comment.__table__.insert(), [
+            {'id': i, 'content': f'comentário {i}', 'user_id': rng.randint(1, users),
+             'post_id': rng.randint(1, rows),
+             'parent_id': rng.randint(1, i - 1) if i > 1 and i % 3 == 0 else None,
+             'created_at': base + timedelta(minutes=i)}
+            for i in range(1, rows * 2 + 1)
+        ])
+        connection.execute(Like.__table__.insert(), [
+            {'user_id': user_id, 'post_id': post_id}
+            for user_id, post_id in {(rng.randint(1, users), rng.randint(1, rows)) for _ in range(rows * 2)}
+        ])
+        pages = ['home', 'videos', 'materiais', 'pdfs', 'codigo', 'comunidade']
+        connection.execute(PageVisit.__table__.insert(), [
+            {'user_id': user_id, 'page': page, 'first_seen': base, 'last_seen': base, 'count': 1}
+            for user_id in range(1, users + 1) for page in pages if rng.random() < 0.6
+        ])
+        connection.execute(UserActivityTotals.__table__.insert(), [
+            {'user_id': user_id, 'activity_points': rng.randint(0, 300), 'updated_at': base}
+            for user_id in range(1, users + 1)
+        ])
+        connection.execute(UserSession.__table__.insert(), [
+            {'id': f'{i:064x}', 'user_id': rng.randint(1, users), 'created_at': base, 'last_active': base,
+             'expires_at': base + timedelta(days=rng.randint(-30, 30))}
+            for i in range(1, rows + 1)
+        ])
+        connection.execute(OutboundEmail.__table__.insert(), [
+            {'recipient': f'user{i}@example.com', 'subject': 'assunto', 'html': '',
+             'status': 'sent' if i % 10 else 'pending', 'next_attempt_at': base + timedelta(minutes=i),
+             'created_at': base, 'sent_at': base + timedelta(minutes=i) if i % 10 else None}
+            for i in range(1, rows + 1)
+        ])
+        connection.exec_driver_sql('ANALYZE')
+    return engine
@@ -0,0 +1,165 @@
+import logging
+import secrets
+import string
+import threading
+import time
+from datetime import datetime, timedelta
+import pytz
+from backend.extensions import db
+from backend.models import ResetCode
+
+logger = logging.getLogger(__name__)
+
+CODE_TTL = timedelta(minutes=10)
+# Intervalo mínimo entre varreduras dos códigos expirados (por processo)
+SWEEP_INTERVAL = 600
+# Verificações erradas aceitas por janela antes de recusar sem consultar o banco
+ATTEMPT_WINDOW = 900
+MAX_ATTEMPTS_PER_EMAIL = 5
+MAX_ATTEMPTS_PER_IP = 20
+# Códigos emitidos por janela: cada emissão envia um e-mail, então o limite
+# também protege a caixa de entrada da vítima e a fila de envio
+ISSUE_WINDOW = 3600
+MAX_CODES_PER_EMAIL = 3
+MAX_CODES_PER_IP = 10
+MAX_TRACKED_KEYS = 10000
+
+reset_codes_table = ResetCode.__table__
+
+
+class AttemptLimiter:
+    """Conta tentativas erradas (ou códigos emitidos) por chave, e-mail ou IP, em janelas fixas.
+
+    Fica em memória, por processo: com vários workers o limite efetivo é
+    multiplicado pelo número deles, o que ainda corta a força bruta.
+    """
+
+    def __init__(self, limit, window=ATTEMPT_WINDOW):
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def _current(self, key, now):
+        entry = self._counts.get(key)
+        if entry is None or now - entry[0] >= self.window:
+            return None
+        return entry
+
+    def blocked(self, key):
+        with self._lock:
+            entry = self._current(key, time.monotonic())
+            return entry is not None and entry[1] >= self.limit
+
+    def record_failure(self, key):
+        """Registra uma tentativa (errada ou, nos limites de emissão, um código emitido).
+
+        Retorna True se a chave atingiu o limite.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._current(key, now)
+            count = entry[1] + 1 if entry else 1
+            self._counts[key] = (entry[0] if entry else now, count)
+            if len(self._counts) > MAX_TRACKED_KEYS:
+                self._counts = {k: v for k, v in self._counts.items() if now - v[0] < self.window}
+            return count >= self.limit
+
+    def reset(self, key):
+        with self._lock:
+            self._counts.pop(key, None)
+
+
+email_attempts = AttemptLimiter(MAX_ATTEMPTS_PER_EMAIL)
+ip_attempts = AttemptLimiter(MAX_ATTEMPTS_PER_IP)
+email_issues = AttemptLimiter(MAX_CODES_PER_EMAIL, ISSUE_WINDOW)
+ip_issues = AttemptLimiter(MAX_CODES_PER_IP, ISSUE_WINDOW)
+
+_sweep_lock = threading.Lock()
+_last_sweep = 0
+
+
+def normalize_email(email):
+    """Forma canônica do e-mail nas chaves de códigos e limites.
+
+    Com collation *_ci o banco acha o código com qualquer caixa; sem
+    normalizar, cada variação (User@x, USER@x...) ganharia um limite novo.
+    """
+    return (email or '').strip().lower()
+
+
+def generate_reset_code():
+    """Gera um código de 6 dígitos."""
+    return ''.join(secrets.choice(string.digits) for _ in range(6))
+
+
+def sweep_expired():
+    """Apaga em lote os códigos expirados (usa o índice de expires_at). Retorna quantos."""
+    removed = db.session.execute(
+        reset_codes_table.delete().where(reset_codes_table.c.expires_at < datetime.now(pytz.UTC))
+    ).rowcount
+    if removed:
+        logger.info(f"{removed} código(s) de redefinição expirado(s) removido(s)")
+    return removed
+
+
+def _maybe_sweep():
+    # Sem tráfego de redefinição a tabela não cresce, então basta varrer quando há emissão
+    global _last_sweep
+    now = time.monotonic()
+    with _sweep_lock:
+        if now - _last_sweep < SWEEP_INTERVAL:
+            return
+        _last_sweep = now
+    sweep_expired()
+
+
+def revoke_codes(email):
+    db.session.execute(reset_codes_table.delete().where(reset_codes_table.c.email == normalize_email(email)))
+
+
+def is_issue_throttled(email, ip):
+    """True se o e-mail ou o IP já recebeu códigos demais na janela de emissão."""
+    return email_issues.blocked(normalize_email(email)) or ip_issues.blocked(ip)
+
+
+def issue_code(email, ip):
+    """Emite um código para o e-mail, substituindo o anterior. Quem chama faz o commit.
+
+    A emissão conta nos limites por e-mail e por IP; as tentativas erradas do
+    e-mail não recomeçam com o código novo (só um acerto zera a contagem).
+    """
+    _maybe_sweep()
+    email = normalize_email(email)
+    email_issues.record_failure(email)
+    ip_issues.record_failure(ip)
+    revoke_codes(email)
+    code = generate_reset_code()
+    db.session.add(ResetCode(email=email, code=code, expires_at=datetime.now(pytz.UTC) + CODE_TTL))
+    return code
+
+
+def is_expired(reset_code):
+    # expires_at volta do banco sem fuso (gravado em UTC)
+    return datetime.now(pytz.UTC) > reset_code.expires_at.replace(tzinfo=pytz.UTC)
+
+
+def find_code(email, code):
+    return db.session.get(ResetCode, (normalize_email(email), code))
+
+
+def is_throttled(email, ip):
+    return email_attempts.blocked(normalize_email(email)) or ip_attempts.blocked(ip)
+
+
+def record_failed_attempt(email, ip):
+    """Conta uma verificação errada; ao atingir o limite do e-mail, o código dele é invalidado."""
+    ip_attempts.record_failure(ip)
+    if email_attempts.record_failure(normalize_email(email)):
+        revoke_codes(email)
+        db.session.commit()
+        logger.warning(f"Código de redefinição de {email} invalidado após {MAX_ATTEMPTS_PER_EMAIL} tentativas erradas")
+
+
+def record_success(email):
+    email_attempts.reset(normalize_email(email))
@@ -1,11 +1,11 @@
-from flask import Blueprint, request, jsonify, render_template, flash, current_app
-from backend.models import User, ResetCode
+from flask import Blueprint, request, jsonify, render_template, flash
+from backend.models import User
 from backend.extensions import db
-from werkzeug.security import generate_password_hash
+from backend.passwords import password_hasher
+from backend.mail_queue import mail_queue
+from backend import reset_codes
+from backend.sessions import server_sessions
 from firebase_admin import auth
-import random
-import string
-from datetime import datetime, timedelta
 import logging
 
 # Configurar logging
@@ -14,19 +14,6 @@ logger = logging.getLogger(__name__)
 
 reset_bp = Blueprint('reset', __name__)
 
-def generate_reset_code():
-    """Gera um código de 6 dígitos."""
-    return ''.join(random.choices(string.digits, k=6))
-
-def send_reset_email(to_email, subject, html_content):
-    """Envia e-mail via SMTP usando Flask-Mail"""
-    from app import mail  # importa o mail já inicializado no app.py
-    from flask_mail import Message
-
-    sender = current_app.config.get('MAIL_DEFAULT_SENDER', 'technobugproject@gmail.com')
-    msg = Message(subject, recipients=[to_email], html=html_content, sender=sender)
-    mail.send(msg)
-
 @reset_bp.route('/reset_password', methods=['GET'])
 def reset_password_form():
     return render_template('reset_password.html')
@@ -40,6 +27,13 @@ def reset_password():
         flash('Por favor, forneça um email.', 'error')
         return jsonify({'status': 'error', 'message': 'Por favor, forneça um email.'}), 400
 
+    # Cada código emitido envia um e-mail: limita por e-mail e por IP antes de consultar o banco
+    ip = request.remote_addr
+    if reset_codes.is_issue_throttled(email, ip):
+        logger.warning(f"Emissão de código bloqueada para {email} ({ip}): códigos demais")
+        flash('Muitas solicitações. Aguarde alguns minutos e tente novamente.', 'error')
+        return jsonify({'status': 'error', 'message': 'Muitas solicitações. Aguarde alguns minutos e tente novamente.'}), 429
+
     # 1. Checar se é usuário local
     local_user = User.query.filter_by(email=email).first()
     found_in_firebase = False
@@ -55,12 +49,8 @@ def reset_password():
             flash('Email não registrado.', 'error')
             return jsonify({'status': 'error', 'message': 'Email não registrado.'}), 404
 
-    code = generate_reset_code()
-    expires_at = datetime.utcnow() + timedelta(minutes=10)
-
-    reset_code = ResetCode(email=email, code=code, expires_at=expires_at)
-    db.session.add(reset_code)
-    db.session.commit()
+    # Substitui o código anterior deste e-mail, se houver
+    code = reset_codes.issue_code(email, ip)
 
     subject = 'Código de Redefinição de Senha - TechnoBug'
     html_content = f"""
@@ -71,9 +61,11 @@ def reset_password():
     <p>Atenciosamente,<br>Equipe TechnoBug</p>
     """
 
-    send_reset_email(email, subject, html_content)
+    # Código e e-mail gravados juntos; o envio acontece na fila (backend/mail_queue.py)
+    mail_queue.enqueue(email, subject, html_content)
+    db.session.commit()
 
-    logger.info(f"Email com código de redefinição enviado para: {email}")
+    logger.info(f"Email com código de redefinição enfileirado para: {email}")
     flash('Um código de redefinição foi enviado para o seu e-mail. Verifique sua caixa de entrada ou spam.', 'success')
     return jsonify({
         'status': 'success',
@@ -110,13 +102,21 @@ def verify_reset_code():
         flash('A senha deve ter pelo menos 8 caracteres.', 'error')
         return jsonify({'status': 'error', 'message': 'A senha deve ter pelo menos 8 caracteres.'}), 400
 
-    reset_code = ResetCode.query.filter_by(email=email, code=code).first()
+    # Força bruta é recusada antes de consultar o banco
+    ip = request.remote_addr
+    if reset_codes.is_throttled(email, ip):
+        logger.warning(f"Verificação de código bloqueada para {email} ({ip}): tentativas demais")
+        flash('Muitas tentativas. Aguarde alguns minutos e tente novamente.', 'error')
+        return jsonify({'status': 'error', 'message': 'Muitas tentativas. Aguarde alguns minutos e tente novamente.'}), 429
+
+    reset_code = reset_codes.find_code(email, code)
     if not reset_code:
+        reset_codes.record_failed_attempt(email, ip)
         logger.warning(f"Código inválido para {email}")
         flash('Código inválido.', 'error')
         return jsonify({'status': 'error', 'message': 'Código inválido.'}), 404
 
-    if datetime.utcnow() > reset_code.expires_at:
+    if reset_codes.is_expired(reset_code):
         logger.warning(f"Código expirado para {email}")
         db.session.delete(reset_code)
         db.session.commit()
@@ -127,7 +127,7 @@ def verify_reset_code():
     local_user = User.query.filter_by(email=email).first()
     if local_user:
         # Só atualiza local
-        local_user.password = generate_password_hash(new_password)
+        local_user.password = password_hasher.hash(new_password)
         db.session.commit()
         logger.info(f"Senha atualizada no banco local para {email}")
     else:
@@ -140,7 +140,7 @@ def verify_reset_code():
             local_user = User(
                 username=email.split('@')[0],
                 email=email,
-                password=generate_password_hash(new_password)
+                password=password_hasher.hash(new_password)
             )
             db.session.add(local_user)
             db.session.commit()
@@ -157,6 +157,9 @@ def verify_reset_code():
 
     db.session.delete(reset_code)
     db.session.commit()
+    reset_codes.record_success(email)
+    # Senha nova: sessões abertas com a antiga são encerradas
+    server_sessions.revoke_user(local_user.id)
 
     flash('Senha redefinida com sucesso! Faça login com sua nova senha.', 'success')
     return jsonify({
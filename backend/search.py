@@ -0,0 +1,243 @@
+import re
+import unicodedata
+import logging
+from markupsafe import escape
+from sqlalchemy import text
+from backend.extensions import db
+from backend.models import Post, Comment, CodeExample
+
+logger = logging.getLogger(__name__)
+
+# Cada documento indexado recebe rowid = id * 3 + código do tipo, o que permite
+# atualizar/remover pelo rowid (O(log n)) em vez de varrer o índice.
+KINDS = {'post': 0, 'comment': 1, 'code': 2}
+KIND_BY_CODE = {code: kind for kind, code in KINDS.items()}
+
+SNIPPET_RADIUS = 60
+
+# Definido por ensure_search_index(): True quando o FTS5 está pronto para uso
+_sqlite_fts_ready = False
+
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        title, body, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS search_fts_posts_ai AFTER INSERT ON posts BEGIN
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id * 3 + 0, new.category, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_fts_posts_au AFTER UPDATE OF content, category ON posts BEGIN
+        DELETE FROM search_fts WHERE rowid = old.id * 3 + 0;
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id * 3 + 0, new.category, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_fts_posts_ad AFTER DELETE ON posts BEGIN
+        DELETE FROM search_fts WHERE rowid = old.id * 3 + 0;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_fts_comments_ai AFTER INSERT ON comments BEGIN
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id * 3 + 1, '', new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_fts_comments_au AFTER UPDATE OF content ON comments BEGIN
+        DELETE FROM search_fts WHERE rowid = old.id * 3 + 1;
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id * 3 + 1, '', new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_fts_comments_ad AFTER DELETE ON comments BEGIN
+        DELETE FROM search_fts WHERE rowid = old.id * 3 + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_fts_code_ai AFTER INSERT ON code_examples BEGIN
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id * 3 + 2, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_fts_code_au AFTER UPDATE OF title, content ON code_examples BEGIN
+        DELETE FROM search_fts WHERE rowid = old.id * 3 + 2;
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id * 3 + 2, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_fts_code_ad AFTER DELETE ON code_examples BEGIN
+        DELETE FROM search_fts WHERE rowid = old.id * 3 + 2;
+    END""",
+]
+
+SQLITE_FTS_REBUILD = [
+    "DELETE FROM search_fts",
+    "INSERT INTO search_fts(rowid, title, body) SELECT id * 3 + 0, category, content FROM posts",
+    "INSERT INTO search_fts(rowid, title, body) SELECT id * 3 + 1, '', content FROM comments",
+    "INSERT INTO search_fts(rowid, title, body) SELECT id * 3 + 2, title, content FROM code_examples",
+]
+
+# No MySQL os índices FULLTEXT são criados pela migração; a collation *_ci
+# padrão já ignora acentos e maiúsculas.
+MYSQL_SEARCH_SQL = """
+    SELECT 'post' AS kind, id, MATCH(content, category) AGAINST (:q IN BOOLEAN MODE) AS score
+    FROM posts WHERE MATCH(content, category) AGAINST (:q IN BOOLEAN MODE)
+    UNION ALL
+    SELECT 'comment' AS kind, id, MATCH(content) AGAINST (:q IN BOOLEAN MODE) AS score
+    FROM comments WHERE MATCH(content) AGAINST (:q IN BOOLEAN MODE)
+    UNION ALL
+    SELECT 'code' AS kind, id, MATCH(title, content) AGAINST (:q IN BOOLEAN MODE) AS score
+    FROM code_examples WHERE MATCH(title, content) AGAINST (:q IN BOOLEAN MODE)
+    ORDER BY score DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+
+def fold_char(char):
+    """Remove o acento de um caractere mantendo 1 caractere (para mapear posições do snippet)."""
+    folded = unicodedata.normalize('NFKD', char).encode('ASCII', 'ignore').decode('ASCII')
+    return folded[:1].lower() if folded else char.lower()
+
+
+def fold_text(text):
+    """Versão sem acentos e minúscula do texto, com o mesmo comprimento do original."""
+    return ''.join(fold_char(char) for char in text)
+
+
+def query_tokens(query):
+    """Quebra a busca em termos normalizados (sem acentos, minúsculos)."""
+    return re.findall(r'\w+', fold_text(query))
+
+
+def build_snippet(content, tokens):
+    """Recorta o trecho em torno do primeiro termo encontrado e destaca os termos com <mark>.
+
+    O texto é escapado antes do destaque, então o resultado é HTML seguro.
+    """
+    if not content:
+        return ''
+    folded = fold_text(content)
+    positions = [folded.find(token) for token in tokens if folded.find(token) >= 0]
+    first = min(positions) if positions else 0
+    start = max(first - SNIPPET_RADIUS, 0)
+    end = min(first + SNIPPET_RADIUS * 2, len(content))
+    excerpt, folded_excerpt = content[start:end], folded[start:end]
+
+    spans = []
+    for token in tokens:
+        for match in re.finditer(re.escape(token), folded_excerpt):
+            spans.append((match.start(), match.end()))
+    spans.sort()
+
+    parts, cursor = [], 0
+    for span_start, span_end in spans:
+        if span_start < cursor:
+            continue
+        parts.append(str(escape(excerpt[cursor:span_start])))
+        parts.append(f'<mark>{escape(excerpt[span_start:span_end])}</mark>')
+        cursor = span_end
+    parts.append(str(escape(excerpt[cursor:])))
+    snippet = ''.join(parts)
+    if start > 0:
+        snippet = '…' + snippet
+    if end < len(content):
+        snippet += '…'
+    return snippet
+
+
+def _sqlite_fts_available(connection):
+    try:
+        connection.exec_driver_sql("SELECT 1 FROM search_fts LIMIT 1")
+        return True
+    except Exception:
+        return False
+
+
+def ensure_search_index():
+    """Cria o índice FTS5 e os gatilhos de sincronização no SQLite (idempotente).
+
+    Popula o índice na primeira criação. Em outros bancos não faz nada: o MySQL
+    usa índices FULLTEXT criados por migração.
+    """
+    global _sqlite_fts_ready
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    try:
+        with engine.begin() as connection:
+            created = not _sqlite_fts_available(connection)
+            for ddl in SQLITE_FTS_DDL:
+                connection.exec_driver_sql(ddl)
+            if created:
+                for statement in SQLITE_FTS_REBUILD:
+                    connection.exec_driver_sql(statement)
+                logger.info("Índice de busca FTS5 criado e populado")
+        _sqlite_fts_ready = True
+    except Exception as e:
+        # SQLite compilado sem FTS5: a busca cai no modo ILIKE
+        logger.warning(f"Não foi possível criar o índice FTS5: {str(e)}")
+
+
+def rebuild_search_index():
+    """Reconstrói o índice FTS5 a partir das tabelas de origem."""
+    if db.engine.dialect.name != 'sqlite':
+        return
+    with db.engine.begin() as connection:
+        for statement in SQLITE_FTS_REBUILD:
+            connection.exec_driver_sql(statement)
+
+
+def _search_sqlite(tokens, limit, offset):
+    fts_query = ' '.join(f'"{token}"*' for token in tokens)
+    rows = db.session.execute(text("""
+        SELECT rowid, bm25(search_fts, 2.0, 1.0) AS score
+        FROM search_fts
+        WHERE search_fts MATCH :q
+        ORDER BY score
+        LIMIT :limit OFFSET :offset
+    """), {'q': fts_query, 'limit': limit, 'offset': offset}).all()
+    # bm25 é menor quanto mais relevante; invertido para o cliente
+    return [(KIND_BY_CODE[rowid % 3], rowid // 3, -score) for rowid, score in rows]
+
+
+def _search_mysql(tokens, limit, offset):
+    boolean_query = ' '.join(f'+{token}*' for token in tokens)
+    rows = db.session.execute(
+        text(MYSQL_SEARCH_SQL),
+        {'q': boolean_query, 'limit': limit, 'offset': offset}
+    ).all()
+    return [(kind, ref_id, float(score)) for kind, ref_id, score in rows]
+
+
+def _search_fallback(query, limit, offset):
+    posts = Post.query.filter(
+        Post.content.ilike(f'%{query}%') | Post.category.ilike(f'%{query}%')
+    ).order_by(Post.created_at.desc()).limit(limit).offset(offset).all()
+    return [('post', post.id, 0.0) for post in posts]
+
+
+def search(query, page=1, per_page=10):
+    """Busca ranqueada em posts, comentários e exemplos de código.
+
+    Retorna (hits, has_more); cada hit é um dicionário com kind, id, score,
+    o objeto de origem e o snippet HTML destacado.
+    """
+    tokens = query_tokens(query)
+    if not tokens:
+        return [], False
+    limit, offset = per_page + 1, (page - 1) * per_page
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite' and _sqlite_fts_ready:
+        matches = _search_sqlite(tokens, limit, offset)
+    elif dialect in ('mysql', 'mariadb'):
+        matches = _search_mysql(tokens, limit, offset)
+    else:
+        matches = _search_fallback(query, limit, offset)
+    has_more = len(matches) > per_page
+    matches = matches[:per_page]
+
+    # Carrega os objetos da página com uma consulta por tipo
+    ids = {kind: [ref_id for k, ref_id, _ in matches if k == kind] for kind in KINDS}
+    objects = {}
+    for kind, model in (('post', Post), ('comment', Comment), ('code', CodeExample)):
+        if ids[kind]:
+            for obj in model.query.filter(model.id.in_(ids[kind])):
+                objects[(kind, obj.id)] = obj
+
+    hits = []
+    for kind, ref_id, score in matches:
+        obj = objects.get((kind, ref_id))
+        if obj is None:
+            continue
+        hits.append({
+            'kind': kind,
+            'id': ref_id,
+            'score': round(score, 4),
+            'object': obj,
+            'snippet': build_snippet(obj.content, tokens)
+        })
+    return hits, has_more
@@ -0,0 +1,326 @@
+import atexit
+import hashlib
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+import pytz
+from flask import request
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface
+from sqlalchemy import bindparam
+from backend.extensions import db
+from backend.models import UserSession
+
+logger = logging.getLogger(__name__)
+
+# Chave do cookie que guarda o token da sessão no servidor
+SID_KEY = '_sid'
+# Quanto tempo o vínculo token -> usuário fica no cache do processo; também é o
+# atraso máximo para uma revogação feita em outro processo valer aqui
+SESSION_CACHE_TTL = 30
+SESSION_CACHE_SIZE = 8192
+# last_active é acumulado em memória e gravado em lote nesse intervalo
+TOUCH_FLUSH_INTERVAL = 60
+CLEANUP_INTERVAL = 3600
+
+sessions_table = UserSession.__table__
+
+SessionRecord = namedtuple('SessionRecord', ['user_id', 'expires_at'])
+
+
+def session_key(token):
+    """Id gravado no banco: o hash do token, para que o banco não guarde credenciais."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SqlSessionStore:
+    """Sessões na tabela sessions, numa conexão própria (fora da transação da view)."""
+
+    def get(self, key):
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                db.select(sessions_table.c.user_id, sessions_table.c.expires_at)
+                .where(sessions_table.c.id == key)
+            ).first()
+        return SessionRecord(*row) if row else None
+
+    def create(self, key, user_id, user_agent, ip_address, now, expires_at):
+        with db.engine.begin() as connection:
+            connection.execute(sessions_table.insert().values(
+                id=key, user_id=user_id, user_agent=user_agent, ip_address=ip_address,
+                created_at=now, last_active=now, expires_at=expires_at
+            ))
+
+    def touch_many(self, touches):
+        with db.engine.begin() as connection:
+            connection.execute(
+                sessions_table.update()
+                .where(sessions_table.c.id == bindparam('key'))
+                .values(last_active=bindparam('last_active'), expires_at=bindparam('expires')),
+                [{'key': key, 'last_active': last_active, 'expires': expires_at}
+                 for key, (last_active, expires_at) in touches.items()]
+            )
+
+    def delete(self, key, user_id=None):
+        query = sessions_table.delete().where(sessions_table.c.id == key)
+        if user_id is not None:
+            query = query.where(sessions_table.c.user_id == user_id)
+        with db.engine.begin() as connection:
+            return connection.execute(query).rowcount > 0
+
+    def list_for_user(self, user_id, now):
+        with db.engine.connect() as connection:
+            return [row._asdict() for row in connection.execute(
+                db.select(sessions_table.c.id, sessions_table.c.user_agent, sessions_table.c.ip_address,
+                          sessions_table.c.created_at, sessions_table.c.last_active)
+                .where(sessions_table.c.user_id == user_id, sessions_table.c.expires_at > now)
+                .order_by(sessions_table.c.last_active.desc())
+            )]
+
+    def delete_for_user(self, user_id, except_key=None):
+        where = [sessions_table.c.user_id == user_id]
+        if except_key is not None:
+            where.append(sessions_table.c.id != except_key)
+        with db.engine.begin() as connection:
+            keys = [key for key, in connection.execute(db.select(sessions_table.c.id).where(*where))]
+            if keys:
+                connection.execute(sessions_table.delete().where(sessions_table.c.id.in_(keys)))
+        return keys
+
+    def delete_expired(self, now):
+        with db.engine.begin() as connection:
+            return connection.execute(sessions_table.delete().where(sessions_table.c.expires_at <= now)).rowcount
+
+
+class MemorySessionStore:
+    """Substituto local (SESSION_BACKEND=memory) para testes e desenvolvimento; vale só para o processo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = {}
+
+    def get(self, key):
+        with self._lock:
+            row = self._rows.get(key)
+            return SessionRecord(row['user_id'], row['expires_at']) if row else None
+
+    def create(self, key, user_id, user_agent, ip_address, now, expires_at):
+        with self._lock:
+            self._rows[key] = {'id': key, 'user_id': user_id, 'user_agent': user_agent, 'ip_address': ip_address,
+                               'created_at': now, 'last_active': now, 'expires_at': expires_at}
+
+    def touch_many(self, touches):
+        with self._lock:
+            for key, (last_active, expires_at) in touches.items():
+                if key in self._rows:
+                    self._rows[key].update(last_active=last_active, expires_at=expires_at)
+
+    def delete(self, key, user_id=None):
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None or (user_id is not None and row['user_id'] != user_id):
+                return False
+            del self._rows[key]
+            return True
+
+    def list_for_user(self, user_id, now):
+        with self._lock:
+            rows = [dict(row) for row in self._rows.values() if row['user_id'] == user_id and row['expires_at'] > now]
+        for row in rows:
+            del row['user_id'], row['expires_at']
+        return sorted(rows, key=lambda row: row['last_active'], reverse=True)
+
+    def delete_for_user(self, user_id, except_key=None):
+        with self._lock:
+            keys = [key for key, row in self._rows.items() if row['user_id'] == user_id and key != except_key]
+            for key in keys:
+                del self._rows[key]
+        return keys
+
+    def delete_expired(self, now):
+        with self._lock:
+            keys = [key for key, row in self._rows.items() if row['expires_at'] <= now]
+            for key in keys:
+                del self._rows[key]
+        return len(keys)
+
+
+SESSION_STORES = {'sql': SqlSessionStore, 'memory': MemorySessionStore}
+
+
+class ServerSession(SecureCookieSession):
+    # Hash do token validado em open_session e o usuário a que ele pertence
+    key = None
+    key_user_id = None
+
+
+class ServerSessionInterface(SecureCookieSessionInterface):
+    """Sessões logadas mantidas no servidor, com listagem e revogação.
+
+    O cookie assinado continua levando os dados da sessão (mensagens flash,
+    nome), mas o login vale só enquanto o token em SID_KEY existir no store:
+    o user_id do cookie é descartado se o token foi revogado ou expirou. Ao
+    logar (ou trocar de usuário) um token novo é emitido, o que também evita
+    fixação de sessão; cookies de antes desta mudança viram sessões no
+    primeiro acesso. O vínculo token -> usuário fica SESSION_CACHE_TTL
+    segundos em cache; last_active é acumulado em memória e gravado em lote
+    por uma thread a cada TOUCH_FLUSH_INTERVAL, junto com a limpeza periódica
+    das expiradas, fora das requisições.
+    """
+
+    session_class = ServerSession
+
+    def __init__(self):
+        self.app = None
+        self.store = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._touches = {}
+        self._last_cleanup = 0
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.store = SESSION_STORES[app.config['SESSION_BACKEND']]()
+        app.session_interface = self
+        atexit.register(self._flush_at_exit)
+
+    def _lifetime(self):
+        return self.app.permanent_session_lifetime
+
+    def _lookup(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > now:
+                self._cache.move_to_end(key)
+                return entry[1]
+        record = self.store.get(key)
+        with self._lock:
+            self._cache[key] = (now + SESSION_CACHE_TTL, record)
+            while len(self._cache) > SESSION_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return record
+
+    def _forget(self, keys):
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+                self._touches.pop(key, None)
+
+    def open_session(self, app, request):
+        session = super().open_session(app, request)
+        if session is None:
+            return None
+        token = session.get(SID_KEY)
+        if token:
+            key = session_key(token)
+            record = self._lookup(key)
+            if record is None or record.expires_at.replace(tzinfo=pytz.UTC) <= datetime.now(pytz.UTC) or record.user_id != session.get('user_id'):
+                # Revogada ou expirada: o cookie deixa de valer como login
+                session.clear()
+            else:
+                session.key, session.key_user_id = key, record.user_id
+                self._touch(key)
+        return session
+
+    def save_session(self, app, session, response):
+        user_id = session.get('user_id')
+        if session.key is not None and user_id != session.key_user_id:
+            # Logout (session.clear()) ou troca de usuário: a sessão antiga deixa de existir
+            self.revoke(session.key)
+            session.key = session.key_user_id = None
+            session.pop(SID_KEY, None)
+        if user_id is not None and session.key is None:
+            token = secrets.token_urlsafe(32)
+            key = session_key(token)
+            now = datetime.now(pytz.UTC)
+            self.store.create(key, user_id, (request.headers.get('User-Agent') or '')[:255],
+                              request.remote_addr, now, now + self._lifetime())
+            session[SID_KEY] = token
+            session.key, session.key_user_id = key, user_id
+        super().save_session(app, session, response)
+
+    def _touch(self, key):
+        with self._lock:
+            self._touches[key] = datetime.now(pytz.UTC)
+            self._ensure_thread()
+
+    def _ensure_thread(self):
+        # Iniciada no primeiro acesso logado, não na importação (comandos flask não precisam dela)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='session-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(TOUCH_FLUSH_INTERVAL)
+            with self.app.app_context():
+                try:
+                    self.flush()
+                    if time.monotonic() - self._last_cleanup >= CLEANUP_INTERVAL:
+                        self._last_cleanup = time.monotonic()
+                        self.cleanup()
+                except Exception as e:
+                    logger.error(f"Erro ao gravar a atividade das sessões: {str(e)}")
+
+    def flush(self):
+        """Grava last_active pendente (e prorroga a expiração das sessões tocadas)."""
+        with self._lock:
+            touches, self._touches = self._touches, {}
+        lifetime = self._lifetime()
+        if touches:
+            self.store.touch_many({key: (at, at + lifetime) for key, at in touches.items()})
+
+    def _flush_at_exit(self):
+        if self.app is None:
+            return
+        with self.app.app_context():
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro ao gravar a atividade das sessões: {str(e)}")
+
+    def cleanup(self):
+        """Apaga as sessões expiradas. Retorna quantas."""
+        removed = self.store.delete_expired(datetime.now(pytz.UTC))
+        if removed:
+            logger.info(f"{removed} sessão(ões) expirada(s) removida(s)")
+        return removed
+
+    def list_sessions(self, user_id):
+        # last_active pode estar até TOUCH_FLUSH_INTERVAL atrasado (a thread grava em lote)
+        return self.store.list_for_user(user_id, datetime.now(pytz.UTC))
+
+    def revoke(self, key, user_id=None):
+        """Encerra uma sessão (só se for de user_id, quando informado)."""
+        removed = self.store.delete(key, user_id=user_id)
+        self._forget([key])
+        return removed
+
+    def revoke_user(self, user_id, keep=None):
+        """Encerra todas as sessões do usuário, exceto a de hash keep. Retorna quantas."""
+        keys = self.store.delete_for_user(user_id, except_key=keep)
+        self._forget(keys)
+        if keys:
+            logger.info(f"{len(keys)} sessão(ões) do usuário ID {user_id} encerrada(s)")
+        return len(keys)
+
+
+server_sessions = ServerSessionInterface()
+
+BROWSERS = (('Edg/', 'Edge'), ('OPR/', 'Opera'), ('Firefox/', 'Firefox'), ('Chrome/', 'Chrome'), ('Safari/', 'Safari'))
+SYSTEMS = (('Android', 'Android'), ('iPhone', 'iPhone'), ('iPad', 'iPad'), ('Windows', 'Windows'),
+           ('Mac OS X', 'macOS'), ('Linux', 'Linux'))
+
+
+def describe_device(user_agent):
+    """Descrição curta do navegador e sistema a partir do User-Agent."""
+    user_agent = user_agent or ''
+    browser = next((name for token, name in BROWSERS if token in user_agent), None)
+    system = next((name for token, name in SYSTEMS if token in user_agent), None)
+    if browser and system:
+        return f"{browser} em {system}"
+    return browser or system or 'Dispositivo desconhecido'
@@ -0,0 +1,369 @@
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from cachelib import FileSystemCache
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from backend.extensions import db
+from backend.models import User, Post, Comment, Like, CodeExample
+
+logger = logging.getLogger(__name__)
+
+# Canal do Redis em que os processos avisam uns aos outros das tags invalidadas
+INVALIDATION_CHANNEL = 'cache:invalidations'
+TAG_KEY_PREFIX = 'tag:'
+# Com os avisos pelo Redis, as versões das tags só são relidas do store compartilhado
+# nesse intervalo (segurança contra mensagens perdidas); sem aviso, a cada TAG_POLL_INTERVAL
+TAG_SYNC_INTERVAL = 30
+TAG_POLL_INTERVAL = 1
+# Espera antes de reconectar o assinante do canal após uma falha
+SUBSCRIBER_RETRY = 5
+
+# Campos do usuário que aparecem em conteúdo cacheado (nome e foto nos cards)
+USER_CACHED_FIELDS = ('username', 'profile_pic')
+
+_MISSING = object()
+
+
+def key_prefix(key):
+    """Prefixo usado nas estatísticas: o trecho antes do primeiro ':'."""
+    return key.split(':', 1)[0]
+
+
+class LocalLRU:
+    """Primeiro nível: LRU em memória limitado pelo tamanho (bytes serializados) das entradas."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, size, ttl):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._pop(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TieredCache:
+    """Cache em dois níveis com invalidação por tags, compartilhado entre os workers.
+
+    Cada processo tem um LRU em memória (LocalLRU) na frente de um store
+    compartilhado: Redis quando CACHE_REDIS_URL está definido, senão um
+    FileSystemCache em CACHE_DIR. Cada entrada guarda a versão das tags de
+    que depende (ex.: 'posts', 'comments', 'post:42'); invalidar uma tag só
+    grava uma versão nova no store compartilhado, e entradas com versão
+    antiga passam a ser ignoradas nos dois níveis. As versões ficam em
+    memória por processo: com Redis, a invalidação é publicada em
+    INVALIDATION_CHANNEL e os outros workers descartam a versão local na
+    hora; sem Redis, elas são relidas a cada TAG_POLL_INTERVAL segundos.
+    Acertos (local e compartilhado) e falhas são contados por prefixo de
+    chave, por processo.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.shared = None
+        self.local = None
+        self.default_timeout = 300
+        self.local_ttl = 60
+        self._redis = None
+        self._subscribed = False
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._versions_lock = threading.Lock()
+        self._versions = {}
+        self._stats_lock = threading.Lock()
+        self._stats = defaultdict(Counter)
+
+    def init_app(self, app):
+        self.app = app
+        self.default_timeout = app.config['CACHE_DEFAULT_TIMEOUT']
+        self.local_ttl = app.config['CACHE_LOCAL_TTL']
+        self.local = LocalLRU(app.config['CACHE_LOCAL_MAX_BYTES'])
+        redis_url = app.config.get('CACHE_REDIS_URL')
+        if redis_url:
+            import redis
+            from cachelib import RedisCache
+            self._redis = redis.Redis.from_url(redis_url)
+            self.shared = RedisCache(host=self._redis, default_timeout=self.default_timeout,
+                                     key_prefix=app.config['CACHE_KEY_PREFIX'])
+            # O assinante das invalidações sobe na primeira requisição, como a fila de e-mails
+            app.before_request(self._ensure_thread)
+        else:
+            cache_dir = app.config.get('CACHE_DIR') or os.path.join(app.config['INSTANCE_DIR'], 'cache')
+            self.shared = FileSystemCache(cache_dir, threshold=app.config['CACHE_SHARED_THRESHOLD'],
+                                          default_timeout=self.default_timeout)
+
+    # Leitura e escrita
+
+    def get(self, key, default=None):
+        prefix = key_prefix(key)
+        entry = self.local.get(key)
+        if entry is not None and self._is_current(entry[0]):
+            self._count(prefix, 'local_hits')
+            return entry[1]
+        entry = self._shared_get(key)
+        if entry is not None and self._is_current(entry[0]):
+            self._count(prefix, 'shared_hits')
+            self.local.set(key, entry, self._sizeof(entry), self.local_ttl)
+            return entry[1]
+        self._count(prefix, 'misses')
+        return default
+
+    def set(self, key, value, timeout=None, tags=(), versions=None):
+        """Grava nos dois níveis. versions: versões das tags lidas antes de calcular o valor."""
+        if versions is None:
+            versions = self.tag_versions(tags)
+        timeout = self.default_timeout if timeout is None else timeout
+        entry = (versions, value)
+        self.local.set(key, entry, self._sizeof(entry), min(timeout, self.local_ttl))
+        try:
+            self.shared.set(key, entry, timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Erro ao gravar '{key}' no cache compartilhado: {str(e)}")
+
+    def remember(self, key, compute, timeout=None, tags=()):
+        """Valor em cache da chave ou, na falta, o resultado de compute() (que é gravado)."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        # Versões lidas antes de calcular: uma escrita concorrente deixa a entrada já vencida
+        versions = self.tag_versions(tags)
+        value = compute()
+        self.set(key, value, timeout=timeout, versions=versions)
+        return value
+
+    def delete(self, key):
+        self.local.delete(key)
+        try:
+            self.shared.delete(key)
+        except Exception as e:
+            logger.warning(f"Erro ao remover '{key}' do cache compartilhado: {str(e)}")
+
+    def _shared_get(self, key):
+        try:
+            return self.shared.get(key)
+        except Exception as e:
+            logger.warning(f"Erro ao ler '{key}' do cache compartilhado: {str(e)}")
+            return None
+
+    @staticmethod
+    def _sizeof(entry):
+        return len(pickle.dumps(entry, pickle.HIGHEST_PROTOCOL))
+
+    # Tags
+
+    def tag_versions(self, tags):
+        """Versões atuais das tags, como dicionário tag -> versão."""
+        if not tags:
+            return {}
+        now = time.monotonic()
+        interval = TAG_SYNC_INTERVAL if self._subscribed else TAG_POLL_INTERVAL
+        versions, stale = {}, []
+        with self._versions_lock:
+            for tag in tags:
+                cached = self._versions.get(tag)
+                if cached is not None and now - cached[0] < interval:
+                    versions[tag] = cached[1]
+                else:
+                    stale.append(tag)
+        if stale:
+            versions.update(self._load_versions(stale, now))
+        return versions
+
+    def _load_versions(self, tags, now):
+        keys = [TAG_KEY_PREFIX + tag for tag in tags]
+        try:
+            loaded = self.shared.get_many(*keys)
+            for index, tag in enumerate(tags):
+                if loaded[index] is None:
+                    # Tag ainda sem versão: add não sobrescreve a de outro processo que chegou antes
+                    self.shared.add(keys[index], uuid.uuid4().hex, timeout=0)
+                    loaded[index] = self.shared.get(keys[index])
+        except Exception as e:
+            # Sem o store compartilhado, versões novas fazem tudo virar falha em vez de dado velho
+            logger.warning(f"Erro ao ler versões de tags do cache compartilhado: {str(e)}")
+            return {tag: uuid.uuid4().hex for tag in tags}
+        with self._versions_lock:
+            for tag, version in zip(tags, loaded):
+                self._versions[tag] = (now, version)
+        return dict(zip(tags, loaded))
+
+    def _is_current(self, versions):
+        return not versions or self.tag_versions(list(versions)) == versions
+
+    def invalidate(self, *tags):
+        """Invalida as entradas que dependem de qualquer das tags, em todos os processos."""
+        if not tags:
+            return
+        now = time.monotonic()
+        with self._versions_lock:
+            for tag in tags:
+                version = uuid.uuid4().hex
+                self._versions[tag] = (now, version)
+                try:
+                    self.shared.set(TAG_KEY_PREFIX + tag, version, timeout=0)
+                except Exception as e:
+                    logger.warning(f"Erro ao invalidar a tag '{tag}' no cache compartilhado: {str(e)}")
+        if self._redis is not None:
+            try:
+                self._redis.publish(INVALIDATION_CHANNEL, ' '.join(tags))
+            except Exception as e:
+                logger.warning(f"Erro ao publicar invalidação de cache: {str(e)}")
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._subscribe, name='cache-invalidations', daemon=True)
+                self._thread.start()
+
+    def _subscribe(self):
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                self._subscribed = True
+                for message in pubsub.listen():
+                    self._forget_versions(message['data'].decode().split())
+            except Exception as e:
+                logger.warning(f"Assinatura de invalidações do cache interrompida: {str(e)}")
+            finally:
+                self._subscribed = False
+                pubsub.close()
+            time.sleep(SUBSCRIBER_RETRY)
+
+    def _forget_versions(self, tags):
+        # A própria publicação também chega aqui; reler a versão uma vez é inofensivo
+        with self._versions_lock:
+            for tag in tags:
+                self._versions.pop(tag, None)
+
+    # Estatísticas
+
+    def _count(self, prefix, field):
+        with self._stats_lock:
+            self._stats[prefix][field] += 1
+
+    def stats(self):
+        """Acertos e falhas por prefixo de chave (neste processo) e ocupação do nível local."""
+        with self._stats_lock:
+            prefixes = {prefix: dict(counts) for prefix, counts in self._stats.items()}
+        for counts in prefixes.values():
+            hits = counts.get('local_hits', 0) + counts.get('shared_hits', 0)
+            lookups = hits + counts.get('misses', 0)
+            counts['hit_ratio'] = round(hits / lookups, 3) if lookups else 0.0
+        return {
+            'backend': 'redis' if self._redis is not None else 'filesystem',
+            'invalidations_subscribed': self._subscribed,
+            'prefixes': prefixes,
+            'local': {'entries': len(self.local), 'bytes': self.local.size,
+                      'max_bytes': self.local.max_bytes, 'evictions': self.local.evictions},
+        }
+
+    def clear(self):
+        """Esvazia os dois níveis (o compartilhado vale para todos os processos)."""
+        self.local.clear()
+        with self._versions_lock:
+            self._versions.clear()
+        self.shared.clear()
+
+
+shared_cache = TieredCache()
+
+
+def invalidate_on_commit(*tags):
+    """Marca tags para invalidar quando a transação atual for confirmada.
+
+    Usada nas escritas feitas sem o ORM (curtidas, exclusões em massa); as
+    feitas pelo ORM em Post, Comment, Like e CodeExample são detectadas sozinhas.
+    """
+    db.session.info.setdefault('cache_tags', set()).update(tags)
+
+
+def post_tag(post_id):
+    return f'post:{post_id}'
+
+
+def user_tag(user_id):
+    return f'user:{user_id}'
+
+
+# Invalidação: posts, comentários, curtidas, exemplos de código e nome/foto de usuários
+# alterados pelo ORM, depois do commit
+
+@event.listens_for(Session, 'before_flush')
+def _collect_cache_tags(session, flush_context, instances):
+    tags = session.info.setdefault('cache_tags', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Post):
+            tags.add('posts')
+            if obj.id is not None:
+                tags.add(post_tag(obj.id))
+        elif isinstance(obj, Comment):
+            tags.update(('comments', post_tag(obj.post_id)))
+        elif isinstance(obj, Like):
+            tags.add('likes')
+            if obj.post_id is not None:
+                tags.add(post_tag(obj.post_id))
+        elif isinstance(obj, CodeExample):
+            tags.add('code_examples')
+        elif isinstance(obj, User) and obj.id is not None:
+            state = inspect(obj)
+            if obj in session.deleted or any(state.attrs[field].history.has_changes() for field in USER_CACHED_FIELDS):
+                tags.add(user_tag(obj.id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_cache_tags(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags and shared_cache.shared is not None:
+        shared_cache.invalidate(*sorted(tags))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_cache_tags(session):
+    session.info.pop('cache_tags', None)
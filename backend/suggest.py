@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import logging
+import threading
+from flask import current_app
+from collections import Counter
+from bisect import bisect_left, insort
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from backend.extensions import db
+from backend.models import User, Post, CodeExample
+from backend.search import fold_text
+
+logger = logging.getLogger(__name__)
+
+# Tipos de sugestão: título, tags e autor de cada catálogo JSON, mais os termos do banco
+KINDS = (
+    'pdf', 'pdf_tag', 'pdf_autor',
+    'slide', 'slide_tag', 'slide_autor',
+    'categoria', 'codigo', 'usuario',
+)
+
+# Cada worker aplica na hora as próprias alterações; as feitas por outros
+# workers entram na próxima ressincronização com o banco, feita em segundo plano.
+DB_RESYNC_INTERVAL = 300
+# Nova tentativa após uma ressincronização que falhou
+DB_RESYNC_RETRY = 30
+
+MAX_LIMIT = 20
+# Quantas chaves no máximo são percorridas por consulta antes de ranquear
+SCAN_LIMIT = 200
+
+
+class PrefixIndex:
+    """Índice de prefixos sobre um array ordenado (bisect).
+
+    Cada texto é indexado a partir do início de cada palavra, então "pyt"
+    encontra "A Byte Of Python". As chaves são minúsculas e sem acentos.
+    Os termos têm contagem de referências: a mesma tag pode vir de vários PDFs.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._refs = {}
+
+    @staticmethod
+    def _word_starts(folded):
+        return [i for i, char in enumerate(folded)
+                if char.isalnum() and (i == 0 or not folded[i - 1].isalnum())]
+
+    def add(self, kind, text):
+        text = (text or '').strip()
+        if not text:
+            return
+        term = (kind, text)
+        count = self._refs.get(term, 0)
+        self._refs[term] = count + 1
+        if count:
+            return
+        folded = fold_text(text)
+        for position in self._word_starts(folded):
+            insort(self._keys, (folded[position:], position, kind, text))
+
+    def remove(self, kind, text):
+        text = (text or '').strip()
+        term = (kind, text)
+        count = self._refs.get(term, 0)
+        if not count:
+            return
+        if count > 1:
+            self._refs[term] = count - 1
+            return
+        del self._refs[term]
+        folded = fold_text(text)
+        for position in self._word_starts(folded):
+            key = (folded[position:], position, kind, text)
+            index = bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+    def query(self, prefix, kinds=None, limit=8):
+        prefix = fold_text(prefix.strip())
+        if not prefix:
+            return []
+        found = {}
+        index = bisect_left(self._keys, (prefix,))
+        scanned = 0
+        while index < len(self._keys) and scanned < SCAN_LIMIT:
+            key, position, kind, text = self._keys[index]
+            if not key.startswith(prefix):
+                break
+            index += 1
+            scanned += 1
+            if kinds and kind not in kinds:
+                continue
+            # Mantém a melhor posição (início do texto vence meio do texto)
+            if position < found.get((kind, text), position + 1):
+                found[(kind, text)] = position
+        ranked = sorted(found.items(), key=lambda item: (item[1] > 0, len(item[0][1]), item[0][1]))
+        return [{'text': text, 'type': kind} for (kind, text), _ in ranked[:limit]]
+
+
+class SuggestionIndex:
+    """Sugestões de busca em memória: catálogos de PDFs/slides e termos do banco.
+
+    Os catálogos são recarregados quando o mtime do arquivo muda. Os termos do
+    banco são atualizados incrementalmente pelos eventos de sessão abaixo e
+    relidos por completo a cada DB_RESYNC_INTERVAL numa thread, fora da
+    requisição; até a primeira leitura terminar só os catálogos são sugeridos.
+    """
+
+    def __init__(self):
+        self._index = PrefixIndex()
+        self._lock = threading.Lock()
+        self._catalog_files = {}
+        self._catalog_terms = {}
+        self._db_terms = Counter()
+        self._db_synced_at = 0
+        self._next_resync = 0
+
+    def register_catalog(self, path, kind):
+        self._catalog_files[path] = kind
+
+    def _catalog_terms_for(self, path, kind):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Erro ao carregar catálogo {path} para sugestões: {str(e)}")
+            return []
+        terms = []
+        for item in items:
+            terms.append((kind, item.get('title')))
+            terms.append((f'{kind}_autor', item.get('author')))
+            terms.extend((f'{kind}_tag', tag) for tag in item.get('tags') or [])
+        return terms
+
+    def _refresh_catalogs(self):
+        for path, kind in self._catalog_files.items():
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                mtime = None
+            loaded_mtime, old_terms = self._catalog_terms.get(path, (None, []))
+            if path in self._catalog_terms and mtime == loaded_mtime:
+                continue
+            new_terms = self._catalog_terms_for(path, kind) if mtime else []
+            with self._lock:
+                for term in old_terms:
+                    self._index.remove(*term)
+                for term in new_terms:
+                    self._index.add(*term)
+                self._catalog_terms[path] = (mtime, new_terms)
+
+    def _load_db_terms(self):
+        terms = Counter(dict(
+            (('categoria', category), total) for category, total in
+            db.session.query(Post.category, db.func.count()).group_by(Post.category)
+        ))
+        terms.update(('codigo', title) for title, in db.session.query(CodeExample.title))
+        terms.update(('usuario', username) for username, in db.session.query(User.username))
+        return terms
+
+    def _refresh_db(self):
+        now = time.monotonic()
+        if now < self._next_resync:
+            return
+        with self._lock:
+            # Só uma ressincronização por vez: o prazo avança antes de a thread começar
+            if now < self._next_resync:
+                return
+            self._next_resync = now + DB_RESYNC_INTERVAL
+        threading.Thread(target=self._resync_db, args=(current_app._get_current_object(),),
+                         name='suggest-resync', daemon=True).start()
+
+    def _resync_db(self, app):
+        with app.app_context():
+            try:
+                new_terms = self._load_db_terms()
+            except Exception as e:
+                self._next_resync = time.monotonic() + DB_RESYNC_RETRY
+                logger.error(f"Erro ao ressincronizar sugestões com o banco: {str(e)}")
+                return
+            finally:
+                db.session.remove()
+        # Troca no índice só pela diferença, com o lock segurado o mínimo possível
+        with self._lock:
+            for term, count in (self._db_terms - new_terms).items():
+                for _ in range(count):
+                    self._index.remove(*term)
+            for term, count in (new_terms - self._db_terms).items():
+                for _ in range(count):
+                    self._index.add(*term)
+            self._db_terms = new_terms
+            self._db_synced_at = time.monotonic()
+
+    def apply_changes(self, removed, added):
+        """Aplica termos do banco alterados por uma transação confirmada."""
+        if not self._db_synced_at:
+            return
+        with self._lock:
+            for term in removed:
+                if self._db_terms[term]:
+                    self._db_terms[term] -= 1
+                    self._index.remove(*term)
+            for term in added:
+                self._db_terms[term] += 1
+                self._index.add(*term)
+
+    def suggest(self, prefix, kinds=None, limit=8):
+        self._refresh_catalogs()
+        self._refresh_db()
+        with self._lock:
+            return self._index.query(prefix, kinds, min(limit, MAX_LIMIT))
+
+
+suggestions = SuggestionIndex()
+
+
+# Campos indexados de cada modelo
+TRACKED_FIELDS = {
+    Post: ('categoria', 'category'),
+    CodeExample: ('codigo', 'title'),
+    User: ('usuario', 'username'),
+}
+
+
+def _pending(session):
+    return session.info.setdefault('suggest_changes', ([], []))
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changes(session, flush_context, instances):
+    removed, added = _pending(session)
+    for obj in session.new:
+        if type(obj) in TRACKED_FIELDS:
+            kind, field = TRACKED_FIELDS[type(obj)]
+            added.append((kind, getattr(obj, field)))
+    for obj in session.deleted:
+        if type(obj) in TRACKED_FIELDS:
+            kind, field = TRACKED_FIELDS[type(obj)]
+            removed.append((kind, getattr(obj, field)))
+    for obj in session.dirty:
+        if type(obj) in TRACKED_FIELDS:
+            kind, field = TRACKED_FIELDS[type(obj)]
+            history = inspect(obj).attrs[field].history
+            if history.has_changes():
+                removed.extend((kind, value) for value in history.deleted)
+                added.extend((kind, value) for value in history.added)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    removed, added = session.info.pop('suggest_changes', ([], []))
+    if removed or added:
+        suggestions.apply_changes(removed, added)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('suggest_changes', None)
@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import unquote
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Larguras geradas: os cards do catálogo têm ~300px, então 320/480/640 cobrem telas 1x a 2x
+WIDTHS = (320, 480, 640)
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+SOURCE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.gif'}
+MANIFEST_NAME = 'manifest.json'
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _slug(filename):
+    stem = os.path.splitext(filename)[0]
+    return re.sub(r'[^a-z0-9]+', '-', stem.lower()).strip('-') or 'thumb'
+
+
+def render_variants(source_path, output_dir, content_hash):
+    """Gera as variantes WebP/JPEG de uma imagem. Roda nos processos do pool.
+
+    Retorna {formato: [[largura, nome_do_arquivo], ...]}. Nunca amplia a imagem:
+    larguras maiores que a original viram uma única variante no tamanho original.
+    """
+    prefix = f"{_slug(os.path.basename(source_path))}-{content_hash[:12]}"
+    variants = {fmt: [] for fmt in FORMATS}
+    with Image.open(source_path) as image:
+        # Para JPEG, decodifica já reduzido (DCT scaling) quando a fonte é bem maior que o necessário
+        image.draft('RGB', (max(WIDTHS), round(image.height * max(WIDTHS) / image.width)))
+        image.load()
+        widths = sorted({min(width, image.width) for width in WIDTHS})
+        for width in widths:
+            height = max(round(image.height * width / image.width), 1)
+            resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image.copy()
+            for fmt, options in FORMATS.items():
+                frame = resized
+                if fmt == 'jpeg' and frame.mode != 'RGB':
+                    # JPEG não tem transparência: compõe sobre fundo branco
+                    background = Image.new('RGB', frame.size, (255, 255, 255))
+                    rgba = frame.convert('RGBA')
+                    background.paste(rgba, mask=rgba.split()[-1])
+                    frame = background
+                elif frame.mode not in ('RGB', 'RGBA'):
+                    frame = frame.convert('RGBA')
+                filename = f"{prefix}-{width}.{'jpg' if fmt == 'jpeg' else fmt}"
+                target = os.path.join(output_dir, filename)
+                if not os.path.exists(target):
+                    tmp = target + '.tmp'
+                    frame.save(tmp, **options)
+                    os.replace(tmp, target)
+                variants[fmt].append([width, filename])
+    return variants
+
+
+def build_thumbnails(source_dir, output_dir, workers=None):
+    """Gera variantes para imagens novas ou alteradas e atualiza o manifesto.
+
+    Fontes com mesmo tamanho e mtime do manifesto são puladas sem serem lidas;
+    as demais são identificadas pelo hash do conteúdo, então renomear ou tocar
+    um arquivo não gera as variantes de novo. Variantes órfãs são removidas.
+    Retorna (gerados, reaproveitados, removidos).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    sources = {}
+    for filename in os.listdir(source_dir):
+        path = os.path.join(source_dir, filename)
+        if os.path.splitext(filename)[1].lower() in SOURCE_EXTENSIONS and os.path.isfile(path):
+            sources[filename] = path
+
+    pending, reused, kept = {}, 0, 0
+    new_manifest = {}
+    for filename, path in sources.items():
+        stat = os.stat(path)
+        entry = manifest.get(filename)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            new_manifest[filename] = entry
+            reused += 1
+            continue
+        content_hash = file_hash(path)
+        if entry and entry['hash'] == content_hash:
+            new_manifest[filename] = dict(entry, size=stat.st_size, mtime=stat.st_mtime_ns)
+            reused += 1
+            continue
+        pending[filename] = (path, content_hash, stat)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(render_variants, path, output_dir, content_hash): filename
+                for filename, (path, content_hash, stat) in pending.items()
+            }
+            for future in as_completed(futures):
+                filename = futures[future]
+                path, content_hash, stat = pending[filename]
+                try:
+                    variants = future.result()
+                except Exception as e:
+                    logger.error(f"Erro ao gerar miniaturas de {filename}: {str(e)}")
+                    # Mantém as variantes anteriores (e a entrada antiga, para tentar de novo na próxima execução)
+                    entry = manifest.get(filename)
+                    if entry:
+                        new_manifest[filename] = entry
+                        kept += 1
+                    continue
+                new_manifest[filename] = {
+                    'hash': content_hash,
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime_ns,
+                    'variants': variants,
+                }
+
+    referenced = {MANIFEST_NAME}
+    for entry in new_manifest.values():
+        for variants in entry['variants'].values():
+            referenced.update(name for _, name in variants)
+    removed = 0
+    for filename in os.listdir(output_dir):
+        if filename not in referenced and not filename.endswith('.tmp'):
+            os.remove(os.path.join(output_dir, filename))
+            removed += 1
+
+    tmp = manifest_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(new_manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, manifest_path)
+    return len(new_manifest) - reused - kept, reused, removed
+
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class ThumbnailManifest:
+    """Leitura do manifesto de miniaturas pelo app, recarregado quando o arquivo muda."""
+
+    def __init__(self, output_dir, url_prefix):
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self.url_prefix = url_prefix.rstrip('/')
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._entries = {}
+
+    def _refresh(self):
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            self._entries = load_manifest(self.manifest_path) if mtime else {}
+            self._mtime = mtime
+
+    def srcset(self, thumbnail_url):
+        """Candidatos srcset para a URL original da miniatura, ou None se não houver variantes.
+
+        Retorna {'webp': 'url 320w, ...', 'jpeg': '...', 'src': menor JPEG}.
+        """
+        self._refresh()
+        entry = self._entries.get(os.path.basename(unquote(thumbnail_url or '')))
+        if not entry:
+            return None
+        result = {
+            fmt: ', '.join(f"{self.url_prefix}/{name} {width}w" for width, name in variants)
+            for fmt, variants in entry['variants'].items()
+        }
+        result['src'] = f"{self.url_prefix}/{entry['variants']['jpeg'][0][1]}"
+        return result
@@ -0,0 +1,37 @@
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+
+def upsert(dialect, table, index_elements, added, replaced):
+    """INSERT que, se a chave já existe, soma as colunas `added` e substitui as `replaced`."""
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(table)
+        values = {name: table.c[name] + stmt.excluded[name] for name in added}
+        values.update({name: stmt.excluded[name] for name in replaced})
+        return stmt.on_conflict_do_update(index_elements=index_elements, set_=values)
+    if dialect in ('mysql', 'mariadb'):
+        stmt = mysql.insert(table)
+        values = {name: table.c[name] + stmt.inserted[name] for name in added}
+        values.update({name: stmt.inserted[name] for name in replaced})
+        return stmt.on_duplicate_key_update(values)
+    raise NotImplementedError(f"Upsert em {table.name} não suportado para {dialect}")
+
+
+def insert_new(connection, table, index_elements, rows):
+    """Insere as linhas cuja chave ainda não existe e retorna o conjunto das chaves inseridas.
+
+    Quem decide é o próprio banco (conflito no índice único), então dois
+    processos inserindo a mesma chave ao mesmo tempo nunca contam ambos.
+    """
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = (insert(table).on_conflict_do_nothing(index_elements=index_elements)
+                .returning(*[table.c[name] for name in index_elements]))
+        return set(connection.execute(stmt, rows).tuples())
+    if dialect in ('mysql', 'mariadb'):
+        # Sem RETURNING: uma linha por vez, o rowcount do INSERT IGNORE diz se entrou
+        stmt = table.insert().prefix_with('IGNORE')
+        return {tuple(row[name] for name in index_elements)
+                for row in rows if connection.execute(stmt, row).rowcount}
+    raise NotImplementedError(f"Insert sem duplicatas em {table.name} não suportado para {dialect}")
@@ -0,0 +1,100 @@
+"""Cria a tabela page_visits e migra o JSON de users.visited_pages
+
+Revision ID: 06071845aef4
+Revises: edc802a9d3d2
+Create Date: 2026-10-18 14:00:00
+
+"""
+import json
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '06071845aef4'
+down_revision = 'edc802a9d3d2'
+branch_labels = None
+depends_on = None
+
+page_visits = sa.table(
+    'page_visits',
+    sa.column('user_id', sa.Integer),
+    sa.column('page', sa.String),
+    sa.column('first_seen', sa.DateTime),
+    sa.column('last_seen', sa.DateTime),
+    sa.column('count', sa.Integer),
+)
+users = sa.table(
+    'users',
+    sa.column('id', sa.Integer),
+    sa.column('visited_pages', sa.Text),
+)
+
+
+def _parse_visited_pages(raw):
+    try:
+        visited_pages = json.loads(raw) if raw else {}
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    return visited_pages if isinstance(visited_pages, dict) else {}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'page_visits' not in inspector.get_table_names():
+        op.create_table(
+            'page_visits',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('page', sa.String(length=50), nullable=False),
+            sa.Column('first_seen', sa.DateTime(), nullable=False),
+            sa.Column('last_seen', sa.DateTime(), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False, server_default='1'),
+            sa.PrimaryKeyConstraint('user_id', 'page'),
+        )
+        op.create_index('ix_page_visits_page_user_id', 'page_visits', ['page', 'user_id'], unique=False)
+
+    columns = [col['name'] for col in inspector.get_columns('users')]
+    if 'visited_pages' not in columns:
+        return
+
+    # Converte o JSON {página: horário ISO} de cada usuário em linhas. O blob só
+    # guardava a última visita, então first_seen = last_seen e count = 1.
+    existing = {(row.user_id, row.page) for row in bind.execute(
+        sa.select(page_visits.c.user_id, page_visits.c.page)
+    )}
+    rows = []
+    for user_id, raw in bind.execute(sa.select(users.c.id, users.c.visited_pages)):
+        for page, visited_at in _parse_visited_pages(raw).items():
+            if (user_id, page) in existing:
+                continue
+            try:
+                seen = datetime.fromisoformat(visited_at)
+            except (TypeError, ValueError):
+                seen = datetime.utcnow()
+            rows.append({'user_id': user_id, 'page': page[:50], 'first_seen': seen, 'last_seen': seen, 'count': 1})
+    if rows:
+        op.bulk_insert(page_visits, rows)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('visited_pages')
+
+
+def downgrade():
+    bind = op.get_bind()
+    columns = [col['name'] for col in inspect(bind).get_columns('users')]
+    if 'visited_pages' not in columns:
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('visited_pages', sa.Text(), nullable=True))
+
+    visited = {}
+    for row in bind.execute(sa.select(page_visits.c.user_id, page_visits.c.page, page_visits.c.last_seen)):
+        visited.setdefault(row.user_id, {})[row.page] = row.last_seen.isoformat()
+    for user_id, pages in visited.items():
+        bind.execute(users.update().where(users.c.id == user_id).values(visited_pages=json.dumps(pages)))
+
+    op.drop_index('ix_page_visits_page_user_id', table_name='page_visits')
+    op.drop_table('page_visits')
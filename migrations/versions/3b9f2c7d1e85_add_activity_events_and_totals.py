@@ -0,0 +1,125 @@
+"""Cria activity_events e user_activity_totals e preenche a partir do conteúdo existente
+
+Revision ID: 3b9f2c7d1e85
+Revises: 06071845aef4
+Create Date: 2026-10-18 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9f2c7d1e85'
+down_revision = '06071845aef4'
+branch_labels = None
+depends_on = None
+
+activity_events = sa.table(
+    'activity_events',
+    sa.column('user_id', sa.Integer),
+    sa.column('type', sa.String),
+    sa.column('created_at', sa.DateTime),
+)
+user_activity_totals = sa.table(
+    'user_activity_totals',
+    sa.column('user_id', sa.Integer),
+    sa.column('posts_count', sa.Integer),
+    sa.column('comments_count', sa.Integer),
+    sa.column('likes_count', sa.Integer),
+    sa.column('pages_visited', sa.Integer),
+    sa.column('profile_updates', sa.Integer),
+    sa.column('activity_points', sa.Integer),
+    sa.column('updated_at', sa.DateTime),
+)
+
+# Fontes do preenchimento inicial: (tabela, coluna de data, tipo do evento)
+BACKFILL_SOURCES = [
+    ('posts', 'created_at', 'post_created'),
+    ('comments', 'created_at', 'comment_created'),
+    ('likes', 'created_at', 'like_given'),
+    ('page_visits', 'first_seen', 'page_visit'),
+]
+
+# Pesos de ProgressTracker.ACTIVITY_WEIGHTS no momento desta migração
+WEIGHTS = {'post_created': 15, 'comment_created': 10, 'like_given': 3, 'page_visit': 5}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    tables = inspector.get_table_names()
+
+    if 'activity_events' not in tables:
+        op.create_table(
+            'activity_events',
+            sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('type', sa.String(length=20), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_activity_events_user_id_created_at', 'activity_events',
+                        ['user_id', 'created_at'], unique=False)
+        op.create_index('ix_activity_events_created_at', 'activity_events', ['created_at'], unique=False)
+
+    if 'user_activity_totals' not in tables:
+        op.create_table(
+            'user_activity_totals',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('posts_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('comments_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('likes_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('pages_visited', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('profile_updates', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('activity_points', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('user_id'),
+        )
+
+    # Só preenche um log vazio: rodar de novo não duplica eventos
+    if bind.execute(sa.select(sa.func.count()).select_from(activity_events)).scalar():
+        return
+
+    for table_name, date_column, event_type in BACKFILL_SOURCES:
+        source = sa.table(table_name, sa.column('user_id', sa.Integer), sa.column(date_column, sa.DateTime))
+        bind.execute(activity_events.insert().from_select(
+            ['user_id', 'type', 'created_at'],
+            sa.select(
+                source.c.user_id,
+                sa.literal(event_type, sa.String),
+                sa.func.coalesce(source.c[date_column], sa.func.current_timestamp())
+            ).where(source.c.user_id.isnot(None))
+        ))
+
+    def counted(event_type):
+        return sa.func.sum(sa.case((activity_events.c.type == event_type, 1), else_=0))
+
+    bind.execute(user_activity_totals.insert().from_select(
+        ['user_id', 'posts_count', 'comments_count', 'likes_count', 'pages_visited',
+         'profile_updates', 'activity_points', 'updated_at'],
+        sa.select(
+            activity_events.c.user_id,
+            counted('post_created'),
+            counted('comment_created'),
+            counted('like_given'),
+            counted('page_visit'),
+            sa.literal(0, sa.Integer),
+            sa.func.sum(sa.case(
+                *[(activity_events.c.type == event_type, weight) for event_type, weight in WEIGHTS.items()],
+                else_=0
+            )),
+            sa.func.current_timestamp()
+        ).group_by(activity_events.c.user_id)
+    ))
+
+
+def downgrade():
+    tables = inspect(op.get_bind()).get_table_names()
+    if 'user_activity_totals' in tables:
+        op.drop_table('user_activity_totals')
+    if 'activity_events' in tables:
+        op.drop_index('ix_activity_events_created_at', table_name='activity_events')
+        op.drop_index('ix_activity_events_user_id_created_at', table_name='activity_events')
+        op.drop_table('activity_events')
@@ -0,0 +1,48 @@
+"""Cria as tabelas de séries de analytics (analytics_rollups e active_user_buckets)
+
+Revision ID: 4e8a1f6c2d93
+Revises: 9c41d7e2a6b0
+Create Date: 2026-10-18 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8a1f6c2d93'
+down_revision = '9c41d7e2a6b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # O histórico é preenchido por "flask backfill-analytics"
+    tables = inspect(op.get_bind()).get_table_names()
+    if 'analytics_rollups' not in tables:
+        op.create_table(
+            'analytics_rollups',
+            sa.Column('granularity', sa.String(length=5), nullable=False),
+            sa.Column('metric', sa.String(length=20), nullable=False),
+            sa.Column('bucket_start', sa.DateTime(), nullable=False),
+            sa.Column('dimension', sa.String(length=50), nullable=False),
+            sa.Column('value', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('granularity', 'metric', 'bucket_start', 'dimension'),
+        )
+    if 'active_user_buckets' not in tables:
+        op.create_table(
+            'active_user_buckets',
+            sa.Column('granularity', sa.String(length=5), nullable=False),
+            sa.Column('bucket_start', sa.DateTime(), nullable=False),
+            sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.PrimaryKeyConstraint('granularity', 'bucket_start', 'user_id'),
+        )
+
+
+def downgrade():
+    tables = inspect(op.get_bind()).get_table_names()
+    if 'active_user_buckets' in tables:
+        op.drop_table('active_user_buckets')
+    if 'analytics_rollups' in tables:
+        op.drop_table('analytics_rollups')
@@ -0,0 +1,82 @@
+"""Adiciona contadores desnormalizados de curtidas, comentários e respostas
+
+Revision ID: 5b9ec32b0dc9
+Revises: 6f836857f7a3
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '5b9ec32b0dc9'
+down_revision = '6f836857f7a3'
+branch_labels = None
+depends_on = None
+
+COUNTERS = {
+    'posts': ['like_count', 'comment_count'],
+    'comments': ['like_count', 'reply_count'],
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    for table, counters in COUNTERS.items():
+        columns = [col['name'] for col in inspector.get_columns(table)]
+        missing = [name for name in counters if name not in columns]
+        if missing:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for name in missing:
+                    batch_op.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+    # Preenche os contadores com os valores atuais. Tabelas derivadas agrupadas
+    # para que o MySQL aceite ler a própria tabela do UPDATE.
+    op.execute("""
+        UPDATE posts SET like_count = COALESCE((
+            SELECT t.total FROM (
+                SELECT post_id, COUNT(*) AS total FROM likes
+                WHERE post_id IS NOT NULL GROUP BY post_id
+            ) t WHERE t.post_id = posts.id
+        ), 0)
+    """)
+    op.execute("""
+        UPDATE posts SET comment_count = COALESCE((
+            SELECT t.total FROM (
+                SELECT post_id, COUNT(*) AS total FROM comments GROUP BY post_id
+            ) t WHERE t.post_id = posts.id
+        ), 0)
+    """)
+    op.execute("""
+        UPDATE comments SET like_count = COALESCE((
+            SELECT t.total FROM (
+                SELECT comment_id, COUNT(*) AS total FROM likes
+                WHERE comment_id IS NOT NULL GROUP BY comment_id
+            ) t WHERE t.comment_id = comments.id
+        ), 0)
+    """)
+    op.execute("""
+        UPDATE comments SET reply_count = COALESCE((
+            SELECT t.total FROM (
+                SELECT parent_id, COUNT(*) AS total FROM comments
+                WHERE parent_id IS NOT NULL GROUP BY parent_id
+            ) t WHERE t.parent_id = comments.id
+        ), 0)
+    """)
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    for table, counters in COUNTERS.items():
+        columns = [col['name'] for col in inspector.get_columns(table)]
+        present = [name for name in counters if name in columns]
+        if present:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for name in present:
+                    batch_op.drop_column(name)
@@ -0,0 +1,44 @@
+"""Cria a fila de e-mails de saída (outbound_emails)
+
+Revision ID: 7d2e5b8c4f10
+Revises: 4e8a1f6c2d93
+Create Date: 2026-10-18 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e5b8c4f10'
+down_revision = '4e8a1f6c2d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'outbound_emails' in inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'outbound_emails',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('recipient', sa.String(length=120), nullable=False),
+        sa.Column('subject', sa.String(length=200), nullable=False),
+        sa.Column('html', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=10), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_outbound_emails_status_next_attempt_at', 'outbound_emails',
+                    ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    if 'outbound_emails' in inspect(op.get_bind()).get_table_names():
+        op.drop_index('ix_outbound_emails_status_next_attempt_at', table_name='outbound_emails')
+        op.drop_table('outbound_emails')
@@ -0,0 +1,74 @@
+"""Remove curtidas duplicadas e adiciona índices únicos em likes
+
+Revision ID: 8792bdaeb9dc
+Revises: 5b9ec32b0dc9
+Create Date: 2026-10-18 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '8792bdaeb9dc'
+down_revision = '5b9ec32b0dc9'
+branch_labels = None
+depends_on = None
+
+UNIQUE_INDEXES = {
+    'uq_likes_user_post': 'post_id',
+    'uq_likes_user_comment': 'comment_id',
+}
+
+
+def upgrade():
+    # Mantém apenas a curtida mais antiga de cada (usuário, alvo). A tabela
+    # derivada evita o erro do MySQL ao ler a própria tabela do DELETE.
+    for column in UNIQUE_INDEXES.values():
+        op.execute(f"""
+            DELETE FROM likes
+            WHERE {column} IS NOT NULL AND id NOT IN (
+                SELECT keep_id FROM (
+                    SELECT MIN(id) AS keep_id FROM likes
+                    WHERE {column} IS NOT NULL
+                    GROUP BY user_id, {column}
+                ) t
+            )
+        """)
+
+    # As duplicatas removidas estavam contadas em like_count
+    op.execute("""
+        UPDATE posts SET like_count = COALESCE((
+            SELECT t.total FROM (
+                SELECT post_id, COUNT(*) AS total FROM likes
+                WHERE post_id IS NOT NULL GROUP BY post_id
+            ) t WHERE t.post_id = posts.id
+        ), 0)
+    """)
+    op.execute("""
+        UPDATE comments SET like_count = COALESCE((
+            SELECT t.total FROM (
+                SELECT comment_id, COUNT(*) AS total FROM likes
+                WHERE comment_id IS NOT NULL GROUP BY comment_id
+            ) t WHERE t.comment_id = comments.id
+        ), 0)
+    """)
+
+    bind = op.get_bind()
+    existing = {index['name'] for index in inspect(bind).get_indexes('likes')}
+    for name, column in UNIQUE_INDEXES.items():
+        if name not in existing:
+            op.create_index(
+                name, 'likes', ['user_id', column], unique=True,
+                sqlite_where=sa.text(f'{column} IS NOT NULL'),
+                postgresql_where=sa.text(f'{column} IS NOT NULL')
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    existing = {index['name'] for index in inspect(bind).get_indexes('likes')}
+    for name in UNIQUE_INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name='likes')
@@ -0,0 +1,42 @@
+"""Cria a tabela leaderboard (ranking materializado)
+
+Revision ID: 9c41d7e2a6b0
+Revises: 3b9f2c7d1e85
+Create Date: 2026-10-18 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41d7e2a6b0'
+down_revision = '3b9f2c7d1e85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Preenchida por "flask rebuild-leaderboard"
+    if 'leaderboard' in inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'leaderboard',
+        sa.Column('position', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('activity_points', sa.Integer(), nullable=False),
+        sa.Column('progress_percentage', sa.Float(), nullable=False),
+        sa.Column('pages_visited', sa.Integer(), nullable=False),
+        sa.Column('resources_count', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('position'),
+    )
+    op.create_index('ix_leaderboard_user_id', 'leaderboard', ['user_id'], unique=True)
+
+
+def downgrade():
+    if 'leaderboard' in inspect(op.get_bind()).get_table_names():
+        op.drop_index('ix_leaderboard_user_id', table_name='leaderboard')
+        op.drop_table('leaderboard')
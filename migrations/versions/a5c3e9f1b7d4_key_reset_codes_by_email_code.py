@@ -0,0 +1,85 @@
+"""Chaveia reset_codes por (email, code) e indexa expires_at
+
+Revision ID: a5c3e9f1b7d4
+Revises: 7d2e5b8c4f10
+Create Date: 2026-10-18 19:00:00
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5c3e9f1b7d4'
+down_revision = '7d2e5b8c4f10'
+branch_labels = None
+depends_on = None
+
+reset_codes = sa.table(
+    'reset_codes',
+    sa.column('email', sa.String),
+    sa.column('code', sa.String),
+    sa.column('created_at', sa.DateTime),
+    sa.column('expires_at', sa.DateTime),
+)
+
+
+def _create_keyed_table():
+    op.create_table(
+        'reset_codes',
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('code', sa.String(length=6), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('email', 'code'),
+    )
+    op.create_index('ix_reset_codes_expires_at', 'reset_codes', ['expires_at'], unique=False)
+
+
+def upgrade():
+    # A tabela vinha do db.create_all(), então pode não existir ou estar no formato antigo (id)
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if 'reset_codes' not in inspector.get_table_names():
+        _create_keyed_table()
+        return
+    if 'id' not in [col['name'] for col in inspector.get_columns('reset_codes')]:
+        return
+
+    # Códigos duram 10 minutos: só os válidos são copiados, e só o mais recente de cada e-mail
+    latest = {}
+    for row in bind.execute(
+        sa.select(reset_codes.c.email, reset_codes.c.code, reset_codes.c.created_at, reset_codes.c.expires_at)
+        .where(reset_codes.c.expires_at > datetime.utcnow())
+        .order_by(reset_codes.c.expires_at)
+    ):
+        latest[row.email] = dict(row._mapping)
+    op.drop_table('reset_codes')
+    _create_keyed_table()
+    if latest:
+        op.bulk_insert(reset_codes, list(latest.values()))
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if 'reset_codes' not in inspector.get_table_names():
+        return
+    if 'id' in [col['name'] for col in inspector.get_columns('reset_codes')]:
+        return
+    rows = [dict(row._mapping) for row in bind.execute(sa.select(reset_codes))]
+    op.drop_index('ix_reset_codes_expires_at', table_name='reset_codes')
+    op.drop_table('reset_codes')
+    op.create_table(
+        'reset_codes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('code', sa.String(length=6), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    if rows:
+        op.bulk_insert(reset_codes, rows)
@@ -0,0 +1,42 @@
+"""Cria a tabela sessions (sessões logadas mantidas no servidor)
+
+Revision ID: c8f4a2d6e9b1
+Revises: a5c3e9f1b7d4
+Create Date: 2026-10-18 20:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f4a2d6e9b1'
+down_revision = 'a5c3e9f1b7d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'sessions' in inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'sessions',
+        sa.Column('id', sa.String(length=64), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('user_agent', sa.String(length=255), nullable=True),
+        sa.Column('ip_address', sa.String(length=45), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_active', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_sessions_user_id', 'sessions', ['user_id'], unique=False)
+    op.create_index('ix_sessions_expires_at', 'sessions', ['expires_at'], unique=False)
+
+
+def downgrade():
+    if 'sessions' in inspect(op.get_bind()).get_table_names():
+        op.drop_index('ix_sessions_expires_at', table_name='sessions')
+        op.drop_index('ix_sessions_user_id', table_name='sessions')
+        op.drop_table('sessions')
@@ -0,0 +1,45 @@
+"""Adiciona índices para as consultas mais frequentes (feed, threads, curtidas e progresso)
+
+Revision ID: cc543227da72
+Revises: 8792bdaeb9dc
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'cc543227da72'
+down_revision = '8792bdaeb9dc'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_posts_created_at_id', 'posts', ['created_at', 'id']),
+    ('ix_posts_category_created_at', 'posts', ['category', 'created_at']),
+    ('ix_posts_user_id', 'posts', ['user_id']),
+    ('ix_comments_post_id_created_at', 'comments', ['post_id', 'created_at']),
+    ('ix_comments_parent_id', 'comments', ['parent_id']),
+    ('ix_comments_user_id', 'comments', ['user_id']),
+    ('ix_likes_user_id', 'likes', ['user_id']),
+    ('ix_likes_post_id', 'likes', ['post_id']),
+    ('ix_likes_comment_id', 'likes', ['comment_id']),
+]
+
+
+def _existing_indexes(table):
+    inspector = inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
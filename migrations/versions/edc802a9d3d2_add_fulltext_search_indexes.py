@@ -0,0 +1,49 @@
+"""Adiciona índices FULLTEXT para a busca textual (somente MySQL)
+
+Revision ID: edc802a9d3d2
+Revises: cc543227da72
+Create Date: 2026-10-18 13:00:00
+
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'edc802a9d3d2'
+down_revision = 'cc543227da72'
+branch_labels = None
+depends_on = None
+
+# No SQLite o índice FTS5 e seus gatilhos são criados por
+# backend.search.ensure_search_index() na inicialização do app.
+FULLTEXT_INDEXES = [
+    ('ft_posts_content_category', 'posts', ['content', 'category']),
+    ('ft_comments_content', 'comments', ['content']),
+    ('ft_code_examples_title_content', 'code_examples', ['title', 'content']),
+]
+
+
+def _is_mysql():
+    return op.get_bind().dialect.name in ('mysql', 'mariadb')
+
+
+def _existing_indexes(table):
+    inspector = inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    if not _is_mysql():
+        return
+    for name, table, columns in FULLTEXT_INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns, mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    if not _is_mysql():
+        return
+    for name, table, columns in reversed(FULLTEXT_INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
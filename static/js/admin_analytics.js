@@ -0,0 +1,64 @@
+// Painel de métricas: uma série por gráfico, lida de /admin/api/analytics
+const COLORS = ['#4f46e5', '#10b981', '#f59e0b', '#ef4444', '#06b6d4', '#8b5cf6', '#ec4899', '#84cc16'];
+const DIMENSION_LABELS = { total: 'Total', post: 'Em postagens', comment: 'Em comentários', '': 'Sem categoria' };
+const charts = {};
+
+function formatBucket(iso, granularity) {
+    const date = new Date(iso + 'Z');
+    const options = granularity === 'hour'
+        ? { day: '2-digit', month: '2-digit', hour: '2-digit', timeZone: 'UTC' }
+        : { day: '2-digit', month: '2-digit', timeZone: 'UTC' };
+    return date.toLocaleString('pt-BR', options);
+}
+
+async function loadMetric(canvas, granularity, buckets) {
+    const metric = canvas.dataset.metric;
+    const error = document.querySelector(`.metric-error[data-metric="${metric}"]`);
+    const params = new URLSearchParams({ metric, granularity, buckets });
+    try {
+        const response = await fetch(`/admin/api/analytics?${params}`);
+        const data = await response.json();
+        if (data.status !== 'success') throw new Error(data.message);
+        error.classList.add('hidden');
+        const datasets = Object.entries(data.series).map(([dimension, values], index) => ({
+            label: DIMENSION_LABELS[dimension] || dimension,
+            data: values,
+            borderColor: COLORS[index % COLORS.length],
+            backgroundColor: COLORS[index % COLORS.length],
+            tension: 0.2,
+            pointRadius: 0
+        }));
+        const labels = data.buckets.map(iso => formatBucket(iso, granularity));
+        if (charts[metric]) {
+            charts[metric].data.labels = labels;
+            charts[metric].data.datasets = datasets;
+            charts[metric].update();
+        } else {
+            charts[metric] = new Chart(canvas, {
+                type: 'line',
+                data: { labels, datasets },
+                options: {
+                    responsive: true,
+                    interaction: { mode: 'index', intersect: false },
+                    scales: { y: { beginAtZero: true, ticks: { precision: 0 } } }
+                }
+            });
+        }
+    } catch (e) {
+        console.error(`Erro ao carregar a métrica ${metric}:`, e);
+        error.classList.remove('hidden');
+    }
+}
+
+function loadAll() {
+    const select = document.getElementById('granularity');
+    const option = select.options[select.selectedIndex];
+    document.querySelectorAll('.metric-chart').forEach(canvas => {
+        loadMetric(canvas, option.value, option.dataset.buckets);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.getElementById('granularity').addEventListener('change', loadAll);
+    loadAll();
+});
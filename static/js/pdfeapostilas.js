@@ -6,34 +6,85 @@ document.addEventListener('DOMContentLoaded', function() {
     const viewToggleButtons = document.querySelectorAll('.view-toggle button');
     const pdfGrid = document.querySelector('#pdf-grid');
     const sideMenu = document.getElementById('offcanvasMenu');
+    const catalogSentinel = document.querySelector('.catalog-sentinel');
+    const catalogState = { q: '', category: '', page: 1, hasMore: false, loading: false, requestId: 0 };
+    let searchTimer = null;
 
     setupSearchBar();
     setupCategoryFilter();
     setupViewToggle();
     setupDrawer();
-    loadPdfs();
-
-    async function loadPdfs() {
+    setupInfiniteScroll();
+    loadPdfs(true);
+
+    // Busca a página atual do catálogo no servidor (/api/catalog filtra, ordena e pagina)
+    async function loadPdfs(reset) {
+        if (reset) {
+            catalogState.page = 1;
+        } else if (catalogState.loading || !catalogState.hasMore) {
+            return;
+        }
+        const requestId = ++catalogState.requestId;
+        catalogState.loading = true;
+        const params = new URLSearchParams({ source: 'pdfs', page: catalogState.page });
+        if (catalogState.q) params.set('q', catalogState.q);
+        if (catalogState.category) params.set('category', catalogState.category);
         try {
-            const response = await fetch('/data/pdfs.json');
-            if (!response.ok) throw new Error('Erro ao carregar o arquivo JSON');
-            const pdfs = await response.json();
-            renderPdfs(pdfs);
+            const response = await fetch(`/api/catalog?${params}`);
+            if (!response.ok) throw new Error('Erro ao consultar o catálogo');
+            const data = await response.json();
+            // Descarta respostas de filtros que já foram trocados
+            if (requestId !== catalogState.requestId) return;
+            renderPdfs(data.items, reset);
+            catalogState.hasMore = data.has_more;
+            catalogState.page += 1;
+            if (catalogSentinel) catalogSentinel.style.display = data.has_more ? 'block' : 'none';
         } catch (error) {
             console.error('Erro ao carregar PDFs:', error);
             showNotification('Erro ao carregar os PDFs', 'danger');
+        } finally {
+            if (requestId === catalogState.requestId) catalogState.loading = false;
+        }
+    }
+
+    function setupInfiniteScroll() {
+        if (!catalogSentinel || !('IntersectionObserver' in window)) return;
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) loadPdfs(false);
+        }, { rootMargin: '400px' });
+        observer.observe(catalogSentinel);
+    }
+
+    function isListView() {
+        const activeToggle = document.querySelector('.view-toggle button.active i');
+        return activeToggle && activeToggle.classList.contains('fa-list');
+    }
+
+    // Usa as variantes redimensionadas (WebP com JPEG de reserva) quando o servidor as informa
+    function renderThumbnail(pdf) {
+        const srcset = pdf.thumbnail_srcset;
+        if (!srcset) {
+            return `<img src="${pdf.thumbnail}" alt="Thumbnail do PDF" loading="lazy">`;
         }
+        const sizes = '(max-width: 600px) 100vw, 320px';
+        return `
+            <picture>
+                <source type="image/webp" srcset="${srcset.webp}" sizes="${sizes}">
+                <img src="${srcset.src}" srcset="${srcset.jpeg}" sizes="${sizes}" alt="Thumbnail do PDF" loading="lazy">
+            </picture>
+        `;
     }
 
-    function renderPdfs(pdfs) {
-        pdfGrid.innerHTML = '';
+    function renderPdfs(pdfs, reset) {
+        if (reset) pdfGrid.innerHTML = '';
+        const listView = isListView();
         pdfs.forEach(pdf => {
             const card = document.createElement('div');
             card.className = 'pdf-card';
             card.innerHTML = `
                 <div class="pdf-thumbnail">
                     <a href="${pdf.file_path}" target="_blank" download>
-                        <img src="${pdf.thumbnail}" alt="Thumbnail do PDF">
+                        ${renderThumbnail(pdf)}
                     </a>
                     <div class="pdf-category-tag">${pdf.category}</div>
                     <div class="pdf-icon">
@@ -61,6 +112,11 @@ document.addEventListener('DOMContentLoaded', function() {
                     </div>
                 </div>
             `;
+            if (listView) {
+                card.style.display = 'flex';
+                card.querySelector('.pdf-thumbnail').style.width = '280px';
+                card.querySelector('.pdf-info').style.flex = '1';
+            }
             pdfGrid.appendChild(card);
         });
     }
@@ -112,47 +168,9 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     function filterPdfs(searchTerm) {
-        const activeCategory = document.querySelector('.category.active').textContent.trim();
-        document.querySelectorAll('.pdf-card').forEach(card => {
-            const title = card.querySelector('.pdf-title').textContent.toLowerCase();
-            const description = card.querySelector('.pdf-description').textContent.toLowerCase();
-            const author = card.querySelector('.author-name').textContent.toLowerCase();
-            const category = card.querySelector('.pdf-category-tag').textContent.toLowerCase();
-            const tags = Array.from(card.querySelectorAll('.pdf-tag')).map(tag => tag.textContent.toLowerCase());
-
-            const searchCategoryMap = {
-                'banco de dados': 'banco de dados',
-                'Estudo': 'Estudo',
-                'linguagens': 'linguagens de programação',
-                'redes': 'redes',
-                'redes neurais': 'redes neurais',
-                'sql': 'banco de dados',
-                'python': 'linguagens de programação',
-                'java': 'linguagens de programação',
-                'processadores': 'Estudo',
-                'compiladores': 'Estudo',
-                'redes de computadores': 'redes',
-                'ia': 'redes neurais'
-            };
-
-            const matchedCategory = searchCategoryMap[searchTerm] || searchTerm;
-
-            const matchesSearch = searchTerm === '' ||
-                title.includes(searchTerm) ||
-                description.includes(searchTerm) ||
-                author.includes(searchTerm) ||
-                category.includes(matchedCategory) ||
-                tags.some(tag => tag.includes(searchTerm));
-
-            const matchesCategory = activeCategory === 'Todos' || 
-                card.querySelector('.pdf-category-tag').textContent.trim() === activeCategory;
-
-            if (matchesSearch && matchesCategory) {
-                card.style.display = 'block';
-            } else {
-                card.style.display = 'none';
-            }
-        });
+        catalogState.q = searchTerm;
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => loadPdfs(true), 150);
     }
 
     function setupCategoryFilter() {
@@ -162,19 +180,14 @@ document.addEventListener('DOMContentLoaded', function() {
                 this.classList.add('active');
 
                 const categoryName = this.textContent.trim();
-                document.querySelectorAll('.pdf-card').forEach(card => {
-                    const cardCategory = card.querySelector('.pdf-category-tag').textContent.trim();
-                    if (categoryName === 'Todos' || cardCategory === categoryName) {
-                        card.style.display = 'block';
-                    } else {
-                        card.style.display = 'none';
-                    }
-                });
+                catalogState.category = categoryName === 'Todos' ? '' : categoryName;
+                catalogState.q = '';
 
                 if (searchInput) {
                     searchInput.value = '';
                     searchBar.classList.remove('search-active');
                 }
+                loadPdfs(true);
                 showNotification(`Filtrando por ${categoryName}`, 'success');
             });
         });
@@ -31,34 +31,35 @@ document.addEventListener('DOMContentLoaded', function() {
 
     function initializeComponents() {
         console.log('Inicializando componentes...');
-        // Carrega likes para o post
-        if (likeButton) {
-            const postId = likeButton.dataset.postId;
-            fetch(`/get_post_likes/${postId}`)
+        // Carrega likes do post, comentários e respostas em uma única requisição
+        const commentLikeButtons = document.querySelectorAll('.comment-like-btn');
+        const commentIds = Array.from(commentLikeButtons).map(btn => btn.dataset.commentId || btn.dataset.replyId);
+        if (likeButton || commentIds.length > 0) {
+            const params = new URLSearchParams({
+                post_ids: likeButton ? likeButton.dataset.postId : '',
+                comment_ids: commentIds.join(',')
+            });
+            fetch(`/get_likes?${params}`)
                 .then(response => response.json())
                 .then(data => {
-                    if (data.status === 'success') {
-                        likeButton.querySelector('.like-count').textContent = data.like_count;
-                        if (data.user_liked) likeButton.classList.add('active');
+                    if (data.status !== 'success') return;
+                    if (likeButton) {
+                        const state = data.posts[likeButton.dataset.postId];
+                        if (state) {
+                            likeButton.querySelector('.like-count').textContent = state.like_count;
+                            if (state.user_liked) likeButton.classList.add('active');
+                        }
                     }
+                    commentLikeButtons.forEach(btn => {
+                        const state = data.comments[btn.dataset.commentId || btn.dataset.replyId];
+                        if (!state) return;
+                        btn.querySelector('.like-count').textContent = state.like_count;
+                        if (state.user_liked) btn.classList.add('liked');
+                    });
                 })
-                .catch(error => console.error('Erro ao carregar likes do post:', error));
+                .catch(error => console.error('Erro ao carregar likes:', error));
         }
 
-        // Carrega likes para comentários e respostas
-        document.querySelectorAll('.comment-like-btn').forEach(btn => {
-            const id = btn.dataset.commentId || btn.dataset.replyId;
-            fetch(`/get_comment_likes/${id}`)
-                .then(response => response.json())
-                .then(data => {
-                    if (data.status === 'success') {
-                        btn.querySelector('.like-count').textContent = data.like_count;
-                        if (data.user_liked) btn.classList.add('liked');
-                    }
-                })
-                .catch(error => console.error('Erro ao carregar likes do comentário:', error));
-        });
-
         // Inicializa contadores de caracteres
         document.querySelectorAll('textarea[name="comment_content"], textarea[name="reply_content"], textarea[name="edit_comment_content"], textarea[name="edit_reply_content"]').forEach(textarea => {
             textarea.dispatchEvent(new Event('input'));
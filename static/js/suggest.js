@@ -0,0 +1,53 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Autocompletar da barra de pesquisa usando /suggest (índice em memória no servidor)
+    const searchInput = document.querySelector('.search-bar input[data-suggest-types]');
+    if (!searchInput) return;
+
+    const dataList = document.createElement('datalist');
+    dataList.id = 'search-suggestions';
+    searchInput.setAttribute('list', dataList.id);
+    searchInput.setAttribute('autocomplete', 'off');
+    searchInput.after(dataList);
+
+    const cache = new Map();
+    let debounceTimer = null;
+    let lastQuery = '';
+
+    function renderSuggestions(suggestions) {
+        dataList.innerHTML = '';
+        suggestions.forEach(suggestion => {
+            const option = document.createElement('option');
+            option.value = suggestion.text;
+            dataList.appendChild(option);
+        });
+    }
+
+    function fetchSuggestions(query) {
+        if (cache.has(query)) {
+            renderSuggestions(cache.get(query));
+            return;
+        }
+        const params = new URLSearchParams({ q: query, types: searchInput.dataset.suggestTypes });
+        fetch(`/suggest?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.status !== 'success') return;
+                cache.set(query, data.suggestions);
+                // Ignora respostas que chegaram depois de o usuário continuar digitando
+                if (query === lastQuery) {
+                    renderSuggestions(data.suggestions);
+                }
+            })
+            .catch(error => console.error('Error fetching suggestions:', error));
+    }
+
+    searchInput.addEventListener('input', function() {
+        lastQuery = this.value.trim();
+        clearTimeout(debounceTimer);
+        if (lastQuery.length === 0) {
+            renderSuggestions([]);
+            return;
+        }
+        debounceTimer = setTimeout(() => fetchSuggestions(lastQuery), 120);
+    });
+});
@@ -9,6 +9,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const deleteButtons = document.querySelectorAll('.delete-post');
     const categories = document.querySelectorAll('.category');
     const sideMenu = document.getElementById('offcanvasMenu');
+    const feedSentinel = document.querySelector('.feed-sentinel');
 
     initializeComponents();
     setupSearchBar();
@@ -16,28 +17,11 @@ document.addEventListener('DOMContentLoaded', function() {
     setupLikeButtons();
     setupDeleteButtons();
     setupCategoryFilter();
+    setupInfiniteScroll();
     setupDrawer();
 
     function initializeComponents() {
-        likeButtons.forEach(btn => {
-            const postId = btn.closest('.post-card').dataset.postId;
-            fetch(`/get_post_likes/${postId}`, {
-                method: 'GET',
-                headers: {
-                    'Content-Type': 'application/json'
-                }
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    btn.querySelector('.like-count').textContent = data.like_count;
-                    if (data.user_liked) {
-                        btn.classList.add('active');
-                    }
-                }
-            })
-            .catch(error => console.error('Error fetching post likes:', error));
-        });
+        loadLikeStates();
 
         if (postTextarea && charCounter) {
             postTextarea.dispatchEvent(new Event('input'));
@@ -57,6 +41,45 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    function loadLikeStates() {
+        const commentButtons = document.querySelectorAll('.like-btn-comment');
+        const postIds = Array.from(likeButtons).map(btn => btn.closest('.post-card').dataset.postId);
+        const commentIds = Array.from(commentButtons).map(btn => btn.dataset.commentId);
+        if (postIds.length === 0 && commentIds.length === 0) return;
+
+        const params = new URLSearchParams({
+            post_ids: postIds.join(','),
+            comment_ids: commentIds.join(',')
+        });
+        fetch(`/get_likes?${params}`, {
+            method: 'GET',
+            headers: {
+                'Content-Type': 'application/json'
+            }
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.status !== 'success') return;
+
+            likeButtons.forEach(btn => {
+                const state = data.posts[btn.closest('.post-card').dataset.postId];
+                if (!state) return;
+                btn.querySelector('.like-count').textContent = state.like_count;
+                if (state.user_liked) {
+                    btn.classList.add('active');
+                }
+            });
+            commentButtons.forEach(btn => {
+                const state = data.comments[btn.dataset.commentId];
+                if (!state) return;
+                btn.querySelector('.like-count').textContent = state.like_count;
+                btn.classList.toggle('btn-primary', state.user_liked);
+                btn.classList.toggle('btn-outline-primary', !state.user_liked);
+            });
+        })
+        .catch(error => console.error('Error fetching like states:', error));
+    }
+
     function normalizeText(text) {
         return text
             .toLowerCase()
@@ -185,11 +208,52 @@ document.addEventListener('DOMContentLoaded', function() {
     function setupLikeButtons() {
         if (!likeButtons || likeButtons.length === 0) return;
 
-        likeButtons.forEach(button => {
-            button.addEventListener('click', function() {
-                const postId = this.dataset.postId;
-                fetch(`/like_post/${postId}`, {
-                    method: 'POST',
+        likeButtons.forEach(bindLikeButton);
+    }
+
+    function bindLikeButton(button) {
+        button.addEventListener('click', function() {
+            const postId = this.dataset.postId;
+            fetch(`/like_post/${postId}`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                }
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.status === 'success') {
+                    this.querySelector('.like-count').textContent = data.likes;
+                    if (data.liked) {
+                        this.classList.add('active');
+                        showNotification('Postagem curtida!', 'success');
+                    } else {
+                        this.classList.remove('active');
+                        showNotification('Like removido', 'info');
+                    }
+                } else {
+                    showNotification(data.message || 'Erro ao curtir postagem.', 'error');
+                }
+            })
+            .catch(() => {
+                showNotification('Erro ao conectar com o servidor.', 'error');
+            });
+        });
+    }
+
+    function setupDeleteButtons() {
+        if (!deleteButtons || deleteButtons.length === 0) return;
+
+        deleteButtons.forEach(bindDeleteButton);
+    }
+
+    function bindDeleteButton(button) {
+        button.addEventListener('click', function() {
+            const postId = this.dataset.postId;
+            const postCard = this.closest('.post-card');
+            if (confirm('Tem certeza que deseja deletar esta postagem?')) {
+                fetch(`/delete_post/${postId}`, {
+                    method: 'DELETE',
                     headers: {
                         'Content-Type': 'application/json'
                     }
@@ -197,64 +261,27 @@ document.addEventListener('DOMContentLoaded', function() {
                 .then(response => response.json())
                 .then(data => {
                     if (data.status === 'success') {
-                        this.querySelector('.like-count').textContent = data.likes;
-                        if (data.liked) {
-                            this.classList.add('active');
-                            showNotification('Postagem curtida!', 'success');
-                        } else {
-                            this.classList.remove('active');
-                            showNotification('Like removido', 'info');
+                        postCard.remove();
+                        showNotification('Postagem deletada com sucesso!', 'success');
+                        const postList = document.querySelector('.post-list');
+                        if (!postList.querySelector('.post-card')) {
+                            postList.innerHTML = `
+                                <div class="empty-state-card">
+                                    <div class="text-center py-3">
+                                        <i class="fas fa-file-alt fa-2x mb-2 text-muted"></i>
+                                        <p class="text-muted">Nenhuma postagem encontrada.</p>
+                                    </div>
+                                </div>
+                            `;
                         }
                     } else {
-                        showNotification(data.message || 'Erro ao curtir postagem.', 'error');
+                        showNotification(data.message || 'Erro ao deletar postagem.', 'error');
                     }
                 })
                 .catch(() => {
                     showNotification('Erro ao conectar com o servidor.', 'error');
                 });
-            });
-        });
-    }
-
-    function setupDeleteButtons() {
-        if (!deleteButtons || deleteButtons.length === 0) return;
-
-        deleteButtons.forEach(button => {
-            button.addEventListener('click', function() {
-                const postId = this.dataset.postId;
-                const postCard = this.closest('.post-card');
-                if (confirm('Tem certeza que deseja deletar esta postagem?')) {
-                    fetch(`/delete_post/${postId}`, {
-                        method: 'DELETE',
-                        headers: {
-                            'Content-Type': 'application/json'
-                        }
-                    })
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.status === 'success') {
-                            postCard.remove();
-                            showNotification('Postagem deletada com sucesso!', 'success');
-                            const postList = document.querySelector('.post-list');
-                            if (!postList.querySelector('.post-card')) {
-                                postList.innerHTML = `
-                                    <div class="empty-state-card">
-                                        <div class="text-center py-3">
-                                            <i class="fas fa-file-alt fa-2x mb-2 text-muted"></i>
-                                            <p class="text-muted">Nenhuma postagem encontrada.</p>
-                                        </div>
-                                    </div>
-                                `;
-                            }
-                        } else {
-                            showNotification(data.message || 'Erro ao deletar postagem.', 'error');
-                        }
-                    })
-                    .catch(() => {
-                        showNotification('Erro ao conectar com o servidor.', 'error');
-                    });
-                }
-            });
+            }
         });
     }
 
@@ -273,6 +300,112 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    function renderPostCard(post) {
+        const card = document.createElement('div');
+        card.className = 'post-card';
+        card.dataset.postId = post.id;
+        card.dataset.category = post.category;
+        const avatar = post.profile_pic_url
+            ? `<img class="profile-pic-img rounded-circle" src="${escapeHtml(post.profile_pic_url)}" alt="Foto de perfil" style="width:40px;height:40px;object-fit:cover;" />`
+            : `<div class="profile-pic-avatar bg-primary text-white rounded-circle d-flex justify-content-center align-items-center" style="width:40px;height:40px;font-size:1.5em;">
+                    ${escapeHtml(post.username.charAt(0).toUpperCase())}
+               </div>`;
+        const actions = post.is_owner
+            ? `<div class="post-actions">
+                    <button class="btn btn-sm btn-danger delete-post" data-post-id="${post.id}">
+                        <i class="fas fa-trash"></i>
+                    </button>
+               </div>`
+            : '';
+        card.innerHTML = `
+            <div class="post-header">
+                <div class="user-info">
+                    <div class="profile-pic-preview">${avatar}</div>
+                    <div>
+                        <h5 class="username">${escapeHtml(post.username)}</h5>
+                        <small class="text-muted">${escapeHtml(post.created_at)}</small>
+                    </div>
+                </div>
+                ${actions}
+            </div>
+            <div class="post-content">
+                <div class="post-category-tag">${escapeHtml(post.category)}</div>
+                <p>${escapeHtml(post.content)}</p>
+            </div>
+            <div class="post-footer">
+                <button class="btn btn-sm btn-outline-primary like-btn${post.user_liked ? ' active' : ''}" data-post-id="${post.id}">
+                    <i class="fas fa-thumbs-up"></i> <span class="like-count">${post.like_count}</span>
+                </button>
+                <a href="${escapeHtml(post.url)}" class="btn btn-sm btn-outline-secondary comment-btn">
+                    <i class="fas fa-comment"></i> Comentar (${post.comment_count})
+                </a>
+            </div>
+        `;
+        return card;
+    }
+
+    function setupInfiniteScroll() {
+        if (!feedSentinel || !('IntersectionObserver' in window)) return;
+
+        let loading = false;
+        const postList = document.querySelector('.post-list');
+
+        const observer = new IntersectionObserver(entries => {
+            if (!entries.some(entry => entry.isIntersecting) || loading) return;
+
+            const cursor = feedSentinel.dataset.nextCursor;
+            if (!cursor) {
+                observer.disconnect();
+                return;
+            }
+
+            loading = true;
+            fetch(`/comunidade/posts?cursor=${encodeURIComponent(cursor)}`, {
+                method: 'GET',
+                headers: {
+                    'Content-Type': 'application/json'
+                }
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.status !== 'success') {
+                    showNotification(data.message || 'Erro ao carregar postagens.', 'error');
+                    observer.disconnect();
+                    return;
+                }
+
+                data.posts.forEach(post => {
+                    const card = renderPostCard(post);
+                    postList.appendChild(card);
+                    card.querySelectorAll('.like-btn').forEach(bindLikeButton);
+                    card.querySelectorAll('.delete-post').forEach(bindDeleteButton);
+                });
+
+                feedSentinel.dataset.nextCursor = data.next_cursor || '';
+                if (!data.next_cursor) {
+                    feedSentinel.style.display = 'none';
+                    observer.disconnect();
+                }
+                filterPosts(normalizeText(searchInput ? searchInput.value : ''));
+            })
+            .catch(error => {
+                console.error('Error loading feed page:', error);
+                showNotification('Erro ao conectar com o servidor.', 'error');
+            })
+            .finally(() => {
+                loading = false;
+            });
+        }, { rootMargin: '400px 0px' });
+
+        observer.observe(feedSentinel);
+    }
+
     function filterPosts(searchTerm) {
         const posts = document.querySelectorAll('.post-card');
         const activeCategory = document.querySelector('.category.active').dataset.category;